@@ -0,0 +1,54 @@
+"""Load-tests FleetPoller against many mock routers with latency, throttling and dropped connections.
+
+Every router is a mock served on its own port, starting from --port.
+Run from the repository root with ``python -m benchmarks.bench_fleet``.
+"""
+
+import time
+import argparse
+
+from tplink_archer import FleetPoller, RouterConfig
+from tests.test_server import create_app
+from tests.test_server.state import RouterState
+from .bench_session import run_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--routers', type=int, default=50)
+    parser.add_argument('--hosts', type=int, default=100, help='DHCP clients of each router')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--max-concurrency', type=int, default=None)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--port', type=int, default=5100)
+    args = parser.parse_args()
+
+    host = '127.0.0.1'
+    servers = []
+    routers = []
+    try:
+        for i in range(args.routers):
+            app = create_app(RouterState.synthetic(args.hosts), latency=args.latency,
+                             max_concurrency=args.max_concurrency, drop_rate=args.drop_rate, seed=i)
+            servers.append(run_server(host, args.port + i, app))
+            routers.append(RouterConfig(f'{host}:{args.port + i}', 'admin', 'password', name=f'router-{i}'))
+
+        with FleetPoller(routers, max_workers=args.workers, timeout=2, retries=2, backoff=0.05) as poller:
+            for round_number in range(args.rounds):
+                start = time.perf_counter()
+                results = poller.poll('get_dhcp_clients')
+                elapsed = time.perf_counter() - start
+                failed = sum(not r.ok for r in results.values())
+                attempts = sum(r.attempts for r in results.values())
+                print(f'round {round_number}  {elapsed * 1000:9.1f}ms  {len(routers) / elapsed:8.1f} routers/s  '
+                      f'failed={failed} attempts={attempts}')
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
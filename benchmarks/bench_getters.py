@@ -0,0 +1,98 @@
+"""Drives the public ArcherConnection getters against the mock router and reports latency percentiles, network vs
+parse time and allocations.
+
+Every getter is timed as users call it, the WiFi ones for both bands and the iter_* ones consumed to the end. The
+network and parse times come from the RequestEvent of each call: the streaming iter_* getters parse while receiving,
+so they have no separate parse time. DHCP client and lease tables are synthesized with --hosts entries, --latency
+adds a fixed delay to every response. Allocations are the memory blocks held by the result and the peak traced
+memory of a whole call, request included.
+Run from the repository root with ``python -m benchmarks.bench_getters``.
+"""
+
+import time
+import argparse
+import tracemalloc
+
+from tplink_archer import ArcherConnection, RequestEvent, WifiFreq
+from tests.test_server import create_app
+from tests.test_server.state import RouterState
+from .bench_session import run_server
+
+
+GETTERS = [
+    ('get_stats', lambda c: c.get_stats()),
+    ('get_external_ip', lambda c: c.get_external_ip()),
+    ('get_dhcp_clients', lambda c: c.get_dhcp_clients()),
+    ('iter_dhcp_clients', lambda c: list(c.iter_dhcp_clients())),
+    ('get_wifi_clients 2.4GHz', lambda c: c.get_wifi_clients(WifiFreq.WIFI_2G)),
+    ('get_wifi_clients 5GHz', lambda c: c.get_wifi_clients(WifiFreq.WIFI_5G)),
+    ('iter_wifi_clients 2.4GHz', lambda c: list(c.iter_wifi_clients(WifiFreq.WIFI_2G))),
+    ('iter_wifi_clients 5GHz', lambda c: list(c.iter_wifi_clients(WifiFreq.WIFI_5G))),
+    ('get_dhcp_leases', lambda c: c.get_dhcp_leases()),
+    ('get_port_forwarding_rules', lambda c: c.get_port_forwarding_rules()),
+]
+
+
+def percentile(timings: list, p: float) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+
+def measure(connection: ArcherConnection, getter, calls: int):
+    events = []
+    connection.add_hook(events.append)
+    total = []
+    try:
+        for _ in range(calls):
+            start = time.perf_counter()
+            getter(connection)
+            total.append(time.perf_counter() - start)
+    finally:
+        connection.hooks.remove(events.append)
+    network = [(e.connect_time or 0.0) + (e.transfer_time or 0.0) for e in events]
+    parsing = [e.parse_time for e in events if e.parse_time is not None]
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = getter(connection)
+    after = tracemalloc.take_snapshot()
+    del result
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return network, parsing, total, blocks, peak
+
+
+def mean_ms(timings: list) -> str:
+    return f'{sum(timings) / len(timings) * 1000:7.3f}ms' if timings else f'{"-":>9}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hosts', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--port', type=int, default=5002)
+    args = parser.parse_args()
+
+    host = '127.0.0.1'
+    router_url = f'{host}:{args.port}'
+    print(f'{"getter":<26} {"hosts":>6} {"p50":>9} {"p90":>9} {"p99":>9} {"network":>9} {"parse":>9} '
+          f'{"blocks":>8} {"peak":>9}')
+    for hosts in args.hosts:
+        server = run_server(host, args.port, create_app(RouterState.synthetic(hosts), latency=args.latency))
+        try:
+            with ArcherConnection(router_url) as connection:
+                connection.authenticate('admin', 'password')
+                for name, getter in GETTERS:
+                    network, parsing, total, blocks, peak = measure(connection, getter, args.calls)
+                    print(f'{name:<26} {hosts:>6} {percentile(total, 0.5) * 1000:7.3f}ms '
+                          f'{percentile(total, 0.9) * 1000:7.3f}ms {percentile(total, 0.99) * 1000:7.3f}ms '
+                          f'{mean_ms(network)} {mean_ms(parsing)} {blocks:>8} {peak / 1024:7.1f}KiB')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
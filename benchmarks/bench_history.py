@@ -0,0 +1,78 @@
+"""Times HistoryStore writes, downsampling and queries over months of synthetic snapshots of many routers.
+
+Run from the repository root with ``python -m benchmarks.bench_history``.
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from tplink_archer import HistoryStore, HostInventory
+from tplink_archer.inventory import Host
+
+DAY = 86400
+
+
+def synthetic_inventory(rng: random.Random, hosts: int) -> HostInventory:
+    inventory = []
+    for i in rng.sample(range(hosts * 2), hosts):
+        host = Host(f'AA:BB:CC:{i >> 16 & 0xFF:02X}:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}')
+        host.ip_address = f'192.168.{i >> 8 & 0xFF}.{i & 0xFF}'
+        host.hostname = f'host-{i}'
+        host.is_dhcp_client = True
+        inventory.append(host)
+    return HostInventory(inventory)
+
+
+def timed(label: str, func, repeat: int = 100):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{label:30} {elapsed * 1000:9.3f}ms')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--routers', type=int, default=20)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--hosts', type=int, default=50, help='hosts of each router in every snapshot')
+    parser.add_argument('--stats-interval', type=int, default=300, help='seconds between stats snapshots')
+    parser.add_argument('--hosts-interval', type=int, default=3600, help='seconds between host snapshots')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    routers = [f'router-{i}' for i in range(args.routers)]
+    end = args.days * DAY
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(os.path.join(directory, 'history.db'))
+
+        start = time.perf_counter()
+        snapshots = 0
+        for timestamp in range(0, end, args.stats_interval):
+            with_hosts = timestamp % args.hosts_interval == 0
+            store.record_many((router, synthetic_inventory(rng, args.hosts) if with_hosts else None,
+                               {'current_down_rate': rng.randint(10000, 20000), 'current_up_rate': 1000},
+                               timestamp) for router in routers)
+            snapshots += len(routers)
+        elapsed = time.perf_counter() - start
+        print(f'wrote {snapshots} snapshots in {elapsed:.1f}s  {snapshots / elapsed:.0f} snapshots/s')
+
+        start = time.perf_counter()
+        store.apply_retention(now=end)
+        print(f'retention {time.perf_counter() - start:.2f}s  '
+              f'database {os.path.getsize(store.path) / 1024 / 1024:.1f}MB')
+
+        timed('last seen, one router', lambda: store.last_seen('AA:BB:CC:00:00:01', routers[0]))
+        timed('last seen, any router', lambda: store.last_seen('AA:BB:CC:00:00:01'))
+        timed('lease churn per day, 30 days', lambda: store.lease_churn(routers[0], end - 30 * DAY, end))
+        timed('line rate, last week', lambda: store.line_rates(routers[0], end - 7 * DAY, end))
+        timed('line rate, whole history', lambda: store.line_rates(routers[0], 0, end, interval=DAY))
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Measures memory held by parsed Sections and DHCPLease objects.
+
+Run from the repository root with ``python -m benchmarks.bench_memory``.
+"""
+
+import argparse
+import tracemalloc
+
+from tplink_archer import Stack, DHCPLease, parsers
+from .bench_stack import synthetic_stack
+
+
+def measure(func):
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def plain_dicts(data: str) -> list:
+    sections = []
+    for line in data.split('\n'):
+        if line.startswith('['):
+            values = {}
+            sections.append((line, values))
+        else:
+            key, _, value = line.partition('=')
+            values[key] = value
+    return sections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=100000)
+    args = parser.parse_args()
+
+    data = synthetic_stack(args.entries)
+
+    _, baseline = measure(lambda: plain_dicts(data))
+    stack, sections = measure(lambda: Stack(data))
+    _, clients = measure(lambda: parsers.parse_dhcp_clients(stack))
+    _, leases = measure(lambda: [DHCPLease(s.identifier, s.values.get('IPAddress'), s.values.get('MACAddress'), True)
+                                 for s in stack.sections])
+
+    print(f'{args.entries} entries')
+    print(f'dict per section  {baseline / 2 ** 20:8.1f}MiB')
+    print(f'Stack             {sections / 2 ** 20:8.1f}MiB')
+    print(f'client dicts      {clients / 2 ** 20:8.1f}MiB')
+    print(f'DHCPLease objects {leases / 2 ** 20:8.1f}MiB')
+
+
+if __name__ == '__main__':
+    main()
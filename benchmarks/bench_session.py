@@ -0,0 +1,74 @@
+"""Compares per-call latency of the pooled keep-alive session against one connection per request.
+
+Both sides time the same get_stats() call, the unpooled one closes the pooled connections of the session before each
+call, outside of the timing, so only the new connection makes the difference.
+
+Run from the repository root with ``python -m benchmarks.bench_session``.
+"""
+
+import time
+import logging
+import argparse
+import statistics
+import threading
+
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from tplink_archer import ArcherConnection
+from tests.test_server import create_app
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+
+def run_server(host: str, port: int, app=None):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server(host, port, app or create_app(), threaded=True, request_handler=KeepAliveRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def measure(func, calls: int, setup=None) -> list:
+    timings = []
+    for _ in range(calls):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f'{name:<12} mean={statistics.mean(timings) * 1000:7.3f}ms '
+          f'median={statistics.median(timings) * 1000:7.3f}ms p95={p95 * 1000:7.3f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+
+    host = '127.0.0.1'
+    server = run_server(host, args.port)
+    router_url = f'{host}:{args.port}'
+    try:
+        connection = ArcherConnection(router_url)
+        connection.authenticate('admin', 'password')
+        connection.get_stats()
+
+        report('unpooled', measure(connection.get_stats, args.calls, setup=connection.session.close))
+        report('pooled', measure(connection.get_stats, args.calls))
+        connection.close()
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
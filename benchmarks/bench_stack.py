@@ -0,0 +1,42 @@
+"""Measures Stack parse throughput on synthetic responses from 10 to 100k sections.
+
+Run from the repository root with ``python -m benchmarks.bench_stack``.
+"""
+
+import time
+import argparse
+
+from tplink_archer import Stack
+
+
+def synthetic_stack(sections: int) -> str:
+    lines = []
+    for i in range(sections):
+        lines.append(f'[1,{i % 256},{i // 256},0,0,0]0')
+        lines.append('leaseTimeRemaining=-1')
+        lines.append(f'MACAddress=A8:3E:0F:2A:{(i >> 8) & 0xff:02X}:{i & 0xff:02X}')
+        lines.append(f'hostName=host-{i}')
+        lines.append(f'IPAddress=10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}')
+    lines.append('[error]0')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        data = synthetic_stack(size)
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            Stack(data)
+            best = min(best, time.perf_counter() - start)
+        print(f'{size:>7} sections  {best * 1000:9.3f}ms  {size / best:12,.0f} sections/s  '
+              f'{len(data) / best / 1e6:7.1f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
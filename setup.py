@@ -18,11 +18,14 @@ setup(
     long_description_content_type='text/markdown',
     url='https://github.com/marcovolpato00/tplink-archer',
     license='MIT',
-    packages=find_packages(exclude=['*.tests', '*.tests.*', 'tests.*', 'tests']),
+    packages=find_packages(exclude=['*.tests', '*.tests.*', 'tests.*', 'tests', 'benchmarks', 'benchmarks.*']),
     install_requires=[
         'requests>=2.22.0',
         'click==7.1.2'
     ],
+    extras_require={
+        'async': ['aiohttp>=3.6.0']
+    },
     python_requires='>=3.7',
     entry_points={
         'console_scripts': [
@@ -0,0 +1,65 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from tplink_archer import AsyncArcherConnection, WifiFreq
+from tplink_archer.exceptions import AuthError
+
+from .test_server import create_app_mock
+from .test_server.state import RouterState
+
+
+def test_async_queries(test_server):
+    async def poll():
+        async with AsyncArcherConnection('127.0.0.1:5000') as connection:
+            await connection.authenticate('admin', 'password')
+            results = await asyncio.gather(
+                connection.get_dhcp_leases(),
+                connection.get_external_ip(),
+                connection.get_stats(),
+                connection.get_dhcp_clients(),
+                connection.get_wifi_clients(WifiFreq.WIFI_2G),
+                connection.get_wifi_clients(WifiFreq.WIFI_5G),
+                connection.get_port_forwarding_rules(),
+            )
+        return results
+
+    with test_server.run('127.0.0.1', 5000):
+        leases, external_ip, stats, dhcp_clients, clients_2g, clients_5g, rules = asyncio.run(poll())
+
+    assert len(leases) == 4
+    assert stats['current_down_rate'] == 19129
+    assert len(dhcp_clients) == 5
+    assert clients_5g == ['A0:66:08:FC:7F:E2']
+    assert len(rules) == 3
+
+
+def test_async_writes_not_retried_after_timeout():
+    state = RouterState.synthetic(3)
+
+    async def create_lease():
+        async with AsyncArcherConnection('127.0.0.1:5000', max_retries=2) as connection:
+            await connection.authenticate('admin', 'password')
+            await connection.close()
+            connection.timeout = aiohttp.ClientTimeout(sock_read=0.2)
+            with pytest.raises(asyncio.TimeoutError):
+                await connection.create_dhcp_lease('192.168.1.200', 'AA:BB:CC:00:00:99', True)
+            await asyncio.sleep(0.6)
+
+    with create_app_mock(state=state, latency=0.3).run('127.0.0.1', 5000):
+        asyncio.run(create_lease())
+
+    assert len(state.leases) == 4
+
+
+def test_async_reauthentication(test_server):
+    async def authenticate():
+        async with AsyncArcherConnection('127.0.0.1:5000') as connection:
+            await connection.authenticate('admin', 'password')
+            with pytest.raises(AuthError):
+                await connection.authenticate('admin', 'wrong')
+            return connection.is_authenticated
+
+    with test_server.run('127.0.0.1', 5000):
+        assert asyncio.run(authenticate()) is False
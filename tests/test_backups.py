@@ -0,0 +1,68 @@
+import io
+import random
+from datetime import datetime, timezone, timedelta
+
+from tplink_archer import BackupStore, FleetPoller, RouterConfig
+from tplink_archer.backups import iter_chunks
+
+
+def random_bytes(seed: int, size: int) -> bytes:
+    return random.Random(seed).getrandbits(8 * size).to_bytes(size, 'little')
+
+
+def pieces(data: bytes, size: int = 5000):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def test_content_defined_chunks():
+    data = random_bytes(1, 200000)
+    chunks = list(iter_chunks(pieces(data)))
+    assert b''.join(chunks) == data
+    assert all(2048 <= len(c) <= 65536 for c in chunks[:-1])
+
+    assert list(iter_chunks(pieces(data, 1))) == chunks     # the same chunks whatever the size of the pieces
+
+    edited = data[:100000] + b'inserted' + data[100000:]
+    edited_chunks = list(iter_chunks(pieces(edited, 777)))
+    assert len(set(chunks) - set(edited_chunks)) <= 3
+
+
+def test_backup_store(tmp_path):
+    store = BackupStore(str(tmp_path))
+    config = random_bytes(2, 300000)
+    day = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    first = store.backup('office', pieces(config), created_at=day)
+    written = store.bytes_written
+    assert store.backup('office', pieces(config), created_at=day + timedelta(days=1)).timestamp == first.timestamp
+    assert store.bytes_written == written
+
+    changed = config[:150000] + b'\x00' * 10 + config[150010:]
+    second = store.backup('office', pieces(changed), created_at=day + timedelta(days=2))
+    assert store.bytes_written - written < len(config) / 4
+    store.backup('home', pieces(config), created_at=day)
+    assert store.bytes_written - written < len(config) / 4
+
+    assert store.routers() == ['home', 'office']
+    assert [m.timestamp for m in store.manifests('office')] == [first.timestamp, second.timestamp]
+    out = io.BytesIO()
+    assert store.restore(store.latest('office'), out) == len(changed)
+    assert out.getvalue() == changed
+
+    assert store.prune('office', keep=1) == 1
+    assert store.collect_garbage() == 0     # 'home' still references the chunks of the first backup
+
+
+def test_backup_fleet(test_server, tmp_path):
+    store = BackupStore(str(tmp_path))
+    routers = [
+        RouterConfig('127.0.0.1:5000', 'admin', 'password', name='alive'),
+        RouterConfig('127.0.0.1:5000', 'admin', 'password', name='alive-again'),
+    ]
+    with test_server.run('127.0.0.1', 5000):
+        with FleetPoller(routers, timeout=2, retries=0) as poller:
+            results = store.backup_fleet(poller)
+
+    assert results['alive'].ok and results['alive-again'].ok
+    assert store.routers() == ['alive', 'alive-again']     # same URL, saved under each name
+    assert b''.join(store.iter_restore(results['alive'].value)) == b'conf'
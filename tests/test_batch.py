@@ -0,0 +1,48 @@
+from tplink_archer import Query, QueryBatch, Stack, constants
+from tplink_archer.schemas import field_types_for_query
+
+
+def test_query_from_text():
+    query = Query.from_text(constants.EXTERNAL_IP_URL, constants.EXTERNAL_IP_QUERY)
+
+    assert len(query.blocks) == 14
+    assert query.url == constants.EXTERNAL_IP_URL
+    assert query.blocks[11].object_name == 'LAN_WLAN'
+    assert len(query.blocks[11].lines) == 12
+
+    query = Query.from_text(constants.STATS_URL, constants.STATS_QUERY)
+    assert query.body == constants.STATS_QUERY
+
+
+def test_batch_compose_and_split():
+    batch = QueryBatch().add('stats').add('dhcp_clients').add('wifi_clients_5g')
+    query = batch.query
+
+    assert query.url == 'cgi?1&5&5&6'
+    assert '[LAN_HOST_ENTRY#0,0,0,0,0,0#0,0,0,0,0,0]2,4\r\n' in query.body
+    assert '[LAN_WLAN_ASSOC_DEV#0,0,0,0,0,0#1,2,0,0,0,0]3,4\r\n' in query.body
+
+    response = ('[1,0,0,0,0,0]0\nupstreamCurrRate=1212\ndownstreamCurrRate=19129\n'
+                '[2,0,0,0,0,0]1\nCRCErrors=0\n'
+                '[1,0,0,0,0,0]2\nMACAddress=A8:3E:0F:2A:EF:B1\nhostName=foo\nIPAddress=192.168.1.1\n'
+                '[1,2,1,0,0,0]3\nassociatedDeviceMACAddress=A0:66:08:FC:7F:E2\n'
+                '[error]0')
+    results = batch.parse(Stack(response, field_types_for_query(query)))
+
+    assert results['stats']['current_down_rate'] == 19129
+    assert results['dhcp_clients'] == [
+        {'ip_address': '192.168.1.1', 'mac_address': 'A8:3E:0F:2A:EF:B1', 'hostname': 'foo'}
+    ]
+    assert results['wifi_clients_5g'] == ['A0:66:08:FC:7F:E2']
+
+
+def test_query_projection():
+    query = Query.from_text(constants.WIFI_CLIENTS_URL, constants.WIFI_5G_CLIENTS_QUERY)
+    projected = query.project({0: ['associatedDeviceMACAddress']})
+
+    assert projected.url == 'cgi?6'
+    assert projected.body == '[LAN_WLAN_ASSOC_DEV#0,0,0,0,0,0#1,2,0,0,0,0]0,1\r\nAssociatedDeviceMACAddress\r\n'
+
+    projected = Query.from_text(constants.STATS_URL, constants.STATS_QUERY).project({1: ['CRCErrors']})
+    assert projected.url == 'cgi?5'
+    assert projected.body == '[WAN_DSL_INTF_STATS_TOTAL#1,0,0,0,0,0#0,0,0,0,0,0]0,1\r\nCRCErrors\r\n'
@@ -0,0 +1,57 @@
+import pytest
+import requests
+
+from tplink_archer import ArcherConnection, ResponseCache, constants
+from tplink_archer.query import is_read_only_request
+
+
+def test_cache_hits(test_server):
+    cache = ResponseCache()
+    with test_server.run('127.0.0.1', 5000):
+        connection = ArcherConnection('127.0.0.1:5000', cache=cache)
+        connection.authenticate('admin', 'password')
+        leases = connection.get_dhcp_leases()
+        assert len(connection.get_dhcp_leases()) == len(leases)
+
+    assert cache.misses == 1
+    assert cache.hits == 1
+    assert len(connection.get_dhcp_leases()) == len(leases)     # served from cache, server is down
+
+
+def test_cache_invalidation():
+    cache = ResponseCache()
+    cache.put(constants.DHCP_LEASES_URL, constants.DHCP_LEASES_QUERY, 'leases')
+    cache.put(constants.DHCP_CLIENTS_URL, constants.DHCP_CLIENTS_QUERY, 'clients')
+
+    assert not is_read_only_request('post', constants.DHCP_LEASES_TOGGLE_URL)
+    cache.invalidate(constants.TOGGLE_DHCP_LEASE_COMMAND.format(raw_identifier='1,1,0,0,0,0', enabled='0'))
+
+    assert cache.get(constants.DHCP_LEASES_URL, constants.DHCP_LEASES_QUERY) is None
+    assert cache.get(constants.DHCP_CLIENTS_URL, constants.DHCP_CLIENTS_QUERY) == 'clients'
+    assert cache.invalidations == 1
+
+
+def test_cache_eviction():
+    cache = ResponseCache(max_entries=2, ttls={'stats': 0})
+    cache.put('cgi?1', 'a', 'a')
+    cache.put('cgi?1', 'b', 'b')
+    cache.get('cgi?1', 'a')
+    cache.put('cgi?1', 'c', 'c')
+    cache.put('cgi?1', 'stats', 'stats')
+
+    assert cache.get('cgi?1', 'b') is None
+    assert cache.get('cgi?1', 'a') == 'a'
+    assert cache.get('cgi?1', 'stats') is None
+    assert cache.evictions == 1
+
+
+def test_cache_invalidated_by_failed_write(test_server):
+    cache = ResponseCache()
+    with test_server.run('127.0.0.1', 5000):
+        connection = ArcherConnection('127.0.0.1:5000', cache=cache, max_retries=0)
+        connection.authenticate('admin', 'password')
+        lease = connection.get_dhcp_leases()[0]
+
+    with pytest.raises(requests.ConnectionError):
+        connection.toggle_dhcp_lease(lease, False)     # the write may have reached the router
+    assert cache.invalidations == 1
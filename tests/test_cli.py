@@ -0,0 +1,28 @@
+import json
+
+from click.testing import CliRunner
+
+from tplink_archer import __main__ as cli_module
+
+
+def test_output_formats(test_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(cli_module, 'CONFIG_FILE_PATH', tmp_path / 'config.json')
+    monkeypatch.setattr(cli_module, 'SESSION_FILE_PATH', tmp_path / 'session.json')
+    cli_module.save_config({'router_url': '127.0.0.1:5000', 'username': 'admin', 'password': 'password'})
+
+    runner = CliRunner()
+    with test_server.run('127.0.0.1', 5000):
+        ndjson = runner.invoke(cli_module.cli, ['dhcp-clients', '--format', 'ndjson'])
+        array = runner.invoke(cli_module.cli, ['dhcp-leases', '--format', 'json'])
+        csv = runner.invoke(cli_module.cli, ['wifi-clients', '--freq', '5g', '--format', 'csv'])
+        stats = runner.invoke(cli_module.cli, ['stats', '--format', 'json'])
+
+    clients = [json.loads(line) for line in ndjson.output.splitlines()]
+    assert clients[0] == {'ip_address': '192.168.1.1', 'mac_address': 'A8:3E:0F:2A:EF:B1', 'hostname': 'amazon-asd4545'}
+
+    leases = json.loads(array.output)
+    assert len(leases) == 4
+    assert leases[0]['identifier'] == '[1,1,0,0,0,0]0' and leases[0]['is_enabled'] is True
+
+    assert csv.output.splitlines()[0] == 'mac_address'
+    assert json.loads(stats.output)['current_up_rate'] == 1212
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from tplink_archer import ArcherConnection, DslStatsCollector, ResponseCache, RingBuffer, WifiTrafficTracker, WifiFreq
+from tplink_archer.collectors import PeriodicSampler
+
+
+def test_ring_buffer():
+    buffer = RingBuffer(('errors',), capacity=3)
+    for i, value in enumerate([10, 20, 5, 15]):
+        buffer.append(float(i), [value])
+
+    assert len(buffer) == 3
+    window = buffer.window()
+    assert list(window['timestamp']) == [1.0, 2.0, 3.0]
+    assert list(window['errors']) == [20, 5, 15]
+    assert list(buffer.window(2)['errors']) == [5, 15]
+    assert list(buffer.rates('errors')) == [5.0, 10.0]     # 20 -> 5 is a counter reset
+
+    buffer.append(4.0, [2 ** 32 - 10])
+    buffer.append(5.0, [90])
+    assert list(buffer.rates('errors', 2)) == [100.0]      # wrapped around
+
+
+def test_collector_sample(connection, test_server):
+    collector = DslStatsCollector(connection, capacity=10)
+    with test_server.run('127.0.0.1', 5000):
+        collector.sample()
+        collector.sample()
+
+    window = collector.window()
+    assert list(window['downstreamCurrRate']) == [19129.0, 19129.0]
+    assert list(window['ATUCFECErrors']) == [777.0, 777.0]
+    assert list(collector.error_rates()['FECErrors']) == [0.0]
+
+
+def test_collector_bypasses_cache(test_server):
+    cache = ResponseCache()
+    with test_server.run('127.0.0.1', 5000):
+        connection = ArcherConnection('127.0.0.1:5000', cache=cache)
+        connection.authenticate('admin', 'password')
+        collector = DslStatsCollector(connection, capacity=10)
+        collector.sample()
+        collector.sample()
+    assert cache.hits == 0 and len(collector.window()['timestamp']) == 2
+
+    with pytest.raises(TypeError):
+        PeriodicSampler(1.0)
+
+
+def test_wifi_traffic_tracker(connection, test_server):
+    tracker = WifiTrafficTracker(connection, stale_after=60, capacity=1)
+    with test_server.run('127.0.0.1', 5000):
+        tracker.sample()
+    assert len(tracker) == 6
+    assert tracker.rates('A0:66:08:FC:7F:E2') == (0.0, 0.0)
+    assert tracker.rates('4c:df:c0:c4:01:34') == (0.0, 0.0)
+
+    tracker = WifiTrafficTracker(connection, stale_after=60, capacity=1)
+    wifi_2g, wifi_5g = WifiFreq.WIFI_2G, WifiFreq.WIFI_5G
+    tracker.update(0.0, [('AA:00:00:00:00:01', wifi_2g, 100, 1000), ('AA:00:00:00:00:02', wifi_5g, 2 ** 32 - 10, 50)])
+    tracker.update(10.0, [('AA:00:00:00:00:01', wifi_2g, 600, 200), ('AA:00:00:00:00:02', wifi_5g, 90, 550)])
+    assert tracker.rates('AA:00:00:00:00:01') == (50.0, 20.0)     # received counter reset
+    assert tracker.rates('AA:00:00:00:00:02') == (10.0, 50.0)     # sent counter wrapped
+
+    assert [mac for mac, _, _ in tracker.top(1)] == ['AA:00:00:00:00:01']
+    assert [mac for mac, _, _ in tracker.top(1, by='received')] == ['AA:00:00:00:00:02']
+
+    tracker.update(100.0, [('AA:00:00:00:00:01', wifi_2g, 700, 300)])
+    assert len(tracker) == 1
+    assert tracker.rates('AA:00:00:00:00:02') is None
+
+
+def test_wifi_traffic_tracker_lifecycle(connection, test_server):
+    tracker = WifiTrafficTracker(connection, interval=0.05)
+    with test_server.run('127.0.0.1', 5000):
+        tracker.start()
+        threading.Event().wait(0.2)
+        tracker.stop()
+    assert len(tracker) == 6
+    assert tracker.errors == 0
+
+
+def test_wifi_traffic_tracker_concurrent_reads(test_server):
+    cache = ResponseCache()
+    with test_server.run('127.0.0.1', 5000):
+        connection = ArcherConnection('127.0.0.1:5000', cache=cache)
+        connection.authenticate('admin', 'password')
+        tracker = WifiTrafficTracker(connection, stale_after=0.01, capacity=1, interval=0.01)
+        tracker.start()
+        try:
+            for _ in range(200):
+                for mac_address, sent, received in tracker.top(10):
+                    assert sent >= 0 and received >= 0
+                tracker.rates('A0:66:08:FC:7F:E2')
+        finally:
+            tracker.stop()
+    assert cache.hits == 0
+    assert tracker.errors == 0
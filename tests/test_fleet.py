@@ -0,0 +1,50 @@
+import requests
+
+from tplink_archer import FleetPoller, RouterConfig
+
+
+def test_fleet_poll(test_server):
+    routers = [
+        RouterConfig('127.0.0.1:5000', 'admin', 'password', name='alive'),
+        RouterConfig('127.0.0.1:1', 'admin', 'password', name='dead'),
+    ]
+    with test_server.run('127.0.0.1', 5000):
+        with FleetPoller(routers, timeout=2, retries=1, backoff=0) as poller:
+            results = poller.poll('get_stats')
+
+    assert results['alive'].ok
+    assert results['alive'].value['current_up_rate'] == 1212
+    assert not results['dead'].ok
+    assert isinstance(results['dead'].error, requests.ConnectionError)
+    assert results['dead'].attempts == 2
+
+
+def test_fleet_shared_cache():
+    from tplink_archer import ResponseCache
+    from .test_server import create_app_mock
+    from .test_server.state import RouterState
+
+    routers = [
+        RouterConfig('127.0.0.1:5000', 'admin', 'password', name='small'),
+        RouterConfig('127.0.0.1:5001', 'admin', 'password', name='large'),
+    ]
+    small = create_app_mock(state=RouterState.synthetic(3))
+    large = create_app_mock(state=RouterState.synthetic(7))
+    with small.run('127.0.0.1', 5000), large.run('127.0.0.1', 5001):
+        with FleetPoller(routers, max_workers=1, timeout=2, retries=0, cache=ResponseCache()) as poller:
+            results = poller.poll('get_dhcp_leases')
+
+    assert len(results['small'].value) == 3
+    assert len(results['large'].value) == 7
+
+
+def test_fleet_connection_retries():
+    from .test_server import create_app_mock
+
+    server = create_app_mock(drop_rate=0.3, seed=1)
+    with server.run('127.0.0.1', 5000):
+        routers = [RouterConfig('127.0.0.1:5000', 'admin', 'password', name='flaky')]
+        with FleetPoller(routers, timeout=2, retries=0) as poller:
+            results = [poller.poll('get_stats')['flaky'] for _ in range(5)]
+
+    assert all(r.ok and r.attempts == 1 for r in results)     # dropped reads retried by the connection
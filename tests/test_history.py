@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from tplink_archer import HistoryStore, HostInventory
+from tplink_archer.inventory import Host
+from tplink_archer.models import DHCPLease
+
+DAY = 86400
+
+
+def make_inventory(clients: dict, leases: dict = None) -> HostInventory:
+    hosts = []
+    for mac_address, ip_address in clients.items():
+        host = Host(mac_address)
+        host.ip_address = ip_address
+        host.is_dhcp_client = True
+        hosts.append(host)
+    for mac_address, ip_address in (leases or {}).items():
+        host = Host(mac_address)
+        host.lease = DHCPLease('1,1,0,0,0,0', ip_address, mac_address, True)
+        hosts.append(host)
+    return HostInventory(hosts)
+
+
+def test_history_snapshot(connection, test_server, tmp_path):
+    with HistoryStore(str(tmp_path / 'history.db')) as store:
+        with test_server.run('127.0.0.1', 5000):
+            store.snapshot(connection, 'home', timestamp=1000)
+
+        assert store.routers() == ['home']
+        assert store.last_seen('a8-3e-0f-2a-ef-b1') == 1000
+        assert store.last_seen('A8:3E:0F:2A:EF:B1', router='office') is None
+        assert store.line_rates('home', 0, 2000)[0][1:] == (1, 19129.0, 19129, 19129)
+        assert store.lease_churn('home', 0, DAY) == []      # the first snapshot is not a churn
+        assert len(store.hosts_seen('home', 1000)) > 0
+
+
+def test_history_lease_churn():
+    store = HistoryStore(':memory:')
+    store.record('r1', make_inventory({'AA:00:00:00:00:01': '10.0.0.1', 'AA:00:00:00:00:02': '10.0.0.2'}),
+                 timestamp=100)
+    store.record('r1', make_inventory({'AA:00:00:00:00:01': '10.0.0.9'}, {'AA:00:00:00:00:03': '10.0.0.3'}),
+                 timestamp=DAY + 100)
+    store.record_many([('r1', make_inventory({'AA:00:00:00:00:01': '10.0.0.9'}), None, DAY + 200),
+                       ('r2', make_inventory({'AA:00:00:00:00:01': '10.0.0.1'}), None, 2 * DAY)])
+
+    assert store.lease_churn('r1', 0, 3 * DAY) == [(DAY, 0, 1, 1)]
+    assert store.lease_churn('r1', 0, 3 * DAY, kind='static') == [(DAY, 1, 1, 0)]
+    assert store.last_seen('aa-00-00-00-00-01', router='r1') == DAY + 200
+    assert store.last_seen('aa-00-00-00-00-01') == 2 * DAY
+    assert store.last_seen('aa-00-00-00-00-02') == 100
+
+    store.apply_retention(now=2 * DAY + 50, retention=DAY)
+    assert store.last_seen('aa-00-00-00-00-02') is None
+    assert store.lease_churn('r1', 0, 3 * DAY) == [(DAY, 0, 1, 1)]
+
+
+def test_history_downsampling():
+    store = HistoryStore(':memory:', downsample_interval=60)
+    for t in range(0, 600, 10):
+        store.record('r1', stats={'current_down_rate': t, 'current_up_rate': 1}, timestamp=t)
+
+    before = store.line_rates('r1', 0, 600, interval=120)
+    assert before[0] == (0, 12, 55.0, 0, 110)
+
+    assert store.downsample(300) == 30
+    assert store.line_rates('r1', 0, 600, interval=120) == before
+    store.record('r1', stats={'current_down_rate': 5}, timestamp=5)
+    store.downsample(300)
+    assert store.line_rates('r1', 0, 60, interval=60) == [(0, 7, 155 / 7, 0, 50)]     # merged into the bucket
+
+    assert store.apply_retention(now=10 * DAY, retention=DAY) == 30 + 10     # raw rows, then buckets
+    assert store.line_rates('r1', 0, 600) == []
+
+
+def test_history_missing_fields():
+    store = HistoryStore(':memory:', downsample_interval=60)
+    for t, up_rate in [(0, 10), (10, None), (20, 30), (70, None)]:
+        store.record('r1', stats={'current_down_rate': 1, 'current_up_rate': up_rate}, timestamp=t)
+
+    expected = [(0, 2, 20.0, 10, 30), (60, 0, None, None, None)]
+    assert store.line_rates('r1', 0, 120, field='current_up_rate', interval=60) == expected
+    store.downsample(120)
+    assert store.line_rates('r1', 0, 120, field='current_up_rate', interval=60) == expected
+    assert store.line_rates('r1', 0, 120, interval=60) == [(0, 3, 1.0, 1, 1), (60, 1, 1.0, 1, 1)]
+
+
+def test_history_rolled_back_router():
+    store = HistoryStore(':memory:')
+    with pytest.raises(AttributeError):
+        store.record('r1', stats=object(), timestamp=0)
+    store.record('r1', stats={'current_down_rate': 1}, timestamp=0)
+    assert store.routers() == ['r1']
+    assert store.line_rates('r1', 0, 60)[0][1] == 1
+
+
+def test_history_concurrent_reads():
+    store = HistoryStore(':memory:')
+    store.record('r1', make_inventory({'AA:00:00:00:00:01': '10.0.0.1'}), timestamp=100)
+    done = threading.Event()
+
+    def write():
+        for t in range(200, 2200):
+            store.record('r1', make_inventory({'AA:00:00:00:00:01': '10.0.0.1'}), timestamp=t)
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not done.is_set():
+        assert store.last_seen('AA:00:00:00:00:01') >= 100
+        assert store.lease_churn('r1', 0, DAY) == []
+    writer.join()
+    assert store.last_seen('AA:00:00:00:00:01', router='r1') == 2199
@@ -0,0 +1,25 @@
+from tplink_archer import HostInventory, WifiFreq
+
+
+def test_host_inventory(connection, test_server):
+    events = []
+    connection.add_hook(events.append)
+    with test_server.run('127.0.0.1', 5000):
+        inventory = HostInventory.fetch(connection)
+
+    assert len(events) == 1
+    assert events[0].url == 'cgi?5&5&6&6'
+    assert events[0].endpoint == 'batch'
+
+    host = inventory.get('a8-3e-0f-2a-ef-b1')
+    assert host.ip_address == '192.168.1.1'
+    assert host.hostname == 'amazon-asd4545'
+    assert host.is_dhcp_client and host.is_lease_enabled
+    assert host.band == WifiFreq.WIFI_2G
+    assert host.packets_received == 1488
+
+    assert inventory.get_by_ip('192.168.1.1') is host
+    assert inventory.get_by_hostname('AMAZON-ASD4545') == [host]
+    assert inventory.get('A0:66:08:FC:7F:E2').band == WifiFreq.WIFI_5G
+    assert inventory.get('00:00:00:00:00:00') is None
+    assert host.to_dict()['band'] == 'WIFI_2G'
@@ -0,0 +1,38 @@
+import pytest
+
+from tplink_archer import ArcherConnection, MetricsRecorder, ResponseCache
+from tplink_archer.exceptions import AuthError
+
+
+def test_request_metrics(test_server):
+    metrics = MetricsRecorder()
+    events = []
+    with test_server.run('127.0.0.1', 5000):
+        connection = ArcherConnection('127.0.0.1:5000', cache=ResponseCache(), hooks=[metrics, events.append])
+        connection.authenticate('admin', 'password')
+        connection.get_stats()
+        connection.get_stats()
+        connection.get_dhcp_clients()
+        connection.authenticate('admin', 'wrong', lazy=True)
+        with pytest.raises(AuthError):
+            connection.api_request('get', 'main/status.htm')
+
+    stats, cached, clients, failed = events
+    assert stats.endpoint == 'stats' and stats.status == 200
+    assert stats.connect_time > 0 and stats.transfer_time >= 0 and stats.parse_time > 0
+    assert stats.response_size > 0
+    assert cached.cached and cached.parse_time is not None
+    assert clients.endpoint == 'dhcp_clients'
+    assert failed.error == 'AuthError' and failed.auth_retries == 1
+
+    assert metrics.requests == {'stats': 2, 'dhcp_clients': 1, 'main/status.htm': 1}
+    assert metrics.errors == {('main/status.htm', 'AuthError'): 1}
+    assert list(metrics.total_time())[0] in ('stats', 'dhcp_clients')
+
+    text = metrics.to_openmetrics()
+    assert 'archer_requests_total{endpoint="stats"} 2' in text
+    assert 'archer_cache_hits_total{endpoint="stats"} 1' in text
+    assert 'archer_auth_retries_total{endpoint="main/status.htm"} 1' in text
+    assert 'archer_request_duration_seconds_count{endpoint="stats",phase="parse"} 2' in text
+    assert 'archer_response_size_bytes_bucket{endpoint="stats",le="+Inf"} 2' in text
+    assert text.endswith('# EOF\n')
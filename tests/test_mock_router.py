@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+import requests
+
+from tplink_archer import ArcherConnection
+from tplink_archer.exceptions import RequestError
+
+from .test_server import create_app_mock
+from .test_server.state import RouterState
+
+
+def test_synthetic_tables():
+    server = create_app_mock(state=RouterState.synthetic(1000))
+    with server.run('127.0.0.1', 5000):
+        with ArcherConnection('127.0.0.1:5000') as connection:
+            connection.authenticate('admin', 'password')
+            clients = connection.get_dhcp_clients()
+            leases = connection.get_dhcp_leases()
+            connection.delete_dhcp_lease(leases[0])
+            assert len(connection.get_dhcp_leases()) == 999
+
+    assert len(clients) == 1000
+    assert clients[-1]['hostname'] == 'host-999'
+
+
+def test_fault_injection():
+    server = create_app_mock(max_concurrency=1, latency=0.2)
+    with server.run('127.0.0.1', 5000):
+        slow = ArcherConnection('127.0.0.1:5000', max_retries=0)
+        fast = ArcherConnection('127.0.0.1:5000', max_retries=0)
+        slow.authenticate('admin', 'password', lazy=True)
+        fast.authenticate('admin', 'password', lazy=True)
+
+        thread = threading.Thread(target=slow.get_stats)
+        thread.start()
+        assert server.app.config['SLOT_ACQUIRED'].wait(5)
+        with pytest.raises(RequestError):
+            fast.get_stats()
+        thread.join()
+
+    server = create_app_mock(drop_rate=1.0)
+    with server.run('127.0.0.1', 5000):
+        connection = ArcherConnection('127.0.0.1:5000', max_retries=0)
+        connection.authenticate('admin', 'password', lazy=True)
+        with pytest.raises(requests.ConnectionError):
+            connection.get_stats()
+
+
+def test_writes_not_retried_after_timeout():
+    state = RouterState.synthetic(3)
+    server = create_app_mock(state=state, latency=0.5)
+    with server.run('127.0.0.1', 5000):
+        connection = ArcherConnection('127.0.0.1:5000', read_timeout=0.2, max_retries=2)
+        connection.authenticate('admin', 'password', lazy=True)
+        with pytest.raises(requests.Timeout):
+            connection.create_dhcp_lease('192.168.1.200', 'AA:BB:CC:00:00:99', True)
+        threading.Event().wait(0.6)
+
+    assert len(state.leases) == 4
@@ -0,0 +1,88 @@
+import pytest
+
+from tplink_archer import DHCPLease, PortForwardingRule
+from tplink_archer.reconcile import diff_dhcp_leases, diff_port_forwarding_rules, split_in_batches
+
+
+def test_diff_dhcp_leases():
+    current = [
+        DHCPLease('[1,1,0,0,0,0]0', '192.168.1.1', 'A8:3E:0F:2A:EF:B1', True),
+        DHCPLease('[1,2,0,0,0,0]0', '192.168.1.2', '9A:88:6B:3E:C0:39', True),
+        DHCPLease('[1,3,0,0,0,0]0', '192.168.1.3', 'F4:2E:55:3C:0F:FB', True),
+    ]
+    desired = [
+        DHCPLease(None, '192.168.1.1', 'a8:3e:0f:2a:ef:b1', True),
+        DHCPLease(None, '192.168.1.20', '9A:88:6B:3E:C0:39', False),
+        DHCPLease(None, '192.168.1.4', 'B4:DF:99:48:57:3E', True),
+    ]
+    changes = diff_dhcp_leases(current, desired)
+
+    assert [l.mac_address for l in changes.create] == ['B4:DF:99:48:57:3E']
+    assert [l.ip_address for l in changes.delete] == ['192.168.1.3']
+    assert [(c.ip_address, d.ip_address) for c, d in changes.update] == [('192.168.1.2', '192.168.1.20')]
+
+    queries = split_in_batches(changes.to_blocks(), max_batch_size=2)
+    assert [q.url for q in queries] == ['cgi?4&2', 'cgi?3']
+    assert queries[0].body == ('[LAN_DHCP_STATIC_ADDR#1,3,0,0,0,0#0,0,0,0,0,0]0,0\r\n'
+                               '[LAN_DHCP_STATIC_ADDR#1,2,0,0,0,0#0,0,0,0,0,0]1,2\r\n'
+                               'yiaddr=192.168.1.20\r\nenable=0\r\n')
+    assert queries[1].body == ('[LAN_DHCP_STATIC_ADDR#0,0,0,0,0,0#1,0,0,0,0,0]0,3\r\n'
+                               'chaddr=B4:DF:99:48:57:3E\r\nyiaddr=192.168.1.4\r\nenable=1\r\n')
+
+    assert len(diff_dhcp_leases(current, current)) == 0
+
+
+def test_diff_port_forwarding_rules():
+    current = [
+        PortForwardingRule('[1,1,1,1,0,0]1', '192.168.1.10', 80, 80, True, 'TCP'),
+        PortForwardingRule('[1,1,1,2,0,0]1', '192.168.1.11', 22, 2222, True, 'TCP'),
+        PortForwardingRule('[1,1,1,3,0,0]1', '192.168.1.12', 53, 53, True, 'UDP'),
+    ]
+    desired = [
+        PortForwardingRule(None, '192.168.1.10', '80', '80', True, 'TCP'),
+        PortForwardingRule(None, '192.168.1.11', 22, 2222, False, 'TCP'),
+        PortForwardingRule(None, '192.168.1.13', 6000, 6000, True, 'TCP or UDP', 6010, 6010),
+    ]
+    assert desired[1].external_port_end == 2222
+
+    changes = diff_port_forwarding_rules(current, desired)
+    assert [r.external_port for r in changes.create] == [6000]
+    assert [r.client_ip_address for r in changes.delete] == ['192.168.1.12']
+    assert [c.raw_identifier for c, _ in changes.update] == ['1,1,1,2,0,0']
+
+    queries = split_in_batches(changes.to_blocks(), max_batch_size=16)
+    assert [q.url for q in queries] == ['cgi?4&2&3']
+    blocks = queries[0].body.split('\r\n[')
+    assert blocks[0] == '[WAN_PPP_CONN_PORTMAPPING#1,1,1,3,0,0#0,0,0,0,0,0]0,0'
+    assert blocks[1].startswith('WAN_PPP_CONN_PORTMAPPING#1,1,1,2,0,0#0,0,0,0,0,0]1,7')
+    assert 'portMappingEnabled=0' in blocks[1]
+    assert blocks[2].startswith('WAN_PPP_CONN_PORTMAPPING#0,0,0,0,0,0#1,1,1,0,0,0]2,7')
+    assert 'X_TP_ExternalPortEnd=6010' in blocks[2]
+
+    assert len(diff_port_forwarding_rules(current, current)) == 0
+    with pytest.raises(ValueError):
+        diff_port_forwarding_rules([], desired).to_blocks()
+    changes = diff_port_forwarding_rules([], desired, object_name='WAN_IP_CONN_PORTMAPPING',
+                                         parent_stack='1,1,1,0,0,0')
+    assert len(changes.to_blocks()) == 3
+
+    odd = PortForwardingRule('[1,1,1,4,0,0]1', '192.168.1.14', None, 'any', True, 'TCP')
+    changes = diff_port_forwarding_rules(current + [odd], current + [odd])
+    assert len(changes) == 0
+    assert diff_port_forwarding_rules([odd], []).delete == [odd]
+
+
+def test_apply_dhcp_leases(connection, test_server):
+    with test_server.run('127.0.0.1', 5000):
+        lease = connection.create_dhcp_lease('192.168.1.50', 'C0:FF:EE:00:00:01', True)
+        connection.disable_dhcp_lease(lease)
+        assert [l.is_enabled for l in connection.get_dhcp_leases() if l.ip_address == '192.168.1.50'] == [False]
+
+        desired = [DHCPLease(None, '192.168.1.60', 'C0:FF:EE:00:00:01', True),
+                   DHCPLease(None, '192.168.1.61', 'C0:FF:EE:00:00:02', True)]
+        leases = connection.apply_dhcp_leases(desired, max_batch_size=2)
+
+    assert sorted((l.mac_address, l.ip_address, l.is_enabled) for l in leases) == [
+        ('C0:FF:EE:00:00:01', '192.168.1.60', True),
+        ('C0:FF:EE:00:00:02', '192.168.1.61', True),
+    ]
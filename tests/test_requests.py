@@ -1,4 +1,6 @@
-from tplink_archer import WifiFreq
+import pytest
+
+from tplink_archer import ArcherConnection, AuthError, WifiFreq
 
 
 def test_queries(connection, test_server):
@@ -19,3 +21,51 @@ def test_downloads(connection, test_server):
             content = f.read()
             assert content == 'conf'
 
+
+def test_downloads_unchanged(connection, test_server, tmp_path):
+    with test_server.run('127.0.0.1', 5000):
+        digest = connection.download_config_backup(str(tmp_path))
+        backup = tmp_path.joinpath('conf.bin')
+        modified_at = backup.stat().st_mtime_ns
+
+        assert connection.download_config_backup(str(tmp_path)) == digest
+        assert backup.stat().st_mtime_ns == modified_at
+        assert [p.name for p in tmp_path.iterdir()] == ['conf.bin']
+
+
+def test_streaming_queries(connection, test_server):
+    with test_server.run('127.0.0.1', 5000):
+        assert list(connection.iter_dhcp_clients()) == connection.get_dhcp_clients()
+        assert list(connection.iter_wifi_clients(WifiFreq.WIFI_2G)) == connection.get_wifi_clients(WifiFreq.WIFI_2G)
+
+
+def test_lazy_authentication(test_server):
+    connection = ArcherConnection('127.0.0.1:5000')
+    connection.authenticate('admin', 'password', lazy=True)
+
+    with test_server.run('127.0.0.1', 5000):
+        assert len(connection.get_dhcp_leases()) == 4
+
+        connection.authenticate('admin', 'wrong', lazy=True)
+        with pytest.raises(AuthError):
+            connection.api_request('get', 'main/status.htm')
+
+
+def test_field_projection(connection, test_server):
+    events = []
+    connection.add_hook(events.append)
+    with test_server.run('127.0.0.1', 5000):
+        assert connection.get_stats(fields=['current_down_rate']) == {'current_down_rate': 19129}
+        clients = connection.get_dhcp_clients(fields=('mac_address',))
+        assert list(connection.iter_dhcp_clients(fields=('mac_address',))) == clients
+        with pytest.raises(ValueError):
+            connection.get_dhcp_clients(fields=('lease',))
+
+    assert clients[0] == {'mac_address': 'A8:3E:0F:2A:EF:B1'}
+    assert events[0].endpoint == 'stats'
+
+
+def test_star_import():
+    namespace = {}
+    exec('from tplink_archer import *', namespace)
+    assert {'ArcherConnection', 'Stack', 'HostInventory', 'AuthError'} <= set(namespace)
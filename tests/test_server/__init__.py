@@ -1,23 +1,90 @@
-from flask import Flask
-from http_server_mock import HttpServerMock
+import random
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from flask import Flask, Response, request, g
+from werkzeug.serving import make_server
 
 from .server import main
+from .state import RouterState
+from .requests_map import RESPONSES
+from tplink_archer import constants
 
 
-def create_app_mock():
-    app = HttpServerMock(__name__)
+def create_app(state: Optional[RouterState] = None, latency: float = 0.0, max_concurrency: Optional[int] = None,
+               drop_rate: float = 0.0, seed: Optional[int] = None):
+    """Mock router app
 
-    app.register_blueprint(main)
+    :param state: mutable router tables, None to serve only the static responses
+    :param latency: seconds every response is delayed by
+    :param max_concurrency: requests served at the same time, the others get 503 as a throttled router would
+    :param drop_rate: fraction of requests whose connection is closed without a response
+    :param seed: random seed of the dropped requests
+    """
+    app = Flask(__name__)
+    app.config['ROUTER_STATE'] = state
+    app.config['SLOT_ACQUIRED'] = threading.Event()     # set when a request holds one of the max_concurrency slots
 
-    return app
+    slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+    rng = random.Random(seed)
 
+    if latency or slots or drop_rate:
+        @app.before_request
+        def inject_faults():
+            if slots is not None:
+                if not slots.acquire(blocking=False):
+                    return Response('Too many requests', status=503)
+                g.slot = True
+                app.config['SLOT_ACQUIRED'].set()
+            if drop_rate and rng.random() < drop_rate:
+                sock = request.environ.get('werkzeug.socket')
+                if sock is not None:
+                    sock.shutdown(socket.SHUT_RDWR)
+            if latency:
+                threading.Event().wait(latency)
 
-def create_app():
-    app = Flask(__name__)
+        @app.teardown_request
+        def release_slot(_):
+            if g.pop('slot', False):
+                slots.release()
 
     app.register_blueprint(main)
 
     return app
 
 
+class MockRouter(object):
+    """Mock router served by a threaded werkzeug server in the current process
+    """
+
+    def __init__(self, **options):
+        """Init MockRouter object
+
+        :param options: create_app() arguments
+        """
+        self.app = create_app(**options)
+
+    @contextmanager
+    def run(self, host: str, port: int):
+        """Serve until the block exits, the port is released on exit
+        """
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server(host, port, self.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+        thread.start()
+        try:
+            yield server
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
 
+def create_app_mock(**options) -> MockRouter:
+    options.setdefault('state', RouterState.from_response(
+        RESPONSES[('?5', constants.DHCP_LEASES_QUERY)]['data']))
+    return MockRouter(**options)
@@ -1,7 +1,7 @@
 import os
-from typing import Optional
+from typing import Optional, Dict, Tuple, List
 
-from tplink_archer import constants
+from tplink_archer import constants, Query
 
 
 base_path = os.path.dirname(__file__)
@@ -59,18 +59,88 @@ REQUESTS_MAP = [
 ]
 
 
-def get_response(params: str, query: str) -> Optional[dict]:
-    request = None
+def load_responses() -> Dict[Tuple[str, str], dict]:
+    """Read every response file once and index the requests by (params, query)
+    """
+
+    responses = {}
+    for r in REQUESTS_MAP:
+        with open(os.path.join(base_path, 'responses', r.get('response_file')), 'r') as f:
+            responses[(r.get('params'), r.get('query'))] = dict(r, data=f.read())
+    return responses
+
+
+RESPONSES = load_responses()
+
+
+def load_blocks() -> Dict[tuple, Tuple[dict, int]]:
+    """Index the blocks of every request by action and header, to answer queries reading fewer attributes
+    """
+
+    blocks = {}
     for r in REQUESTS_MAP:
-        if r.get('params') == params and r.get('query') == query:
-            request = r
-    
-    if not request:
+        if not r.get('params').startswith('?'):
+            continue
+        for index, block in enumerate(Query.from_text('cgi' + r.get('params'), r.get('query')).blocks):
+            blocks[(block.action, block.object_name, block.stack, block.parent_stack)] = (r, index)
+    return blocks
+
+
+BLOCKS = load_blocks()
+
+
+def projection_for(params: str, query: str) -> Optional[List[Tuple[dict, Dict[int, tuple]]]]:
+    """Match the blocks of a query with the requests of REQUESTS_MAP that read the same objects, or more
+
+    :return: for each matched request, in order, the request and, by block index in that request, the index in the
+        query and the attributes to keep (lower case, None to keep all)
+    """
+
+    try:
+        blocks = Query.from_text('cgi' + params, query).blocks
+    except (ValueError, IndexError):
         return None
 
-    with open(os.path.join(base_path, 'responses', request.get('response_file')), 'r') as f:
-        data = f.read()
+    matches = []
+    for index, block in enumerate(blocks):
+        match = BLOCKS.get((block.action, block.object_name, block.stack, block.parent_stack))
+        if match is None:
+            return None
+        request, request_index = match
+        if not matches or matches[-1][0] is not request:
+            matches.append((request, {}))
+        matches[-1][1][request_index] = (index, {line.lower() for line in block.lines} or None)
+    return matches or None
+
 
-    request.update({'data': data})
+def project_response(data: str, projection: Dict[int, tuple]) -> str:
+    """Keep only the sections and attributes of a response read by a projected query, renumbering the sections
+    """
 
-    return request
+    lines = []
+    keep = None
+    for line in data.split('\n'):
+        if line.startswith('['):
+            identifier, _, index = line.rpartition(']')
+            if identifier == '[error':
+                keep = None
+                continue
+            keep = projection.get(int(index))
+            if keep is not None:
+                lines.append(f'{identifier}]{keep[0]}')
+        elif keep is not None and (keep[1] is None or line.partition('=')[0].lower() in keep[1]):
+            lines.append(line)
+    return '\n'.join(lines + ['[error]0'])
+
+
+def get_response(params: str, query: str) -> Optional[dict]:
+    response = RESPONSES.get((params, query))
+    if response is not None:
+        return response
+
+    matches = projection_for(params, query)
+    if matches is None:
+        return None
+    data = [project_response(RESPONSES[(r['params'], r['query'])]['data'], projection).rpartition('\n')[0]
+            for r, projection in matches]
+    return {'params': params, 'query': query, 'data': '\n'.join([d for d in data if d] + ['[error]0'])}
@@ -1,8 +1,6 @@
-from flask import Response, request, Blueprint
+from flask import Response, request, Blueprint, current_app
 
-# from tplink_archer_connection import Stack
-
-from .requests_map import get_response
+from .requests_map import get_response, projection_for, project_response
 
 
 main = Blueprint('main_bp', __name__)
@@ -21,8 +19,18 @@ def status_page():
 def cgi(f=None):
     params = request.url.split('cgi')[1]
     query = request.data.decode('utf-8')
+
+    state = current_app.config.get('ROUTER_STATE')
+    if state is not None:
+        data = state.handle(params, query)
+        if data is not None:
+            return Response(data)
+        if state.dhcp_clients is not None and '[LAN_HOST_ENTRY#' in query:
+            matches = projection_for(params, query)
+            if matches is not None and len(matches) == 1:
+                return Response(project_response(state.dhcp_clients, matches[0][1]))
+
     response = get_response(params, query)
     if not response:
         return Response(status=500)
     return Response(response.get('data'))
-
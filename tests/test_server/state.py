@@ -0,0 +1,105 @@
+import threading
+from typing import Optional, List, Tuple
+
+from tplink_archer import Query, Stack, constants
+
+
+LEASE_OBJECT = 'LAN_DHCP_STATIC_ADDR'
+
+
+def synthetic_hosts(hosts: int) -> List[Tuple[str, str, str]]:
+    """(MAC address, IP address, hostname) of hosts numbered from 0
+    """
+
+    return [(f'A8:3E:0F:2A:{(i >> 8) & 0xff:02X}:{i & 0xff:02X}',
+             f'10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}',
+             f'host-{i}') for i in range(hosts)]
+
+
+class RouterState(object):
+    """Mutable tables of the mock router: static DHCP leases change on create, delete and toggle commands
+    """
+
+    def __init__(self, leases: Optional[List[Tuple[str, str, bool]]] = None, dhcp_clients: Optional[str] = None):
+        """Init RouterState object
+
+        :param leases: initial (MAC address, IP address, enabled) static leases
+        :param dhcp_clients: DHCP clients response served instead of the one in REQUESTS_MAP
+        """
+        self.lock = threading.Lock()
+        self.leases = {}
+        self.next_id = 1
+        self.dhcp_clients = dhcp_clients
+        for mac_address, ip_address, enabled in leases or []:
+            self.add_lease(mac_address, ip_address, enabled)
+
+    @classmethod
+    def from_response(cls, data: str) -> 'RouterState':
+        """Load the leases from a DHCP_LEASES_QUERY response
+        """
+
+        stack = Stack(data)
+        return cls([(s.values['chaddr'], s.values['yiaddr'], s.values['enable'] == '1') for s in stack.sections if not s.is_error])
+
+    @classmethod
+    def synthetic(cls, hosts: int) -> 'RouterState':
+        """State with hosts DHCP clients, each one with a static lease
+        """
+
+        table = synthetic_hosts(hosts)
+        lines = []
+        for i, (mac_address, ip_address, hostname) in enumerate(table, 1):
+            lines.append(f'[{i},0,0,0,0,0]0')
+            lines.append('leaseTimeRemaining=-1')
+            lines.append(f'MACAddress={mac_address}')
+            lines.append(f'hostName={hostname}')
+            lines.append(f'IPAddress={ip_address}')
+        lines.append('[error]0')
+        return cls([(mac, ip, True) for mac, ip, _ in table], '\n'.join(lines))
+
+    def add_lease(self, mac_address: str, ip_address: str, enabled: bool):
+        stack = f'1,{self.next_id},0,0,0,0'
+        self.next_id += 1
+        self.leases[stack] = {'enable': '1' if enabled else '0', 'chaddr': mac_address, 'yiaddr': ip_address}
+
+    def render_leases(self) -> str:
+        lines = []
+        for stack, values in self.leases.items():
+            lines.append(f'[{stack}]0')
+            lines.extend(f'{key}={value}' for key, value in values.items())
+        lines.append('[error]0')
+        return '\n'.join(lines)
+
+    def handle(self, params: str, query: str) -> Optional[str]:
+        """Serve the requests made only of static lease blocks, None for any other request
+
+        :param params: URL query string, e.g. '?4&2'
+        :param query: request body
+        :return: response text
+        """
+
+        if LEASE_OBJECT not in query:
+            return None
+        try:
+            blocks = Query.from_text(constants.CGI_URL + params, query).blocks
+        except (ValueError, IndexError):
+            return None
+        if any(b.object_name != LEASE_OBJECT for b in blocks):
+            return None
+
+        with self.lock:
+            if all(b.action == constants.ACT_GL for b in blocks):
+                return self.render_leases()
+
+            for block in blocks:
+                values = dict(line.split('=', 1) for line in block.lines if '=' in line)
+                if block.action == constants.ACT_ADD:
+                    self.add_lease(values.get('chaddr', ''), values.get('yiaddr', ''), values.get('enable') == '1')
+                elif block.action == constants.ACT_DEL:
+                    if self.leases.pop(block.stack, None) is None:
+                        return '[error]71017'
+                elif block.action == constants.ACT_SET:
+                    if block.stack not in self.leases:
+                        return '[error]71017'
+                    self.leases[block.stack].update(values)
+            return '[error]0'
@@ -1,4 +1,7 @@
-from tplink_archer import Stack
+import pytest
+
+from tplink_archer import Stack, SectionNotFoundError
+from tplink_archer.schemas import decode_bool, decode_int, decode_mac
 
 
 def test_stack_equals():
@@ -13,3 +16,51 @@ def test_stack_equals():
     stack2.parse(stack2_raw)
 
     assert stack1 != stack2
+
+
+def test_stack_parse_special_values():
+    stack = Stack('[1,0,0,0,0,0]0\r\nhostName=a=b\r\nSSID=[home]\r\nempty=\r\n[error]0\r\n')
+
+    assert len(stack.sections) == 2
+    values = stack.sections[0].values
+    assert values == {'hostName': 'a=b', 'SSID': '[home]', 'empty': ''}
+    assert stack.sections[1].identifier == '[error]0'
+    assert stack.sections[1].values == {}
+
+
+def test_stack_indexed_lookup():
+    stack = Stack('[1,0,0,0,0,0]6\nfoo=a\n[1,1,1,0,0,0]7\nfoo=b\n[1,1,1,0,0,0]6\nfoo=c\n[error]0')
+
+    assert stack.get_section('[1,1,1,0,0,0]7').values['foo'] == 'b'
+    assert [s.values['foo'] for s in stack.get_sections(6)] == ['a', 'c']
+    assert stack.get_sections(0) == []
+    assert stack.get_section_by_path('1,1,1,0,0,0').values['foo'] == 'b'
+    assert stack.get_section_by_path('1,1,1,0,0,0', index=6).values['foo'] == 'c'
+
+    with pytest.raises(SectionNotFoundError):
+        stack.get_section('[2,0,0,0,0,0]6')
+
+
+def test_stack_shared_schema():
+    stack = Stack('[1,0,0,0,0,0]0\nfoo=a\nbar=b\n[2,0,0,0,0,0]0\nfoo=c\nbar=d')
+    first, second = stack.sections
+
+    assert first.values.schema is second.values.schema
+    assert dict(second.values) == {'foo': 'c', 'bar': 'd'}
+
+    first.values['baz'] = 'e'
+    first.values['foo'] = 'f'
+    assert dict(first.values) == {'foo': 'f', 'bar': 'b', 'baz': 'e'}
+    assert dict(second.values) == {'foo': 'c', 'bar': 'd'}
+    assert first.to_text() == '[1,0,0,0,0,0]0\nfoo=f\nbar=b\nbaz=e\n'
+
+
+def test_stack_typed_values():
+    field_types = {0: {'enable': decode_bool, 'port': decode_int, 'chaddr': decode_mac}}
+    stack = Stack('[1,1,0,0,0,0]0\nenable=1\nport=8080\nchaddr=a8:3e:0f:2a:ef:b1\nname=pc\n'
+                  '[1,0,0,0,0,0]1\nport=80\n[error]0', field_types)
+
+    assert dict(stack.sections[0].values) == {'enable': True, 'port': 8080, 'chaddr': 'A8:3E:0F:2A:EF:B1', 'name': 'pc'}
+    assert stack.sections[1].values['port'] == '80'
+    assert decode_int('') is None and decode_int('8080-8090') == '8080-8090'
+    assert stack.sections[0].to_text() == '[1,1,0,0,0,0]0\nenable=1\nport=8080\nchaddr=A8:3E:0F:2A:EF:B1\nname=pc\n'
@@ -0,0 +1,49 @@
+import pytest
+
+from tplink_archer import HostWatcher, HostEventType, WifiFreq
+
+
+def test_watcher_events():
+    watcher = HostWatcher(lambda: [])
+    events = watcher.update([
+        {'mac_address': 'a8:3e:0f:2a:ef:b1', 'ip_address': '192.168.1.1', 'hostname': 'pc'},
+        {'mac_address': '9A:88:6B:3E:C0:39', 'ip_address': '192.168.1.2', 'hostname': 'phone'},
+    ])
+    assert [e.type for e in events] == [HostEventType.JOINED, HostEventType.JOINED]
+    assert events[0].mac_address == 'A8:3E:0F:2A:EF:B1'
+
+    events = watcher.update([
+        {'mac_address': 'A8:3E:0F:2A:EF:B1', 'ip_address': '192.168.1.1', 'hostname': 'pc'},
+        {'mac_address': '9A:88:6B:3E:C0:39', 'ip_address': '192.168.1.5', 'hostname': 'phone'},
+    ])
+    assert len(events) == 1
+    assert events[0].type == HostEventType.CHANGED
+    assert events[0].changes == {'ip_address': ('192.168.1.2', '192.168.1.5')}
+
+    events = watcher.update([{'mac_address': '9A:88:6B:3E:C0:39', 'ip_address': '192.168.1.5', 'hostname': 'phone'}])
+    assert [(e.type, e.mac_address) for e in events] == [(HostEventType.LEFT, 'A8:3E:0F:2A:EF:B1')]
+
+
+def test_watcher_poll(connection, test_server):
+    with test_server.run('127.0.0.1', 5000):
+        watcher = HostWatcher.wifi_clients(connection, WifiFreq.WIFI_5G)
+        assert [e.mac_address for e in watcher.poll()] == ['A0:66:08:FC:7F:E2']
+        assert watcher.poll() == []
+
+
+def test_watcher_failed_poll():
+    hosts = [{'mac_address': 'A8:3E:0F:2A:EF:B1'}, {'mac_address': '9A:88:6B:3E:C0:39'}]
+
+    def failing_fetch():
+        yield hosts[0]
+        raise ConnectionError
+
+    watcher = HostWatcher(lambda: iter(hosts))
+    watcher.poll()
+    watcher.fetch = failing_fetch
+    with pytest.raises(ConnectionError):
+        watcher.poll()
+    assert len(watcher.hosts) == 2
+
+    watcher.fetch = lambda: iter(hosts)
+    assert watcher.poll() == []
@@ -1,4 +1,65 @@
-from .connection import ArcherConnection
-from .models import DHCPLease, Stack, Section, PortForwardingRule, WifiFreq
+from importlib import import_module
+from importlib.util import find_spec
 
 from .exceptions import *
+from . import exceptions
+
+
+# Public names and the module they are imported from on first access, so that importing the package (e.g. to run
+# the CLI) does not import requests, aiohttp and the other heavy dependencies of the modules that are not used.
+LAZY_ATTRIBUTES = {
+    'ArcherConnection': 'connection',
+    'DHCPLease': 'models',
+    'Stack': 'models',
+    'Section': 'models',
+    'PortForwardingRule': 'models',
+    'WifiFreq': 'models',
+    'Query': 'query',
+    'QueryBlock': 'query',
+    'QueryBatch': 'query',
+    'ResponseCache': 'cache',
+    'MetricsRecorder': 'metrics',
+    'RequestEvent': 'metrics',
+    'FleetPoller': 'fleet',
+    'RouterConfig': 'fleet',
+    'PollResult': 'fleet',
+    'load_router_configs': 'fleet',
+    'HostWatcher': 'watch',
+    'HostEvent': 'watch',
+    'HostEventType': 'watch',
+    'HostInventory': 'inventory',
+    'Host': 'inventory',
+    'HistoryStore': 'history',
+    'DslStatsCollector': 'collectors',
+    'RingBuffer': 'collectors',
+    'WifiTrafficTracker': 'collectors',
+    'BackupStore': 'backups',
+    'BackupManifest': 'backups',
+    'AsyncArcherConnection': 'async_connection',    # aiohttp is an optional dependency
+}
+
+OPTIONAL_DEPENDENCIES = {
+    'AsyncArcherConnection': 'aiohttp',
+}
+
+__all__ = [name for name in dir(exceptions) if name.endswith('Error')] + [
+    name for name in LAZY_ATTRIBUTES
+    if name not in OPTIONAL_DEPENDENCIES or find_spec(OPTIONAL_DEPENDENCIES[name]) is not None
+]
+
+
+def __getattr__(name: str):
+    module_name = LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    try:
+        module = import_module(f'.{module_name}', __name__)
+    except ImportError as e:
+        raise AttributeError(f'{name} is not available: {e}') from e
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_ATTRIBUTES))
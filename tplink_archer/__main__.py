@@ -1,17 +1,24 @@
+import sys
 import json
+import time
 import click
-import pprint
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Iterable, Callable, Any, TYPE_CHECKING
 from functools import wraps
 
-from tplink_archer import ArcherConnection, AuthError, WifiFreq
+from tplink_archer.exceptions import AuthError
 
+if TYPE_CHECKING:     # imported lazily at run time, requests is not needed by --help
+    from tplink_archer.connection import ArcherConnection
 
 CONFIG_FILE_PATH = Path.home().joinpath('.config', 'tplink-archer', 'config.json')
+SESSION_FILE_PATH = CONFIG_FILE_PATH.with_name('session.json')
+SESSION_VALIDITY = 15 * 60     # seconds an authentication is trusted without checking it again
 
-connection: Optional[ArcherConnection] = None
-pp = pprint.PrettyPrinter(indent=4)
+OUTPUT_FORMATS = ('pretty', 'json', 'ndjson', 'csv')
+
+connection: Optional['ArcherConnection'] = None
+output_format = 'pretty'
 
 
 def save_config(config: dict):
@@ -32,29 +39,110 @@ def load_config() -> Optional[dict]:
     return config
 
 
+def save_session(config: dict):
+    with open(SESSION_FILE_PATH, 'w+') as f:
+        json.dump({'router_url': config['router_url'], 'authenticated_at': time.time()}, f)
+
+
+def is_session_valid(config: dict) -> bool:
+    if not SESSION_FILE_PATH.exists():
+        return False
+
+    with open(SESSION_FILE_PATH) as f:
+        session = json.load(f)
+
+    return (session.get('router_url') == config['router_url'] and
+            time.time() - session.get('authenticated_at', 0) < SESSION_VALIDITY)
+
+
 def authentication_required(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         global connection
         config = load_config()
         if config:
-            connection = authenticate(load_config())
+            lazy = is_session_valid(config)
+            connection = authenticate(config, lazy=lazy)
             if connection:
-                return func(*args, **kwargs)
+                if not lazy:
+                    save_session(config)
+                try:
+                    return func(*args, **kwargs)
+                except AuthError:
+                    if SESSION_FILE_PATH.exists():
+                        SESSION_FILE_PATH.unlink()
         click.echo('You should authenticate first')
     return wrapper
 
 
-def pretty_print(stuff):
-    pp.pprint(stuff)
+def format_option(func):
+    """Adds the --format option to a command
+    """
+
+    @click.option('--format', 'format_', default='pretty', type=click.Choice(OUTPUT_FORMATS),
+                  help='Output format, json, ndjson and csv are written while the results are received')
+    @wraps(func)
+    def wrapper(*args, format_: str, **kwargs):
+        global output_format
+        output_format = format_
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def as_record(item: Any) -> dict:
+    if isinstance(item, dict):
+        return item
+    return item.to_dict()
+
+
+def output(result: Any, to_record: Callable[[Any], dict] = as_record):
+    """Writes a result in output_format, a list or iterator is written item by item
+
+    :param result: a single result or an iterable of results
+    :param to_record: function converting each result to a JSON serializable dict
+    """
+
+    single = isinstance(result, (dict, str)) or not isinstance(result, Iterable)
+    if output_format == 'pretty':
+        import pprint
+        pprint.PrettyPrinter(indent=4).pprint(result if single else [item for item in result])
+        return
+
+    out = sys.stdout
+    records = [to_record(result)] if single else (to_record(item) for item in result)
+    if output_format == 'json':
+        if single:
+            json.dump(records[0], out)
+        else:
+            out.write('[')
+            for i, record in enumerate(records):
+                out.write(',\n' if i else '\n')
+                json.dump(record, out)
+            out.write('\n]')
+        out.write('\n')
+    elif output_format == 'ndjson':
+        for record in records:
+            out.write(json.dumps(record))
+            out.write('\n')
+    elif output_format == 'csv':
+        import csv
+        writer = None
+        for record in records:
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(record), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(record)
+    out.flush()
 
 ########################################################################################################################
 
 
-def authenticate(config: dict) -> Optional[ArcherConnection]:
+def authenticate(config: dict, lazy: bool = False) -> Optional['ArcherConnection']:
+    from tplink_archer.connection import ArcherConnection     # imports requests, not needed by --help
+
     archer_connection = ArcherConnection(config['router_url'])
     try:
-        archer_connection.authenticate(config['username'], config['password'])
+        archer_connection.authenticate(config['username'], config['password'], lazy=lazy)
     except AuthError:
         return None
     return archer_connection
@@ -78,48 +166,73 @@ def auth(url, username, password):
     if authenticate(config):
         click.echo('Successfully authenticated')
         save_config(config)
+        save_session(config)
     else:
         click.echo('Cannot authenticate')
 
 
 @click.command()
+@format_option
 @authentication_required
 def stats():
-    pretty_print(connection.get_stats())
+    output(connection.get_stats())
 
 
 @click.command()
+@format_option
 @authentication_required
 def dhcp_clients():
-    pretty_print(connection.get_dhcp_clients())
+    output(connection.get_dhcp_clients() if output_format == 'pretty' else connection.iter_dhcp_clients())
 
 
 @click.command()
+@format_option
 @authentication_required
 def dhcp_leases():
-    pretty_print(connection.get_dhcp_leases())
+    output(connection.get_dhcp_leases())
 
 
 @click.command()
+@format_option
 @authentication_required
 def external_ip():
-    click.echo(connection.get_external_ip())
+    if output_format == 'pretty':
+        click.echo(connection.get_external_ip())
+    else:
+        output({'external_ip': connection.get_external_ip()})
 
 
 @click.command()
 @click.option('--freq', default='2g', type=click.Choice(['2g', '5g']))
+@format_option
 @authentication_required
 def wifi_clients(freq: str):
+    from tplink_archer.models import WifiFreq
+
     wifi_freq = WifiFreq.WIFI_2G
     if freq == '5g':
         wifi_freq = WifiFreq.WIFI_5G
-    pretty_print(connection.get_wifi_clients(wifi_freq))
+    if output_format == 'pretty':
+        output(connection.get_wifi_clients(wifi_freq))
+    else:
+        output(connection.iter_wifi_clients(wifi_freq), lambda mac_address: {'mac_address': mac_address})
 
 
 @click.command()
+@format_option
 @authentication_required
 def port_forwarding():
-    pretty_print(connection.get_port_forwarding_rules())
+    output(connection.get_port_forwarding_rules())
+
+
+@click.command()
+@format_option
+@authentication_required
+def hosts():
+    from tplink_archer.inventory import HostInventory
+
+    inventory = HostInventory.fetch(connection)
+    output([host.to_dict() for host in inventory] if output_format == 'pretty' else inventory)
 
 
 cli.add_command(auth)
@@ -129,6 +242,7 @@ cli.add_command(dhcp_leases)
 cli.add_command(external_ip)
 cli.add_command(wifi_clients)
 cli.add_command(port_forwarding)
+cli.add_command(hosts)
 
 
 if __name__ == '__main__':
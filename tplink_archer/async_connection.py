@@ -0,0 +1,284 @@
+import base64
+import asyncio
+import aiohttp
+from typing import List, Optional
+
+from .exceptions import AuthError, RequestError
+from .constants import *
+from .models import Stack, DHCPLease, PortForwardingRule, WifiFreq
+from .query import QueryBatch, is_read_only_request
+from .schemas import field_types_for
+from . import parsers
+
+
+class AsyncArcherConnection(object):
+    """Asyncio counterpart of ArcherConnection, many of them can share a single event loop
+    """
+
+    def __init__(self, router_url: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        """Init AsyncArcherConnection object
+
+        :param router_url: URL or IP address of the router
+        :param pool_size: maximum number of keep-alive connections kept open to the router
+        :param connect_timeout: seconds to wait for the TCP connection, None waits forever
+        :param read_timeout: seconds to wait for the router to answer, None waits forever
+        :param max_retries: times a request is retried when the router drops the connection
+        """
+
+        self.router_url = router_url
+        self.is_authenticated = False
+        self.headers = None
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def __repr__(self):
+        return f'<AsyncArcherConnection(router_url={self.router_url},is_authenticated={str(self.is_authenticated)})>'
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __get_session(self) -> aiohttp.ClientSession:
+        """Returns the keep-alive session, it is created on first use so that it binds to the running loop
+
+        :rtype: aiohttp.ClientSession
+        """
+
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def close(self):
+        """Closes all the pooled connections to the router
+        """
+
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def authenticate(self, username: str, password: str):
+        """Authenticate to the router using your username and password
+
+        :param username:
+        :param password:
+        """
+
+        credentials = base64.b64encode(
+            bytes('{}:{}'.format(username, password), 'UTF-8')).decode('UTF-8')
+        await self.authenticate_basicauth(credentials)
+
+    async def authenticate_basicauth(self, credentials: str):
+        """Authenticate using your username and password encoded in base64
+
+        :param credentials: base64 encoded 'username:password'
+        """
+
+        self.headers = {
+            'Referer': f'http://{self.router_url}/',
+            'Cookie': 'Authorization=Basic ' + credentials
+        }
+
+        self.is_authenticated = False
+        attempts = 1
+        while attempts <= 2 and not self.is_authenticated:      # sometimes 2 attempts are necessary
+            r = await self.__request('get', AUTHENTICATION_URL)
+            self.is_authenticated = r.status == 200
+            attempts += 1
+        if not self.is_authenticated:
+            raise AuthError
+
+    async def __request(self, request_type: str, request_url: str, data: str = None) -> aiohttp.ClientResponse:
+        """Performs a request and reads the whole body, retrying when the router drops the connection
+
+        Write commands are retried only when the connection could not be opened, they may have been applied
+        otherwise.
+
+        :param request_type: either 'get' or 'post'
+        :param request_url:
+        :param data: data to send in a POST request
+        :rtype: aiohttp.ClientResponse
+        """
+
+        session = self.__get_session()
+        read_only = is_read_only_request(request_type, request_url)
+        attempt = 0
+        while True:
+            try:
+                async with session.request(request_type, f'http://{self.router_url}/{request_url}',
+                                           headers=self.headers, data=data) as r:
+                    await r.read()
+                    return r
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries or not (read_only or isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+                attempt += 1
+                await asyncio.sleep(0.1 * attempt)
+
+    async def api_request(self, request_type: str, url: str, data: str = None) -> aiohttp.ClientResponse:
+        """Performs an HTTP request to the device, the body is already read when this returns
+
+        :param request_type: either 'get' or 'post'
+        :param url: request URL
+        :param data: data to send in a POST request, ignored if GET
+        :rtype: aiohttp.ClientResponse
+        """
+
+        if not self.is_authenticated:
+            raise AuthError
+
+        if request_type == 'get':
+            r = await self.__request('get', url)
+        elif request_type == 'post':
+            r = await self.__request('post', url, data)
+        else:
+            raise ValueError('Invalid request type')
+
+        if r.status != 200:
+            raise RequestError('Response status code not 200')
+
+        return r
+
+    async def __query(self, url: str, data: str) -> Stack:
+        """Sends a query and parses the response
+
+        :param url: request URL
+        :param data: query
+        :rtype: Stack
+        """
+
+        r = await self.api_request('post', url, data)
+        return Stack(await r.text(), field_types_for(url, data))
+
+    async def execute_batch(self, batch: QueryBatch) -> dict:
+        """Sends all the queries of a batch in a single request
+
+        :param batch: QueryBatch to send
+        :return: dict of results by query name
+        :rtype: dict
+        """
+
+        query = batch.query
+        stack = await self.__query(query.url, query.body)
+        return batch.parse(stack)
+
+    async def get_stats(self) -> dict:
+        """Get router statistics about connection speed
+
+        :rtype: dict
+        """
+
+        stack = await self.__query(STATS_URL, STATS_QUERY)
+        return parsers.parse_stats(stack)
+
+    async def get_external_ip(self) -> str:
+        """Get router external IP address
+
+        :rtype: str
+        """
+
+        stack = await self.__query(EXTERNAL_IP_URL, EXTERNAL_IP_QUERY)
+        return parsers.parse_external_ip(stack)
+
+    async def get_dhcp_clients(self) -> List[dict]:
+        """Get all (almost) router DHCP clients
+
+        :rtype: list
+        """
+
+        stack = await self.__query(DHCP_CLIENTS_URL, DHCP_CLIENTS_QUERY)
+        return parsers.parse_dhcp_clients(stack)
+
+    async def get_wifi_clients(self, wifi_freq: WifiFreq) -> List[str]:
+        """Get list of MAC addresses connected to specified WiFi frequency
+
+        :param wifi_freq: WiFi frequency
+        :rtype: list
+        """
+
+        data = WIFI_2G_CLIENTS_QUERY
+        if wifi_freq == WifiFreq.WIFI_5G:
+            data = WIFI_5G_CLIENTS_QUERY
+
+        stack = await self.__query(WIFI_CLIENTS_URL, data)
+        return parsers.parse_wifi_clients(stack)
+
+    async def get_dhcp_leases(self) -> List[DHCPLease]:
+        """Get list of all static DHCP leases
+
+        :return: list of DHCP leases objects
+        :rtype: List[DHCPLease]
+        """
+
+        stack = await self.__query(DHCP_LEASES_URL, DHCP_LEASES_QUERY)
+        return parsers.parse_dhcp_leases(stack)
+
+    async def create_dhcp_lease(self, ip_address: str, mac_address: str, is_enabled: bool) -> DHCPLease:
+        """Create DHCP lease
+
+        :param ip_address: lease IP address
+        :param mac_address: lease MAC address
+        :param is_enabled: lease is enabled
+        :return: newly created DHCP lease
+        :rtype: DHCPLease
+        """
+        enabled = '1' if is_enabled else '0'
+        data = CREATE_DHCP_LEASE_COMMAND.format(
+            mac_address=mac_address,
+            ip_address=ip_address,
+            enabled=enabled
+        )
+        await self.api_request('post', DHCP_LEASES_CREATE_URL, data)
+        leases = await self.get_dhcp_leases()
+        new_lease = [l for l in leases if l.ip_address == ip_address][0]
+        return new_lease
+
+    async def delete_dhcp_lease(self, dhcp_lease: DHCPLease):
+        """Deletes DHCP lease
+
+        :param dhcp_lease: DHCPLease to delete
+        """
+        data = DELETE_DHCP_LEASE_COMMAND.format(raw_identifier=dhcp_lease.raw_identifier)
+        await self.api_request('post', DHCP_LEASES_DELETE_URL, data)
+
+    async def toggle_dhcp_lease(self, dhcp_lease: DHCPLease, enable: bool):
+        """Toggle DHCP lease enable
+
+        :param dhcp_lease: DHCPLease object to toggle
+        :param enable: whether enable or not
+        """
+        enabled = '1' if enable else '0'
+        data = TOGGLE_DHCP_LEASE_COMMAND.format(raw_identifier=dhcp_lease.raw_identifier, enabled=enabled)
+        await self.api_request('post', DHCP_LEASES_TOGGLE_URL, data)
+        dhcp_lease.is_enabled = enable
+
+    async def enable_dhcp_lease(self, dhcp_lease: DHCPLease):
+        """Enables DHCP lease
+
+        :param dhcp_lease:
+        """
+        await self.toggle_dhcp_lease(dhcp_lease, enable=True)
+
+    async def disable_dhcp_lease(self, dhcp_lease: DHCPLease):
+        """Disables DHCP lease
+
+        :param dhcp_lease:
+        """
+        await self.toggle_dhcp_lease(dhcp_lease, enable=False)
+
+    async def get_port_forwarding_rules(self) -> List[PortForwardingRule]:
+        """Get list of all port forwarding rules
+
+        :return: list of port forwaring rules
+        :rtype: List[PortForwardingRule]
+        """
+
+        stack = await self.__query(PORT_FORWARDING_RULES_URL, PORT_FORWARDING_RULES_QUERY)
+        return parsers.parse_port_forwarding_rules(stack)
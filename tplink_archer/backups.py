@@ -0,0 +1,356 @@
+import os
+import json
+import random
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Iterable, Iterator, BinaryIO
+
+from .connection import ArcherConnection
+from .fleet import FleetPoller, PollResult
+from .constants import *
+
+
+def gear_table(seed: int) -> tuple:
+    rng = random.Random(seed)
+    return tuple(rng.getrandbits(64) for _ in range(256))
+
+
+GEAR_TABLE = gear_table(0x61726368)     # must never change, or the chunks of new backups would not match the old ones
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+
+TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S.%fZ'
+
+
+def iter_chunks(stream: Iterable[bytes], min_size: int = BACKUP_MIN_CHUNK_SIZE,
+                avg_size: int = BACKUP_AVG_CHUNK_SIZE, max_size: int = BACKUP_MAX_CHUNK_SIZE) -> Iterator[bytes]:
+    """Split a byte stream in content-defined chunks: an insertion or removal only changes the chunks around it
+
+    Boundaries are found with a gear rolling hash: the first min_size bytes of a chunk are skipped without hashing,
+    a chunk ends when the top bits of the hash selected by the average size are all zero. The hash and the scan
+    position are kept across pieces, so every byte is hashed once whatever the size of the pieces.
+
+    :param stream: data, in pieces of any size
+    :param min_size: minimum chunk size
+    :param avg_size: expected chunk size, rounded down to a power of two
+    :param max_size: maximum chunk size
+    :rtype: Iterator[bytes]
+    """
+
+    bits = avg_size.bit_length() - 1
+    mask = ((1 << bits) - 1) << (64 - bits)
+    gear = GEAR_TABLE
+    buffer = bytearray()
+    h = 0
+    position = min_size     # next byte of the buffer to hash
+    for data in stream:
+        buffer += data
+        start = 0
+        while True:
+            end = min(len(buffer), start + max_size)
+            cut = None
+            while position < end:
+                h = ((h << 1) + gear[buffer[position]]) & HASH_MASK
+                position += 1
+                if not h & mask:
+                    cut = position
+                    break
+            if cut is None:
+                if len(buffer) - start < max_size:
+                    break
+                cut = start + max_size
+            yield bytes(buffer[start:cut])
+            start = cut
+            h = 0
+            position = start + min_size
+        del buffer[:start]
+        position -= start
+    if buffer:
+        yield bytes(buffer)
+
+########################################################################################################################
+
+
+class BackupManifest(object):
+    """Chunk list of a single configuration backup
+    """
+
+    __slots__ = ('router', 'created_at', 'sha256', 'size', 'chunks')
+
+    def __init__(self, router: str, created_at: datetime, sha256: str, size: int, chunks: List[str]):
+        """Init BackupManifest object
+
+        :param router: router name
+        :param created_at: UTC time of the backup
+        :param sha256: SHA-256 hex digest of the whole configuration
+        :param size: configuration size, in bytes
+        :param chunks: SHA-256 hex digests of the chunks, in order
+        """
+        self.router = router
+        self.created_at = created_at
+        self.sha256 = sha256
+        self.size = size
+        self.chunks = chunks
+
+    def __repr__(self):
+        return (f'<BackupManifest(router={self.router},created_at={self.created_at.strftime(TIMESTAMP_FORMAT)},'
+                f'sha256={self.sha256[:12]})>')
+
+    @property
+    def timestamp(self) -> str:
+        return self.created_at.strftime(TIMESTAMP_FORMAT)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'BackupManifest':
+        created_at = datetime.strptime(d['created_at'], TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+        return cls(d['router'], created_at, d['sha256'], d['size'], d['chunks'])
+
+    def to_dict(self) -> dict:
+        return {
+            'router': self.router,
+            'created_at': self.timestamp,
+            'sha256': self.sha256,
+            'size': self.size,
+            'chunks': self.chunks,
+        }
+
+########################################################################################################################
+
+
+class BackupStore(object):
+    """Deduplicating store of router configuration backups
+
+    Each configuration is split in content-defined chunks stored once under their SHA-256 in chunks/, and a small
+    JSON manifest listing them is saved in manifests/<router>/<timestamp>.json. Backups that did not change add no
+    file at all, and every file is written to a temporary name and renamed, so many routers can be backed up
+    concurrently, also from different processes.
+    """
+
+    def __init__(self, root: str, min_chunk_size: int = BACKUP_MIN_CHUNK_SIZE,
+                 avg_chunk_size: int = BACKUP_AVG_CHUNK_SIZE, max_chunk_size: int = BACKUP_MAX_CHUNK_SIZE):
+        """Init BackupStore object
+
+        :param root: store directory, created if missing
+        :param min_chunk_size: minimum chunk size, in bytes
+        :param avg_chunk_size: expected chunk size, in bytes
+        :param max_chunk_size: maximum chunk size, in bytes
+        """
+        self.root = root
+        self.chunk_sizes = (min_chunk_size, avg_chunk_size, max_chunk_size)
+        self.chunks_path = os.path.join(root, 'chunks')
+        self.manifests_path = os.path.join(root, 'manifests')
+        os.makedirs(self.chunks_path, exist_ok=True)
+        os.makedirs(self.manifests_path, exist_ok=True)
+        self.chunks_written = 0
+        self.bytes_written = 0
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<BackupStore(root={self.root})>'
+
+    def __chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_path, digest[:2], digest)
+
+    def __router_path(self, router: str) -> str:
+        if not router or router.startswith('.') or os.sep in router or (os.altsep and os.altsep in router):
+            raise ValueError(f'Invalid router name: {router!r}')
+        return os.path.join(self.manifests_path, router)
+
+    @staticmethod
+    def __write_atomic(path: str, data: bytes):
+        """Write data to a temporary file in the same directory and rename it to path
+        """
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def put_chunk(self, data: bytes) -> str:
+        """Store a chunk unless it is already stored
+
+        :param data: chunk content
+        :return: SHA-256 hex digest of the chunk
+        :rtype: str
+        """
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.__chunk_path(digest)
+        if not os.path.exists(path):
+            self.__write_atomic(path, data)
+            with self.__lock:
+                self.chunks_written += 1
+                self.bytes_written += len(data)
+        return digest
+
+    def backup(self, router: str, stream: Iterable[bytes], created_at: Optional[datetime] = None,
+               skip_unchanged: bool = True) -> BackupManifest:
+        """Store a configuration
+
+        :param router: router name
+        :param stream: configuration content, e.g. ArcherConnection.iter_config_backup()
+        :param created_at: time of the backup, defaults to now
+        :param skip_unchanged: if the configuration is the same as the latest backup of the router, return that
+            manifest instead of saving a new one
+        :rtype: BackupManifest
+        """
+
+        router_path = self.__router_path(router)
+        digest = hashlib.sha256()
+        size = 0
+        chunks = []
+        for chunk in iter_chunks(stream, *self.chunk_sizes):
+            digest.update(chunk)
+            size += len(chunk)
+            chunks.append(self.put_chunk(chunk))
+
+        if skip_unchanged:
+            latest = self.latest(router)
+            if latest is not None and latest.sha256 == digest.hexdigest():
+                return latest
+
+        manifest = BackupManifest(router, created_at or datetime.now(timezone.utc), digest.hexdigest(), size, chunks)
+        self.__write_atomic(os.path.join(router_path, f'{manifest.timestamp}.json'),
+                            json.dumps(manifest.to_dict()).encode('utf-8'))
+        return manifest
+
+    def backup_router(self, connection: ArcherConnection, router: Optional[str] = None, **kwargs) -> BackupManifest:
+        """Download and store the configuration of a router
+
+        :param connection: authenticated router connection
+        :param router: router name, defaults to the connection router_url
+        :param kwargs: other backup() arguments
+        :rtype: BackupManifest
+        """
+
+        return self.backup(router or connection.router_url.replace(':', '_'), connection.iter_config_backup(),
+                           **kwargs)
+
+    def backup_fleet(self, poller: FleetPoller, **kwargs) -> Dict[str, PollResult]:
+        """Back up every router of a fleet concurrently, manifests are saved under the router names
+
+        :param poller: fleet of routers
+        :param kwargs: other backup() arguments
+        :return: results by router name, the value of the successful ones is their BackupManifest
+        :rtype: Dict[str, PollResult]
+        """
+
+        return poller.poll(lambda connection, router: self.backup_router(connection, router.name, **kwargs),
+                           with_router=True)
+
+    def routers(self) -> List[str]:
+        """Names of the routers with at least one backup
+
+        :rtype: List[str]
+        """
+
+        return sorted(name for name in os.listdir(self.manifests_path) if not name.startswith('.'))
+
+    def __manifest_paths(self, router: str) -> List[str]:
+        router_path = self.__router_path(router)
+        if not os.path.isdir(router_path):
+            return []
+        return [os.path.join(router_path, n) for n in sorted(os.listdir(router_path))
+                if n.endswith('.json') and not n.startswith('.')]
+
+    @staticmethod
+    def __load_manifest(path: str) -> BackupManifest:
+        with open(path, 'r') as f:
+            return BackupManifest.from_dict(json.load(f))
+
+    def manifests(self, router: str) -> List[BackupManifest]:
+        """All the backups of a router, oldest first
+
+        :param router: router name
+        :rtype: List[BackupManifest]
+        """
+
+        return [self.__load_manifest(path) for path in self.__manifest_paths(router)]
+
+    def latest(self, router: str) -> Optional[BackupManifest]:
+        """Latest backup of a router, None if there is none
+
+        :param router: router name
+        :rtype: Optional[BackupManifest]
+        """
+
+        paths = self.__manifest_paths(router)
+        return self.__load_manifest(paths[-1]) if paths else None
+
+    def iter_restore(self, manifest: BackupManifest, verify: bool = True) -> Iterator[bytes]:
+        """Yield the content of a backup chunk by chunk
+
+        :param manifest: backup to restore
+        :param verify: check the SHA-256 of the whole configuration, ValueError is raised at the end if it differs
+        :rtype: Iterator[bytes]
+        """
+
+        digest = hashlib.sha256()
+        for chunk_digest in manifest.chunks:
+            with open(self.__chunk_path(chunk_digest), 'rb') as f:
+                data = f.read()
+            if verify:
+                digest.update(data)
+            yield data
+        if verify and digest.hexdigest() != manifest.sha256:
+            raise ValueError(f'Backup {manifest.router}/{manifest.timestamp} is corrupted')
+
+    def restore(self, manifest: BackupManifest, f: BinaryIO, verify: bool = True) -> int:
+        """Write the content of a backup to a binary file
+
+        :param manifest: backup to restore
+        :param f: file opened for binary writing
+        :param verify: check the SHA-256 of the whole configuration
+        :return: number of bytes written
+        :rtype: int
+        """
+
+        size = 0
+        for data in self.iter_restore(manifest, verify):
+            f.write(data)
+            size += len(data)
+        return size
+
+    def prune(self, router: str, keep: int) -> int:
+        """Delete the manifests of a router except the latest keep ones, chunks are deleted by collect_garbage()
+
+        :param router: router name
+        :param keep: number of backups kept
+        :return: number of deleted manifests
+        :rtype: int
+        """
+
+        paths = self.__manifest_paths(router)
+        removed = paths[:max(0, len(paths) - keep)]
+        for path in removed:
+            os.remove(path)
+        return len(removed)
+
+    def collect_garbage(self) -> int:
+        """Delete the chunks no manifest refers to, must not run while backups are being written
+
+        :return: number of deleted chunks
+        :rtype: int
+        """
+
+        referenced = set()
+        for router in self.routers():
+            for manifest in self.manifests(router):
+                referenced.update(manifest.chunks)
+
+        removed = 0
+        for directory in os.listdir(self.chunks_path):
+            directory_path = os.path.join(self.chunks_path, directory)
+            for file_name in os.listdir(directory_path):
+                if file_name not in referenced:
+                    os.remove(os.path.join(directory_path, file_name))
+                    removed += 1
+        return removed
@@ -0,0 +1,149 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any, FrozenSet
+
+from .constants import *
+
+
+OBJECT_NAME_REGEX = re.compile(r'\[(\w+)#')
+
+
+class CacheEntry(object):
+    __slots__ = ('response', 'expires_at', 'object_names')
+
+    def __init__(self, response: Any, expires_at: float, object_names: FrozenSet[str]):
+        """Init CacheEntry object
+
+        :param response: cached response
+        :param expires_at: time.monotonic() value after which the entry is stale
+        :param object_names: router objects read by the request
+        """
+        self.response = response
+        self.expires_at = expires_at
+        self.object_names = object_names
+
+
+class ResponseCache(object):
+    """LRU cache of read responses with per-query time to live
+
+    Entries are keyed by router, request URL and body, so a single cache can be shared by the connections to many
+    routers. A request that writes a router object evicts every cached read of the same object on that router.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES, default_ttl: float = DEFAULT_CACHE_TTL,
+                 ttls: Optional[Dict[str, float]] = None):
+        """Init ResponseCache object
+
+        :param max_entries: maximum number of cached responses, the least recently used is evicted first
+        :param default_ttl: seconds a response is cached for when its query is not in ttls
+        :param ttls: seconds a response is cached for by query body, 0 disables caching, defaults to
+            DEFAULT_CACHE_TTLS. A query that is not in ttls, e.g. one reading fewer attributes, is cached for the
+            shortest time to live of the queries that read the same objects.
+        """
+
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = DEFAULT_CACHE_TTLS if ttls is None else ttls
+        self.object_ttls = self.__object_ttls(self.ttls)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.__entries: 'OrderedDict[tuple, CacheEntry]' = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<ResponseCache(entries={len(self)},hits={self.hits},misses={self.misses})>'
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @staticmethod
+    def __object_ttls(ttls: Dict[str, float]) -> Dict[str, float]:
+        """Shortest time to live of the queries reading each object
+        """
+
+        object_ttls = {}
+        for query, ttl in ttls.items():
+            for object_name in OBJECT_NAME_REGEX.findall(query):
+                object_ttls[object_name] = min(ttl, object_ttls.get(object_name, ttl))
+        return object_ttls
+
+    def ttl(self, data: str) -> float:
+        """Seconds the response to a query is cached for
+
+        :param data: request body
+        :rtype: float
+        """
+
+        ttl = self.ttls.get(data)
+        if ttl is not None:
+            return ttl
+        object_ttls = [self.object_ttls[o] for o in OBJECT_NAME_REGEX.findall(data) if o in self.object_ttls]
+        return min(object_ttls) if object_ttls else self.default_ttl
+
+    def get(self, url: str, data: str, router: str = '') -> Optional[Any]:
+        """Get a cached response, None if missing or expired
+
+        :param url: request URL
+        :param data: request body
+        :param router: router the request is sent to
+        """
+
+        key = (router, url, data)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    del self.__entries[key]
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry.response
+
+    def put(self, url: str, data: str, response: Any, router: str = ''):
+        """Cache a response
+
+        :param url: request URL
+        :param data: request body
+        :param response: response to cache
+        :param router: router the request was sent to
+        """
+
+        ttl = self.ttl(data)
+        if ttl <= 0:
+            return
+
+        entry = CacheEntry(response, time.monotonic() + ttl, frozenset(OBJECT_NAME_REGEX.findall(data)))
+        key = (router, url, data)
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, data: str, router: str = ''):
+        """Evict every cached read of the objects written by a request
+
+        :param data: body of the writing request
+        :param router: router the request was sent to
+        """
+
+        object_names = set(OBJECT_NAME_REGEX.findall(data))
+        with self.__lock:
+            stale = [key for key, entry in self.__entries.items()
+                     if key[0] == router and not object_names.isdisjoint(entry.object_names)]
+            for key in stale:
+                del self.__entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Evict all the cached responses
+        """
+
+        with self.__lock:
+            self.__entries.clear()
@@ -0,0 +1,455 @@
+import abc
+import time
+import math
+import heapq
+import threading
+from array import array
+from typing import List, Dict, Optional, Sequence, Iterable, Tuple
+
+from .connection import ArcherConnection
+from .constants import *
+from .models import Stack, WifiFreq
+from .parsers import normalize_mac
+from .query import Query, QueryBatch, projected_query
+from .schemas import field_types_for
+
+
+DSL_GAUGE_FIELDS = (
+    'upstreamCurrRate', 'downstreamCurrRate', 'upstreamMaxRate', 'downstreamMaxRate',
+    'upstreamNoiseMargin', 'downstreamNoiseMargin', 'upstreamAttenuation', 'downstreamAttenuation',
+)
+
+DSL_COUNTER_FIELDS = (
+    'ATUCCRCErrors', 'CRCErrors', 'ATUCFECErrors', 'FECErrors',
+    'severelyErroredSecs', 'X_TP_US_SeverelyErroredSecs', 'erroredSecs', 'X_TP_US_ErroredSecs',
+)
+
+WIFI_PACKET_ATTRIBUTES = ('associatedDeviceMACAddress', 'X_TP_TotalPacketsSent', 'X_TP_TotalPacketsReceived')
+
+
+def counter_delta(previous: float, current: float, wrap: int = PACKET_COUNTER_WRAP) -> float:
+    """Increase of a cumulative counter between two samples
+
+    A counter lower than the previous sample either wrapped around, if the previous value was in the last quarter of
+    its range, or was reset to zero, e.g. by a reconnection, and then its increase is the counter value.
+
+    :param previous: previous counter value
+    :param current: current counter value
+    :param wrap: counter range
+    :rtype: float
+    """
+
+    if current >= previous:
+        return current - previous
+    if previous >= wrap * 0.75:
+        return current + wrap - previous
+    return current
+
+
+def to_float(value: Optional[str]) -> float:
+    """Convert a Section value to float, NaN if missing or not numeric
+
+    :param value:
+    :rtype: float
+    """
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def parse_wifi_packet_counters(stack: Stack) -> List[Tuple[str, float, float]]:
+    """Parse the response to a WiFi clients query projected to WIFI_PACKET_ATTRIBUTES
+
+    :param stack: response stack
+    :return: (normalized MAC address, packets sent, packets received) of each station, NaN counters if missing
+    :rtype: List[Tuple[str, float, float]]
+    """
+
+    stations = []
+    for section in stack.sections:
+        if not section.is_error:
+            values = section.values
+            stations.append((normalize_mac(values.get('associatedDeviceMACAddress')),
+                             to_float(values.get('X_TP_TotalPacketsSent')),
+                             to_float(values.get('X_TP_TotalPacketsReceived'))))
+    return stations
+
+
+class RingBuffer(object):
+    """Fixed size buffer of numeric samples, one preallocated array('d') per field
+
+    Windows are returned as array('d') copies in chronological order, numpy.frombuffer() can wrap them without
+    copying again.
+    """
+
+    def __init__(self, fields: Sequence[str], capacity: int):
+        """Init RingBuffer object
+
+        :param fields: field names
+        :param capacity: number of samples kept, the oldest is overwritten first
+        """
+        if capacity <= 0:
+            raise ValueError('Capacity must be positive')
+
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.columns = {f: array('d', bytes(8 * capacity)) for f in self.fields}
+        self.head = 0       # next position to write
+        self.count = 0
+
+    def __repr__(self):
+        return f'<RingBuffer(fields={len(self.fields)},count={self.count},capacity={self.capacity})>'
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp: float, values: Sequence[float]):
+        """Add a sample
+
+        :param timestamp: sample time, in seconds
+        :param values: one value for each field, in the same order
+        """
+
+        head = self.head
+        self.timestamps[head] = timestamp
+        for column, value in zip(self.columns.values(), values):
+            column[head] = value
+        self.head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def __last(self, column: array, n: int) -> array:
+        """Last n values of a column in chronological order
+
+        :param column: column array
+        :param n: number of samples
+        :rtype: array
+        """
+
+        start = self.head - n
+        if start >= 0:
+            return column[start:self.head]
+        return column[start:] + column[:self.head]
+
+    def window(self, n: Optional[int] = None) -> Dict[str, array]:
+        """Get the last n samples, all of them if None
+
+        :param n: number of samples
+        :return: dict with a 'timestamp' array and one array for each field
+        :rtype: Dict[str, array]
+        """
+
+        n = self.count if n is None else min(n, self.count)
+        window = {'timestamp': self.__last(self.timestamps, n)}
+        for field, column in self.columns.items():
+            window[field] = self.__last(column, n)
+        return window
+
+    def rates(self, field: str, n: Optional[int] = None, wrap: int = PACKET_COUNTER_WRAP) -> array:
+        """Per second rate of change of a cumulative counter over the last n samples
+
+        A counter lower than the previous sample wrapped around or was reset, see counter_delta().
+
+        :param field: counter field name
+        :param n: number of samples, the result has n - 1 values
+        :param wrap: counter range
+        :rtype: array
+        """
+
+        window = self.window(n)
+        timestamps = window['timestamp']
+        values = window[field]
+        rates = array('d')
+        for i in range(1, len(values)):
+            elapsed = timestamps[i] - timestamps[i - 1]
+            delta = counter_delta(values[i - 1], values[i], wrap)
+            rates.append(delta / elapsed if elapsed > 0 else math.nan)
+        return rates
+
+########################################################################################################################
+
+
+class PeriodicSampler(abc.ABC):
+    """Base of the collectors that call sample() at a fixed rate, in the calling thread or in a background one
+    """
+
+    THREAD_NAME = 'archer-sampler'
+
+    def __init__(self, interval: float):
+        """Init PeriodicSampler object
+
+        :param interval: seconds between two samples
+        """
+        self.interval = interval
+        self.errors = 0
+        self.__stop_event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    @abc.abstractmethod
+    def sample(self):
+        """Take one sample, always reading the router rather than a cached response
+        """
+
+    def run(self, stop_event: Optional[threading.Event] = None):
+        """Sample every interval seconds until stop_event is set, failed samples are counted in errors
+
+        :param stop_event: event that stops the collector when set, the one of stop() if None
+        """
+
+        stop_event = stop_event or self.__stop_event
+        next_sample = time.monotonic()
+        while not stop_event.is_set():
+            try:
+                self.sample()
+            except Exception:
+                self.errors += 1
+            next_sample += self.interval
+            stop_event.wait(max(0.0, next_sample - time.monotonic()))
+
+    def start(self):
+        """Start sampling in a background thread
+        """
+
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.run, name=self.THREAD_NAME, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop the background thread started by start()
+        """
+
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+########################################################################################################################
+
+
+class DslStatsCollector(PeriodicSampler):
+    """Samples the DSL line statistics of a router into a ring buffer at a fixed rate
+    """
+
+    THREAD_NAME = 'archer-dsl-collector'
+
+    FIELDS = DSL_GAUGE_FIELDS + DSL_COUNTER_FIELDS
+
+    def __init__(self, connection: ArcherConnection, capacity: int = DEFAULT_COLLECTOR_CAPACITY,
+                 interval: float = DEFAULT_COLLECTOR_INTERVAL):
+        """Init DslStatsCollector object
+
+        :param connection: authenticated router connection
+        :param capacity: number of samples kept
+        :param interval: seconds between two samples
+        """
+        super().__init__(interval)
+        self.connection = connection
+        self.buffer = RingBuffer(self.FIELDS, capacity)
+
+    def __repr__(self):
+        return f'<DslStatsCollector(router_url={self.connection.router_url},samples={len(self.buffer)})>'
+
+    def sample(self):
+        """Read the line statistics once and append them to the buffer
+        """
+
+        r = self.connection.api_request('post', STATS_URL, STATS_QUERY, use_cache=False)
+        timestamp = time.time()
+        stack = Stack(r.text, field_types_for(STATS_URL, STATS_QUERY))
+
+        config = stack.get_sections(0)
+        totals = stack.get_sections(1)
+        config_values = config[0].values if config else {}
+        total_values = totals[0].values if totals else {}
+
+        values = [to_float(config_values.get(f)) for f in DSL_GAUGE_FIELDS]
+        values.extend(to_float(total_values.get(f)) for f in DSL_COUNTER_FIELDS)
+        self.buffer.append(timestamp, values)
+
+    def window(self, n: Optional[int] = None) -> Dict[str, array]:
+        """Get the last n samples, all of them if None
+
+        :param n: number of samples
+        :rtype: Dict[str, array]
+        """
+
+        return self.buffer.window(n)
+
+    def error_rates(self, n: Optional[int] = None) -> Dict[str, array]:
+        """Per second rates of every error counter over the last n samples
+
+        :param n: number of samples
+        :rtype: Dict[str, array]
+        """
+
+        return {f: self.buffer.rates(f, n) for f in DSL_COUNTER_FIELDS}
+
+########################################################################################################################
+
+
+class WifiTrafficTracker(PeriodicSampler):
+    """Packet rates of every WiFi station of both bands, from the X_TP_TotalPackets* counters
+
+    Stations are kept in preallocated array('d') columns indexed by a MAC address to slot dict, slots of evicted
+    stations are reused, so a sample only updates numbers in place. Updates and reads take the same lock, so rates
+    can be read while start() samples in the background.
+    """
+
+    COLUMNS = ('seen_at', 'sent', 'received', 'sent_rate', 'received_rate')
+    THREAD_NAME = 'archer-wifi-tracker'
+
+    def __init__(self, connection: ArcherConnection, stale_after: float = DEFAULT_WIFI_STALE_AFTER,
+                 capacity: int = 64, interval: float = DEFAULT_COLLECTOR_INTERVAL):
+        """Init WifiTrafficTracker object
+
+        :param connection: authenticated router connection
+        :param stale_after: seconds after which a station that is no longer associated is forgotten
+        :param capacity: initial number of slots, the store grows as needed
+        :param interval: seconds between two samples
+        """
+        super().__init__(interval)
+        self.connection = connection
+        self.stale_after = stale_after
+        self.slots: Dict[str, int] = {}
+        self.bands: Dict[str, WifiFreq] = {}
+        self.free: List[int] = []
+        self.capacity = 0
+        self.last_sample = 0.0
+        self.columns = {c: array('d') for c in self.COLUMNS}
+        self.__lock = threading.Lock()
+        self.__grow(capacity)
+
+        batch = QueryBatch()
+        for name, body in (('2g', WIFI_2G_CLIENTS_QUERY), ('5g', WIFI_5G_CLIENTS_QUERY)):
+            batch.add(name, projected_query(WIFI_CLIENTS_URL, body, WIFI_PACKET_ATTRIBUTES),
+                      parse_wifi_packet_counters)
+        self.batch = batch
+
+    def __repr__(self):
+        return f'<WifiTrafficTracker(router_url={self.connection.router_url},stations={len(self)})>'
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __grow(self, capacity: int):
+        for column in self.columns.values():
+            column.extend(array('d', bytes(8 * (capacity - self.capacity))))
+        self.free.extend(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def sample(self):
+        """Read the counters of both bands in a single request and update the rates
+        """
+
+        results = self.connection.execute_batch(self.batch, use_cache=False)
+        timestamp = time.time()
+        stations = [(mac, WifiFreq.WIFI_2G, sent, received) for mac, sent, received in results['2g']]
+        stations.extend((mac, WifiFreq.WIFI_5G, sent, received) for mac, sent, received in results['5g'])
+        self.update(timestamp, stations)
+
+    def update(self, timestamp: float, stations: Iterable[Tuple[str, WifiFreq, float, float]], evict: bool = True):
+        """Add a sample of the counters
+
+        :param timestamp: sample time, in seconds
+        :param stations: (MAC address, band, packets sent, packets received) of each associated station
+        :param evict: forget the stations not seen for stale_after seconds
+        """
+
+        with self.__lock:
+            seen_at = self.columns['seen_at']
+            sent_column = self.columns['sent']
+            received_column = self.columns['received']
+            sent_rates = self.columns['sent_rate']
+            received_rates = self.columns['received_rate']
+
+            for mac_address, band, sent, received in stations:
+                if not mac_address or math.isnan(sent) or math.isnan(received):
+                    continue
+                slot = self.slots.get(mac_address)
+                if slot is None:
+                    if not self.free:
+                        self.__grow(self.capacity * 2)
+                    slot = self.free.pop()
+                    self.slots[mac_address] = slot
+                    sent_rates[slot] = received_rates[slot] = 0.0
+                else:
+                    elapsed = timestamp - seen_at[slot]
+                    if self.bands[mac_address] != band:     # roamed to the other band, its counters start again
+                        sent_rates[slot] = received_rates[slot] = 0.0
+                    elif elapsed > 0:
+                        sent_rates[slot] = counter_delta(sent_column[slot], sent) / elapsed
+                        received_rates[slot] = counter_delta(received_column[slot], received) / elapsed
+                self.bands[mac_address] = band
+                seen_at[slot] = timestamp
+                sent_column[slot] = sent
+                received_column[slot] = received
+            self.last_sample = timestamp
+
+            if evict:
+                self.__evict(timestamp)
+
+    def evict(self, now: float) -> List[str]:
+        """Forget the stations not seen for stale_after seconds
+
+        :param now: current time, in seconds
+        :return: MAC addresses of the evicted stations
+        :rtype: List[str]
+        """
+
+        with self.__lock:
+            return self.__evict(now)
+
+    def __evict(self, now: float) -> List[str]:
+        seen_at = self.columns['seen_at']
+        stale = [mac for mac, slot in self.slots.items() if now - seen_at[slot] > self.stale_after]
+        for mac_address in stale:
+            self.free.append(self.slots.pop(mac_address))
+            del self.bands[mac_address]
+        return stale
+
+    def rates(self, mac_address: str) -> Optional[Tuple[float, float]]:
+        """Last packet rates of a station, None if it is not tracked
+
+        :param mac_address: station MAC address
+        :return: (packets sent per second, packets received per second)
+        :rtype: Optional[Tuple[float, float]]
+        """
+
+        mac_address = normalize_mac(mac_address)
+        with self.__lock:
+            slot = self.slots.get(mac_address)
+            if slot is None:
+                return None
+            return self.columns['sent_rate'][slot], self.columns['received_rate'][slot]
+
+    def top(self, n: int, by: str = 'total') -> List[Tuple[str, float, float]]:
+        """Stations of the last sample with the highest packet rates
+
+        :param n: number of stations
+        :param by: 'sent', 'received' or 'total'
+        :return: (MAC address, packets sent per second, packets received per second), highest first
+        :rtype: List[Tuple[str, float, float]]
+        """
+
+        sent_rates = self.columns['sent_rate']
+        received_rates = self.columns['received_rate']
+        if by == 'sent':
+            key = lambda item: sent_rates[item[1]]
+        elif by == 'received':
+            key = lambda item: received_rates[item[1]]
+        elif by == 'total':
+            key = lambda item: sent_rates[item[1]] + received_rates[item[1]]
+        else:
+            raise ValueError("by must be 'sent', 'received' or 'total'")
+
+        seen_at = self.columns['seen_at']
+        with self.__lock:
+            last_sample = self.last_sample
+            stations = ((mac, slot) for mac, slot in self.slots.items() if seen_at[slot] >= last_sample)
+            return [(mac, sent_rates[slot], received_rates[slot])
+                    for mac, slot in heapq.nlargest(n, stations, key=key)]
@@ -1,52 +1,147 @@
 import os
 import base64
+import hashlib
+import time
+import tempfile
 import requests
-from typing import List
+from contextlib import contextmanager
+from typing import List, Optional, Iterator, Iterable, Callable, Any, Sequence
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from .exceptions import AuthError, RequestError
 from .constants import *
-from .models import Stack, DHCPLease, PortForwardingRule, WifiFreq
+from .models import Stack, Section, DHCPLease, PortForwardingRule, WifiFreq
+from .query import Query, QueryBatch, QueryBlock, projected_query, is_read_only_request
+from .reconcile import diff_dhcp_leases, diff_port_forwarding_rules, split_in_batches
+from .cache import ResponseCache
+from .metrics import RequestEvent, endpoint_name
+from .schemas import field_types_for, field_types_for_query
+from . import parsers
+
+
+class CgiRetry(Retry):
+    """Retry that sends a write command again only if it never reached the router
+
+    Errors after the request was sent, e.g. a read timeout, are retried only for read-only requests: the router may
+    have applied the command already.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if error is not None and not self._is_connection_error(error) and \
+                not is_read_only_request(method or '', url or ''):
+            raise error.with_traceback(_stacktrace)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+########################################################################################################################
 
 
 class ArcherConnection(object):
     """Object that provides an interface with TP-Link Archer routers
     """
 
-    def __init__(self, router_url: str):
+    def __init__(self, router_url: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: Optional[float] = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES, cache: Optional[ResponseCache] = None,
+                 hooks: Optional[Iterable[Callable[[RequestEvent], None]]] = None):
         """Init ArcherConnection object
 
         :param router_url: URL or IP address of the router
+        :param pool_size: maximum number of keep-alive connections kept open to the router
+        :param connect_timeout: seconds to wait for the TCP connection, None waits forever
+        :param read_timeout: seconds to wait for the router to answer, None waits forever
+        :param max_retries: times a request is retried when the router drops the connection
+        :param cache: cache for read queries, can be shared with the connections to other routers, nothing is cached if
+            None
+        :param hooks: functions called with a RequestEvent after every API request, e.g. a MetricsRecorder
         """
 
         self.router_url = router_url
         self.is_authenticated = False
         self.headers = None
+        self.credentials: Optional[str] = None
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = self.__create_session(pool_size, max_retries)
+        self.cache = cache
+        self.hooks: List[Callable[[RequestEvent], None]] = list(hooks or [])
 
     def __repr__(self):
         return f'<ArcherConnection(router_url={self.router_url},is_authenticated={str(self.is_authenticated)})>'
 
-    def authenticate(self, username: str, password: str):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def __create_session(pool_size: int, max_retries: int) -> requests.Session:
+        """Creates the keep-alive session used for every request
+
+        Requests are retried on connection errors too: the router closes idle sockets without notice, so a pooled
+        connection may already be dead when it is reused. Write commands are not retried once sent, see CgiRetry.
+
+        :param pool_size: maximum number of pooled connections
+        :param max_retries: retries on connection errors
+        :rtype: requests.Session
+        """
+
+        retry_options = {
+            'total': max_retries,
+            'connect': max_retries,
+            'read': max_retries,
+            'status': 0,
+            'backoff_factor': 0.1,
+            'raise_on_status': False,
+        }
+        try:
+            retry = CgiRetry(allowed_methods=frozenset(['GET', 'POST']), **retry_options)
+        except TypeError:   # urllib3 < 1.26
+            retry = CgiRetry(method_whitelist=frozenset(['GET', 'POST']), **retry_options)
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        """Closes all the pooled connections to the router
+        """
+
+        self.session.close()
+
+    def authenticate(self, username: str, password: str, lazy: bool = False):
         """Authenticate to the router using your username and password
 
         :param username:
         :param password:
+        :param lazy: skip the authentication request, credentials are checked by the first API request
         """
 
         credentials = base64.b64encode(
             bytes('{}:{}'.format(username, password), 'UTF-8')).decode('UTF-8')
-        self.authenticate_basicauth(credentials)
-  
-    def authenticate_basicauth(self, credentials: str):
+        self.authenticate_basicauth(credentials, lazy)
+
+    def authenticate_basicauth(self, credentials: str, lazy: bool = False):
         """Authenticate using your username and password encoded in base64
 
         :param credentials: base64 encoded 'username:password'
+        :param lazy: skip the authentication request, credentials are checked by the first API request
         """
 
+        self.credentials = credentials
         self.headers = {
             'Referer': f'http://{self.router_url}/',
             'Cookie': 'Authorization=Basic ' + credentials
         }
 
+        if lazy:
+            self.is_authenticated = True
+            return
+
+        self.is_authenticated = False
         attempts = 1
         while attempts <= 2 and not self.is_authenticated:      # sometimes 2 attempts are necessary
             r = self.__get_request(AUTHENTICATION_URL)
@@ -57,74 +152,217 @@ class ArcherConnection(object):
         if not self.is_authenticated:
             raise AuthError
 
-    def __get_request(self, request_url: str) -> requests.Response:
+    def __get_request(self, request_url: str, stream: bool = False) -> requests.Response:
         """Performs a GET request
 
         :param request_url:
+        :param stream: do not read the body before returning
         :rtype: requests.Response
         """
-        r = requests.get(
+        r = self.session.get(
             f'http://{self.router_url}/{request_url}',
             headers=self.headers,
+            timeout=self.timeout,
+            stream=stream
         )
         return r
 
-    def __post_request(self, request_url: str, data: dict) -> requests.Response:
+    def __post_request(self, request_url: str, data: dict, stream: bool = False) -> requests.Response:
         """Performs a POST request
 
         :param request_url:
         :param data: data to send
+        :param stream: do not read the body before returning
         :rtype: requests.Response
         """
-        r = requests.post(
+        r = self.session.post(
             f'http://{self.router_url}/{request_url}',
             headers=self.headers,
-            data=data
+            data=data,
+            timeout=self.timeout,
+            stream=stream
         )
         return r
 
-    def api_request(self, request_type: str, url: str, data: dict = None) -> requests.Response:
+    def __send(self, request_type: str, url: str, data: dict = None, stream: bool = False) -> requests.Response:
+        """Performs a GET or POST request
+
+        :param request_type: either 'get' or 'post'
+        :param url: request URL
+        :param data: data to send in a POST request, ignored if GET
+        :param stream: do not read the body before returning
+        :rtype: requests.Response
+        """
+
+        if request_type == 'get':
+            return self.__get_request(url, stream)
+        elif request_type == 'post':
+            return self.__post_request(url, data, stream)
+        raise ValueError('Invalid request type')
+
+    def add_hook(self, hook: Callable[[RequestEvent], None]):
+        """Add a function called with a RequestEvent after every API request
+
+        Hooks are called in the thread that made the request, they should be quick and not raise.
+
+        :param hook: function called with the event
+        """
+
+        self.hooks.append(hook)
+
+    @contextmanager
+    def __instrument(self, request_type: str, url: str, data: Optional[str]) -> Iterator[RequestEvent]:
+        """Creates the event of a request and passes it to the hooks when the request is done, failed or not
+
+        :param request_type: either 'get' or 'post'
+        :param url: request URL
+        :param data: request body
+        :rtype: Iterator[RequestEvent]
+        """
+
+        event = RequestEvent(endpoint_name(url, data), request_type, url)
+        try:
+            yield event
+        except Exception as e:
+            event.error = type(e).__name__
+            raise
+        finally:
+            for hook in self.hooks:
+                hook(event)
+
+    def api_request(self, request_type: str, url: str, data: dict = None, stream: bool = False,
+                    use_cache: bool = True) -> requests.Response:
         """Performs an HTTP request to the device
 
         :param request_type: either 'get' or 'post'
         :param url: request URL
         :param data: data to send in a POST request, ignored if GET
+        :param stream: do not read the body before returning, the response must be closed by the caller
+        :param use_cache: serve and store reads through the cache, writes invalidate it anyway
+        :rtype: requests.Response
+
+        If the router answers 401 or 403 the connection authenticates again and the request is retried once.
+        """
+
+        with self.__instrument(request_type, url, data) as event:
+            return self.__api_request(request_type, url, data, stream, event, use_cache)
+
+    def __api_request(self, request_type: str, url: str, data: Optional[str], stream: bool,
+                      event: RequestEvent, use_cache: bool = True) -> requests.Response:
+        """api_request() recording what happens in event
+
+        :param request_type: either 'get' or 'post'
+        :param url: request URL
+        :param data: data to send in a POST request, ignored if GET
+        :param stream: do not read the body before returning
+        :param event: event of the request
+        :param use_cache: serve and store reads through the cache
         :rtype: requests.Response
         """
 
         if not self.is_authenticated:
             raise AuthError
 
-        if request_type == 'get':
-            r = self.__get_request(url)
-        elif request_type == 'post':
-            r = self.__post_request(url, data)
+        cacheable = self.cache is not None and request_type == 'post' and not stream
+        read_only = cacheable and is_read_only_request(request_type, url)
+        if read_only and use_cache:
+            r = self.cache.get(url, data, self.router_url)
+            if r is not None:
+                event.cached = True
+                event.status = r.status_code
+                event.response_size = len(r.content)
+                return r
+
+        start = attempt_start = time.perf_counter()
+        try:
+            r = self.__send(request_type, url, data, stream)
+            if r.status_code in UNAUTHORIZED_STATUS_CODES and self.credentials:   # session expired, retry once
+                r.close()
+                event.auth_retries += 1
+                self.authenticate_basicauth(self.credentials)
+                attempt_start = time.perf_counter()
+                r = self.__send(request_type, url, data, stream)
+        finally:
+            if cacheable and not read_only:     # after the write, reads racing it must not cache the old value
+                self.cache.invalidate(data, self.router_url)
+        end = time.perf_counter()
+
+        event.status = r.status_code
+        if stream:
+            event.connect_time = end - start
+            content_length = r.headers.get('Content-Length')
+            event.response_size = int(content_length) if content_length and content_length.isdigit() else None
         else:
-            raise ValueError('Invalid request type')
+            headers_time = min(r.elapsed.total_seconds(), end - attempt_start)
+            event.connect_time = attempt_start - start + headers_time
+            event.transfer_time = end - attempt_start - headers_time
+            event.response_size = len(r.content)
 
         if r.status_code != 200:
+            r.close()
             raise RequestError('Response status code not 200')
 
+        if read_only and use_cache:
+            self.cache.put(url, data, r, self.router_url)
+
         return r
 
-    def get_stats(self) -> dict:
-        """Get router statistics about connection speed
+    def __query(self, url: str, data: str, parser: Callable[[Stack], Any], field_types: Optional[dict] = None,
+                use_cache: bool = True) -> Any:
+        """Sends a read query and parses the response, the parse time is recorded in the request event
+
+        :param url: request URL
+        :param data: query
+        :param parser: function called with the response Stack
+        :param field_types: Stack field decoders, by default the ones of the query
+        :param use_cache: serve and store the response through the cache
+        :return: value returned by parser
+        """
+
+        with self.__instrument('post', url, data) as event:
+            r = self.__api_request('post', url, data, False, event, use_cache)
+            start = time.perf_counter()
+            result = parser(Stack(r.text, field_types_for(url, data) if field_types is None else field_types))
+            event.parse_time = time.perf_counter() - start
+            return result
+
+    def stream_sections(self, url: str, data: str) -> Iterator[Section]:
+        """Sends a query and yields the Sections of the response while it is being received
+
+        :param url: request URL
+        :param data: query
+        :rtype: Iterator[Section]
+        """
+
+        with self.api_request('post', url, data, stream=True) as r:
+            if r.encoding is None:
+                r.encoding = 'utf-8'
+            yield from Stack.iter_sections(r.iter_lines(decode_unicode=True), field_types_for(url, data))
 
+    def execute_batch(self, batch: QueryBatch, use_cache: bool = True) -> dict:
+        """Sends all the queries of a batch in a single request
+
+        :param batch: QueryBatch to send
+        :param use_cache: serve and store the response through the cache, False to always read the router
+        :return: dict of results by query name
         :rtype: dict
         """
 
-        data = STATS_QUERY
-        r = self.api_request('post', STATS_URL, data)
+        query = batch.query
+        return self.__query(query.url, query.body, batch.parse, field_types_for_query(query), use_cache)
+
+    def get_stats(self, fields: Optional[Sequence[str]] = None) -> dict:
+        """Get router statistics about connection speed
 
-        stack = Stack(r.text)
-        values = stack.sections[0].values
+        Only the attributes of the selected fields are requested to the router.
 
-        return {
-            'current_up_rate': values.get('upstreamCurrRate'),
-            'current_down_rate': values.get('downstreamCurrRate'),
-            'max_up_rate': values.get('upstreamMaxRate'),
-            'max_down_rate': values.get('downstreamMaxRate'),
-        }
+        :param fields: fields to get, see parsers.STATS_FIELDS, all of them if None
+        :rtype: dict
+        """
+
+        fields = tuple(fields) if fields is not None else None
+        query = projected_query(STATS_URL, STATS_QUERY, parsers.project_fields(parsers.STATS_FIELDS, fields))
+        return self.__query(query.url, query.body, lambda stack: parsers.parse_stats(stack, fields))
 
     def get_external_ip(self) -> str:
         """Get router external IP address
@@ -133,34 +371,46 @@ class ArcherConnection(object):
         """
 
         data = EXTERNAL_IP_QUERY
-        r = self.api_request('post', EXTERNAL_IP_URL, data)
+        return self.__query(EXTERNAL_IP_URL, data, parsers.parse_external_ip)
 
-        stack = Stack(r.text)
-        section = stack.get_section('[1,1,1,0,0,0]7')
-        external_ip = section.values.get('externalIPAddress')
-        return external_ip
-
-    def get_dhcp_clients(self) -> List[dict]:
+    def get_dhcp_clients(self, fields: Optional[Sequence[str]] = None) -> List[dict]:
         """Get all (almost) router DHCP clients
 
+        :param fields: fields of each client, see parsers.DHCP_CLIENT_FIELDS, all of them if None
         :rtype: list
         """
 
-        data = DHCP_CLIENTS_QUERY
-        r = self.api_request('post', DHCP_CLIENTS_URL, data)
+        fields = tuple(fields) if fields is not None else None
+        query = self.__dhcp_clients_query(fields)
+        return self.__query(query.url, query.body, lambda stack: parsers.parse_dhcp_clients(stack, fields))
+
+    def iter_dhcp_clients(self, fields: Optional[Sequence[str]] = None) -> Iterator[dict]:
+        """Get all (almost) router DHCP clients, yielding each one while the response is being received
+
+        :param fields: fields of each client, see parsers.DHCP_CLIENT_FIELDS, all of them if None
+        :rtype: Iterator[dict]
+        """
 
-        stack = Stack(r.text)
+        fields = tuple(fields) if fields is not None else None
+        query = self.__dhcp_clients_query(fields)
+        for section in self.stream_sections(query.url, query.body):
+            if not section.is_error:
+                yield parsers.parse_dhcp_client(section, fields)
+
+    @staticmethod
+    def __dhcp_clients_query(fields: Optional[tuple]) -> Query:
+        return projected_query(DHCP_CLIENTS_URL, DHCP_CLIENTS_QUERY,
+                               parsers.project_fields(parsers.DHCP_CLIENT_FIELDS, fields))
+
+    @staticmethod
+    def __wifi_clients_query(wifi_freq: WifiFreq) -> Query:
+        """Query of the MAC addresses only, the packet counters and hostnames of WIFI_*_CLIENTS_QUERY are not used
+        """
 
-        clients = []
-        for c in stack.sections:
-            values = c.values
-            if c.identifier != '[error]0':
-                clients.append({
-                    'ip_address': values.get('IPAddress'),
-                    'mac_address': values.get('MACAddress'),
-                    'hostname': values.get('hostName')
-                })
-        return clients
+        data = WIFI_2G_CLIENTS_QUERY
+        if wifi_freq == WifiFreq.WIFI_5G:
+            data = WIFI_5G_CLIENTS_QUERY
+        return projected_query(WIFI_CLIENTS_URL, data, parsers.project_fields(parsers.WIFI_CLIENT_FIELDS))
 
     def get_wifi_clients(self, wifi_freq: WifiFreq) -> List[str]:
         """Get list of MAC addresses connected to specified WiFi frequency
@@ -169,19 +419,21 @@ class ArcherConnection(object):
         :rtype: list
         """
 
-        data = WIFI_2G_CLIENTS_QUERY
-        if wifi_freq == WifiFreq.WIFI_5G:
-            data = WIFI_5G_CLIENTS_QUERY
+        query = self.__wifi_clients_query(wifi_freq)
+        return self.__query(query.url, query.body, parsers.parse_wifi_clients)
 
-        r = self.api_request('post', WIFI_CLIENTS_URL, data)
+    def iter_wifi_clients(self, wifi_freq: WifiFreq) -> Iterator[str]:
+        """Get MAC addresses connected to specified WiFi frequency, yielding each one while the response is being
+        received
 
-        stack = Stack(r.text)
+        :param wifi_freq: WiFi frequency
+        :rtype: Iterator[str]
+        """
 
-        clients = []
-        for c in stack.sections:
-            if c.identifier != '[error]0':
-                clients.append(c.values.get('associatedDeviceMACAddress'))
-        return clients
+        query = self.__wifi_clients_query(wifi_freq)
+        for section in self.stream_sections(query.url, query.body):
+            if not section.is_error:
+                yield parsers.parse_wifi_client(section)
 
     def get_dhcp_leases(self) -> List[DHCPLease]:
         """Get list of all static DHCP leases
@@ -191,24 +443,7 @@ class ArcherConnection(object):
         """
 
         data = DHCP_LEASES_QUERY
-        r = self.api_request('post', DHCP_LEASES_URL, data)
-
-        stack = Stack(r.text)
-
-        leases = []
-        for section in stack.sections:
-            identifier = section.identifier
-            if identifier != '[error]0':
-                values = section.values
-                l = DHCPLease(
-                    identifier=identifier,
-                    ip_address=values.get('yiaddr'),
-                    mac_address=values.get('chaddr'),
-                    is_enabled=values.get('enable') == '1'
-                )
-                leases.append(l)
-
-        return leases
+        return self.__query(DHCP_LEASES_URL, data, parsers.parse_dhcp_leases)
 
     def create_dhcp_lease(self, ip_address: str, mac_address: str, is_enabled: bool) -> DHCPLease:
         """Create DHCP lease
@@ -249,6 +484,65 @@ class ArcherConnection(object):
         self.api_request('post', DHCP_LEASES_TOGGLE_URL, data)
         dhcp_lease.is_enabled = enable
 
+    def apply_dhcp_leases(self, desired: List[DHCPLease], delete_missing: bool = True,
+                          max_batch_size: int = DEFAULT_WRITE_BATCH_SIZE) -> List[DHCPLease]:
+        """Make the static DHCP leases match the desired ones, matching them by MAC address
+
+        All creates, deletes and updates are sent as multi-block commands, max_batch_size blocks per request, and the
+        leases are read once before and once after.
+
+        :param desired: leases that should be on the router, their identifier is ignored
+        :param delete_missing: delete the leases whose MAC address is not desired
+        :param max_batch_size: maximum number of commands in a single request
+        :return: leases on the router after the changes
+        :rtype: List[DHCPLease]
+        """
+
+        current = self.get_dhcp_leases()
+        changes = diff_dhcp_leases(current, desired, delete_missing)
+        if not changes:
+            return current
+
+        self.execute_commands(changes.to_blocks(), max_batch_size)
+        return self.get_dhcp_leases()
+
+    def apply_port_forwarding_rules(self, desired: List[PortForwardingRule], delete_missing: bool = True,
+                                    max_batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+                                    object_name: Optional[str] = None,
+                                    parent_stack: Optional[str] = None) -> List[PortForwardingRule]:
+        """Make the port forwarding rules match the desired ones, matching them by protocol and external port range
+
+        Like apply_dhcp_leases(), every change is sent as a multi-block command. New rules are added to the WAN
+        connection of the first existing rule, unless object_name and parent_stack are specified.
+
+        :param desired: rules that should be on the router, their identifier is ignored
+        :param delete_missing: delete the rules that are not desired
+        :param max_batch_size: maximum number of commands in a single request
+        :param object_name: port mapping object new rules are added to, e.g. WAN_IP_CONN_PORTMAPPING
+        :param parent_stack: stack of the WAN connection new rules are added to, e.g. 1,1,1,0,0,0
+        :return: rules on the router after the changes
+        :rtype: List[PortForwardingRule]
+        """
+
+        current = self.get_port_forwarding_rules()
+        changes = diff_port_forwarding_rules(current, desired, delete_missing, object_name, parent_stack)
+        if not changes:
+            return current
+
+        self.execute_commands(changes.to_blocks(), max_batch_size)
+        return self.get_port_forwarding_rules()
+
+    def execute_commands(self, blocks: List[QueryBlock], max_batch_size: int = DEFAULT_WRITE_BATCH_SIZE):
+        """Sends write commands in as few requests as possible
+
+        :param blocks: command blocks, sent in order
+        :param max_batch_size: maximum number of blocks in a single request
+        """
+
+        for query in split_in_batches(blocks, max_batch_size):
+            r = self.api_request('post', query.url, query.body)
+            parsers.check_errors(Stack(r.text))
+
     def enable_dhcp_lease(self, dhcp_lease: DHCPLease):
         """Enables DHCP lease
 
@@ -271,40 +565,66 @@ class ArcherConnection(object):
         """
 
         data = PORT_FORWARDING_RULES_QUERY
-        r = self.api_request('post', PORT_FORWARDING_RULES_URL, data)
-
-        stack = Stack(r.text)
-
-        rules = []
-        for section in stack.sections:
-            identifier = section.identifier
-            if identifier != '[error]0':
-                values = section.values
-                r = PortForwardingRule(
-                    identifier=identifier,
-                    client_ip_address=values.get('internalClient'),
-                    internal_port=values.get('internalPort'),
-                    external_port=values.get('externalPort'),
-                    internal_port_end=values.get('X_TP_InternalPortEnd'),
-                    external_port_end=values.get('X_TP_ExternalPortEnd'),
-                    is_enabled=values.get('portMappingEnabled') == '1',
-                    protocol=values.get('portMappingProtocol')
-                )
-                rules.append(r)
-
-        return rules
-
-    def download_config_backup(self, download_path: str = None):
+        return self.__query(PORT_FORWARDING_RULES_URL, data, parsers.parse_port_forwarding_rules)
+
+    def iter_config_backup(self, chunk_size: int = CONFIG_DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        """Downloads router configuration, yielding it in chunks while it is being received
+
+        :param chunk_size: maximum size of each chunk, in bytes
+        :rtype: Iterator[bytes]
+        """
+
+        with self.api_request('get', CONFIG_DOWNLOAD_URL, stream=True) as r:
+            yield from r.iter_content(chunk_size)
+
+    def download_config_backup(self, download_path: str = None, file_name: str = CONFIG_BACKUP_FILE_NAME) -> str:
         """Downloads router configuration
 
+        The file is streamed to a temporary file next to the target and renamed over it only when complete, so an
+        interrupted download never leaves a truncated backup. If the content is the same as the existing backup the
+        existing file is left untouched.
+
         :param download_path: path where to save file
+        :param file_name: name of the saved file
+        :return: SHA-256 hex digest of the configuration
+        :rtype: str
         """
-        file_name = 'conf.bin'
         if not download_path:
             download_path = os.path.join(file_name)
         else:
             download_path = os.path.join(download_path, file_name)
 
-        r = self.api_request('get', CONFIG_DOWNLOAD_URL)
-        with open(download_path, 'wb') as f:
-            f.write(r.content)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(download_path) or '.', prefix=f'.{file_name}.',
+                                         suffix='.part')
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in self.iter_config_backup():
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            if os.path.exists(download_path) and file_sha256(download_path) == digest.hexdigest():
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, download_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return digest.hexdigest()
+
+
+def file_sha256(path: str, chunk_size: int = CONFIG_DOWNLOAD_CHUNK_SIZE) -> str:
+    """Computes the SHA-256 hex digest of a file without reading it all in memory
+
+    :param path: file path
+    :param chunk_size: size of each read, in bytes
+    :rtype: str
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,3 +1,55 @@
+# Connection
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_MAX_RETRIES = 2
+
+UNAUTHORIZED_STATUS_CODES = (401, 403)
+
+DEFAULT_WRITE_BATCH_SIZE = 16
+
+DEFAULT_COLLECTOR_CAPACITY = 3600
+DEFAULT_COLLECTOR_INTERVAL = 1.0
+
+DEFAULT_WIFI_STALE_AFTER = 300.0
+PACKET_COUNTER_WRAP = 2 ** 32       # X_TP_TotalPackets* are 32 bit counters
+
+DEFAULT_FLEET_WORKERS = 16
+DEFAULT_FLEET_TIMEOUT = 10.0
+DEFAULT_FLEET_RETRIES = 2
+DEFAULT_FLEET_BACKOFF = 0.5
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+BACKUP_MIN_CHUNK_SIZE = 2 * 1024        # content-defined chunking of the backup store
+BACKUP_AVG_CHUNK_SIZE = 8 * 1024
+BACKUP_MAX_CHUNK_SIZE = 64 * 1024
+
+HISTORY_DOWNSAMPLE_INTERVAL = 3600          # seconds of the buckets raw stats are downsampled to
+HISTORY_RAW_RETENTION = 7 * 24 * 3600       # seconds raw stats are kept before being downsampled
+HISTORY_RETENTION = 400 * 24 * 3600         # seconds downsampled stats, lease events and hosts are kept
+
+
+########################################################################################################################
+# Actions, one for each block of a cgi request
+
+ACT_GET = 1
+ACT_SET = 2
+ACT_ADD = 3
+ACT_DEL = 4
+ACT_GL = 5
+ACT_GS = 6
+ACT_OP = 7
+ACT_CGI = 8
+
+READ_ONLY_ACTIONS = (ACT_GET, ACT_GL, ACT_GS)     # safe to send again when the answer is lost
+
+CGI_URL = 'cgi'
+
+
+########################################################################################################################
 # URLs
 
 STATS_URL = 'cgi?1&5'
@@ -11,6 +63,8 @@ DHCP_LEASES_TOGGLE_URL = 'cgi?2'
 PORT_FORWARDING_RULES_URL = 'cgi?5&5&5&5'
 
 CONFIG_DOWNLOAD_URL = 'cgi/conf.bin?'
+CONFIG_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+CONFIG_BACKUP_FILE_NAME = 'conf.bin'
 AUTHENTICATION_URL = 'main/status.htm'
 
 
@@ -66,3 +120,20 @@ CREATE_DHCP_LEASE_COMMAND = '[LAN_DHCP_STATIC_ADDR#0,0,0,0,0,0#1,0,0,0,0,0]0,3\r
                             'enable={enabled}\r\n'
 
 DELETE_DHCP_LEASE_COMMAND = '[LAN_DHCP_STATIC_ADDR#{raw_identifier}#0,0,0,0,0,0]0,0\r\n'
+
+
+########################################################################################################################
+# Response cache
+
+DEFAULT_CACHE_MAX_ENTRIES = 128
+DEFAULT_CACHE_TTL = 5.0
+
+DEFAULT_CACHE_TTLS = {
+    STATS_QUERY: 2.0,
+    EXTERNAL_IP_QUERY: 300.0,
+    DHCP_CLIENTS_QUERY: 10.0,
+    WIFI_2G_CLIENTS_QUERY: 5.0,
+    WIFI_5G_CLIENTS_QUERY: 5.0,
+    DHCP_LEASES_QUERY: 300.0,
+    PORT_FORWARDING_RULES_QUERY: 300.0,
+}
@@ -0,0 +1,200 @@
+import json
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable, Any, Union
+
+from .connection import ArcherConnection
+from .exceptions import RequestError
+from .constants import *
+
+
+class RouterConfig(object):
+    """Address and credentials of a router, the same fields saved by the CLI in config.json
+    """
+
+    def __init__(self, router_url: str, username: str, password: str, name: Optional[str] = None):
+        """Init RouterConfig object
+
+        :param router_url: URL or IP address of the router
+        :param username:
+        :param password:
+        :param name: key of the router in the results, defaults to router_url
+        """
+        self.router_url = router_url
+        self.username = username
+        self.password = password
+        self.name = name or router_url
+
+    def __repr__(self):
+        return f'<RouterConfig(name={self.name},router_url={self.router_url})>'
+
+    @classmethod
+    def from_dict(cls, config: dict) -> 'RouterConfig':
+        """Build a RouterConfig from a config.json dict
+
+        :param config: dict with router_url, username, password and optionally name
+        :rtype: RouterConfig
+        """
+
+        return cls(config['router_url'], config['username'], config['password'], config.get('name'))
+
+
+def load_router_configs(path: str) -> List[RouterConfig]:
+    """Load router configs from a JSON file holding either one config.json dict or a list of them
+
+    :param path: JSON file path
+    :rtype: List[RouterConfig]
+    """
+
+    with open(path) as f:
+        configs = json.load(f)
+
+    if isinstance(configs, dict):
+        configs = [configs]
+    return [RouterConfig.from_dict(c) for c in configs]
+
+########################################################################################################################
+
+
+class PollResult(object):
+    """Outcome of polling a single router
+    """
+
+    def __init__(self, name: str, value: Any = None, error: Optional[Exception] = None, attempts: int = 0,
+                 elapsed: float = 0.0):
+        """Init PollResult object
+
+        :param name: router name
+        :param value: value returned by the poll function, None on error
+        :param error: exception raised by the last attempt, None on success
+        :param attempts: number of attempts made
+        :param elapsed: seconds spent on all attempts
+        """
+        self.name = name
+        self.value = value
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f'<PollResult(name={self.name},ok={str(self.ok)},attempts={self.attempts})>'
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class FleetPoller(object):
+    """Polls many routers concurrently on a bounded thread pool
+
+    Every router gets its own ArcherConnection, kept across polls so pooled connections are reused. Failures are
+    retried with exponential backoff and reported per router, so a dead router never holds up the others for longer
+    than its own timeouts.
+    """
+
+    RETRY_EXCEPTIONS = (requests.RequestException, RequestError)
+
+    def __init__(self, routers: List[RouterConfig], max_workers: int = DEFAULT_FLEET_WORKERS,
+                 timeout: float = DEFAULT_FLEET_TIMEOUT, retries: int = DEFAULT_FLEET_RETRIES,
+                 backoff: float = DEFAULT_FLEET_BACKOFF, **connection_options):
+        """Init FleetPoller object
+
+        :param routers: routers to poll
+        :param max_workers: maximum number of routers polled at the same time
+        :param timeout: connect and read timeout of every request, in seconds
+        :param retries: times a failed poll is retried, once the request retries of its connection, max_retries, are
+            exhausted
+        :param backoff: seconds to wait before the first retry, doubled on each following one
+        :param connection_options: other ArcherConnection arguments, e.g. a cache shared by all the connections
+        """
+
+        names = [r.name for r in routers]
+        if len(set(names)) != len(names):
+            raise ValueError('Router names must be unique')
+
+        self.routers = routers
+        self.retries = retries
+        self.backoff = backoff
+        self.connection_options = dict(connection_options, connect_timeout=timeout, read_timeout=timeout)
+        self.__connections: Dict[str, ArcherConnection] = {}
+        self.__lock = threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='archer-fleet')
+
+    def __repr__(self):
+        return f'<FleetPoller(routers={len(self.routers)})>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Stops the worker threads and closes all router connections
+        """
+
+        self.__executor.shutdown(wait=True)
+        with self.__lock:
+            for connection in self.__connections.values():
+                connection.close()
+            self.__connections.clear()
+
+    def get_connection(self, router: RouterConfig) -> ArcherConnection:
+        """Get the authenticated connection to a router, it is created and authenticated on first use
+
+        :param router: router config
+        :rtype: ArcherConnection
+        """
+
+        with self.__lock:
+            connection = self.__connections.get(router.name)
+            if connection is None:
+                connection = ArcherConnection(router.router_url, **self.connection_options)
+                self.__connections[router.name] = connection
+
+        if not connection.is_authenticated:
+            connection.authenticate(router.username, router.password)
+        return connection
+
+    def __poll_router(self, router: RouterConfig, func: Callable[..., Any], with_router: bool = False) -> PollResult:
+        """Poll a single router, retrying on network and request errors
+
+        :param router: router config
+        :param func: function called with the router connection
+        :param with_router: call func with the router config too
+        :rtype: PollResult
+        """
+
+        start = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                connection = self.get_connection(router)
+                value = func(connection, router) if with_router else func(connection)
+                return PollResult(router.name, value=value, attempts=attempts, elapsed=time.monotonic() - start)
+            except self.RETRY_EXCEPTIONS as e:
+                if attempts > self.retries:
+                    return PollResult(router.name, error=e, attempts=attempts, elapsed=time.monotonic() - start)
+                time.sleep(self.backoff * 2 ** (attempts - 1))
+            except Exception as e:
+                return PollResult(router.name, error=e, attempts=attempts, elapsed=time.monotonic() - start)
+
+    def poll(self, func: Union[str, Callable[..., Any]], with_router: bool = False) -> Dict[str, PollResult]:
+        """Poll all routers concurrently
+
+        :param func: function called with each router connection, or the name of an ArcherConnection getter
+            without arguments, e.g. 'get_stats'
+        :param with_router: call func with the RouterConfig of the router too, as its second argument
+        :return: results by router name
+        :rtype: Dict[str, PollResult]
+        """
+
+        if isinstance(func, str):
+            method_name = func
+            func = lambda connection: getattr(connection, method_name)()
+
+        futures = {r.name: self.__executor.submit(self.__poll_router, r, func, with_router) for r in self.routers}
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,419 @@
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple
+
+from .connection import ArcherConnection
+from .constants import *
+from .fleet import FleetPoller, PollResult
+from .inventory import HostInventory
+from .parsers import normalize_mac, STATS_FIELDS
+
+
+LEASE_ADDED = 'added'
+LEASE_REMOVED = 'removed'
+LEASE_CHANGED = 'changed'
+
+LEASE_KIND_DYNAMIC = 'dynamic'      # addresses assigned to DHCP clients
+LEASE_KIND_STATIC = 'static'        # static DHCP leases
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS routers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    router_id INTEGER NOT NULL,
+    mac_address TEXT NOT NULL,
+    ip_address TEXT,
+    hostname TEXT,
+    band TEXT,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    PRIMARY KEY (router_id, mac_address)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS hosts_mac_address ON hosts (mac_address, last_seen);
+CREATE INDEX IF NOT EXISTS hosts_last_seen ON hosts (last_seen);
+CREATE TABLE IF NOT EXISTS leases (
+    router_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    mac_address TEXT NOT NULL,
+    ip_address TEXT,
+    PRIMARY KEY (router_id, kind, mac_address)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lease_events (
+    router_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    event TEXT NOT NULL,
+    mac_address TEXT NOT NULL,
+    ip_address TEXT
+);
+CREATE TABLE IF NOT EXISTS lease_baselines (
+    router_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (router_id, kind)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS lease_events_router_kind_timestamp ON lease_events (router_id, kind, timestamp, event);
+CREATE INDEX IF NOT EXISTS lease_events_timestamp ON lease_events (timestamp);
+CREATE TABLE IF NOT EXISTS stats (
+    router_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    {stats_columns},
+    PRIMARY KEY (router_id, timestamp)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS stats_timestamp ON stats (timestamp);
+CREATE TABLE IF NOT EXISTS stats_downsampled (
+    router_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    {downsampled_columns},
+    PRIMARY KEY (router_id, timestamp)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS stats_downsampled_timestamp ON stats_downsampled (timestamp);
+'''.format(
+    stats_columns=',\n    '.join(f'{f} INTEGER' for f in STATS_FIELDS),
+    downsampled_columns=',\n    '.join(f'{f}_{a} INTEGER' for f in STATS_FIELDS for a in ('count', 'sum', 'min', 'max')),
+)
+
+
+def current_timestamp() -> int:
+    return int(time.time())
+
+
+class HistoryStore(object):
+    """SQLite history of hosts, DHCP leases and line statistics of many routers
+
+    Timestamps are UNIX times in seconds. Every snapshot is written in a single transaction, raw statistics older
+    than the raw retention are downsampled to buckets of HISTORY_DOWNSAMPLE_INTERVAL by apply_retention(). The
+    connection is shared by all threads, reads and writes take the same lock so that a read never sees the
+    uncommitted transaction of another thread.
+    """
+
+    def __init__(self, path: str, downsample_interval: int = HISTORY_DOWNSAMPLE_INTERVAL):
+        """Init HistoryStore object
+
+        :param path: database file, ':memory:' for a temporary database
+        :param downsample_interval: seconds of the downsampled statistics buckets, must not change for a database
+        """
+        self.path = path
+        self.downsample_interval = downsample_interval
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        self.__router_ids: Dict[str, int] = {}
+        self.__new_router_ids: Dict[str, int] = {}
+
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        with self.db:
+            self.db.executescript(SCHEMA)
+
+    def __repr__(self):
+        return f'<HistoryStore(path={self.path})>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    @contextmanager
+    def __transaction(self) -> Iterator[None]:
+        """Takes the lock and runs a transaction, the router ids read in it are only cached once it is committed
+        """
+
+        with self.__lock:
+            try:
+                with self.db:
+                    yield
+                self.__router_ids.update(self.__new_router_ids)
+            finally:
+                self.__new_router_ids.clear()
+
+    def __router_id(self, router: str, create: bool = True) -> Optional[int]:
+        router_id = self.__router_ids.get(router) or self.__new_router_ids.get(router)
+        if router_id is None:
+            if create:
+                self.db.execute('INSERT OR IGNORE INTO routers (name) VALUES (?)', (router,))
+            row = self.db.execute('SELECT id FROM routers WHERE name = ?', (router,)).fetchone()
+            if row is None:
+                return None
+            router_id = row[0]
+            # inside a transaction the row may be rolled back, __transaction() caches it once committed
+            (self.__new_router_ids if create else self.__router_ids)[router] = router_id
+        return router_id
+
+    def routers(self) -> List[str]:
+        """Names of the routers with history
+
+        :rtype: List[str]
+        """
+
+        with self.__lock:
+            return [name for name, in self.db.execute('SELECT name FROM routers ORDER BY name')]
+
+    ####################################################################################################################
+    # Writing
+
+    def __write_hosts(self, router_id: int, timestamp: int, inventory: HostInventory):
+        self.db.executemany(
+            'INSERT INTO hosts (router_id, mac_address, ip_address, hostname, band, first_seen, last_seen) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (router_id, mac_address) DO UPDATE SET '
+            'ip_address = COALESCE(excluded.ip_address, ip_address), '
+            'hostname = COALESCE(excluded.hostname, hostname), '
+            'band = excluded.band, '
+            'last_seen = MAX(last_seen, excluded.last_seen)',
+            [(router_id, h.mac_address, h.ip_address, h.hostname, h.band.name if h.band else None, timestamp,
+              timestamp) for h in inventory])
+
+    def __write_leases(self, router_id: int, timestamp: int, kind: str, leases: Dict[str, Optional[str]]):
+        has_baseline = self.db.execute('SELECT 1 FROM lease_baselines WHERE router_id = ? AND kind = ?',
+                                       (router_id, kind)).fetchone()
+        if not has_baseline:    # the first snapshot is the state later ones are compared with, not a churn
+            self.db.execute('INSERT INTO lease_baselines (router_id, kind, timestamp) VALUES (?, ?, ?)',
+                            (router_id, kind, timestamp))
+            self.db.executemany('INSERT OR REPLACE INTO leases (router_id, kind, mac_address, ip_address) '
+                                'VALUES (?, ?, ?, ?)',
+                                [(router_id, kind, mac, ip) for mac, ip in leases.items()])
+            return
+
+        current = dict(self.db.execute('SELECT mac_address, ip_address FROM leases WHERE router_id = ? AND kind = ?',
+                                       (router_id, kind)))
+        events = []
+        for mac_address, ip_address in leases.items():
+            if mac_address not in current:
+                events.append((router_id, timestamp, kind, LEASE_ADDED, mac_address, ip_address))
+            elif current[mac_address] != ip_address:
+                events.append((router_id, timestamp, kind, LEASE_CHANGED, mac_address, ip_address))
+        for mac_address in current.keys() - leases.keys():
+            events.append((router_id, timestamp, kind, LEASE_REMOVED, mac_address, current[mac_address]))
+        if not events:
+            return
+
+        self.db.executemany('INSERT INTO lease_events (router_id, timestamp, kind, event, mac_address, ip_address) '
+                            'VALUES (?, ?, ?, ?, ?, ?)', events)
+        self.db.executemany('DELETE FROM leases WHERE router_id = ? AND kind = ? AND mac_address = ?',
+                            [(router_id, kind, e[4]) for e in events if e[3] == LEASE_REMOVED])
+        self.db.executemany('INSERT OR REPLACE INTO leases (router_id, kind, mac_address, ip_address) '
+                            'VALUES (?, ?, ?, ?)',
+                            [(router_id, kind, e[4], e[5]) for e in events if e[3] != LEASE_REMOVED])
+
+    def __write_stats(self, router_id: int, timestamp: int, stats: dict):
+        columns = ', '.join(STATS_FIELDS)
+        self.db.execute(f'INSERT OR REPLACE INTO stats (router_id, timestamp, {columns}) '
+                        f'VALUES (?, ?{", ?" * len(STATS_FIELDS)})',
+                        [router_id, timestamp] + [stats.get(f) for f in STATS_FIELDS])
+
+    def __write_snapshot(self, router: str, timestamp: int, inventory: Optional[HostInventory],
+                         stats: Optional[dict]):
+        router_id = self.__router_id(router)
+        if inventory is not None:
+            self.__write_hosts(router_id, timestamp, inventory)
+            self.__write_leases(router_id, timestamp, LEASE_KIND_DYNAMIC,
+                                {h.mac_address: h.ip_address for h in inventory if h.is_dhcp_client})
+            self.__write_leases(router_id, timestamp, LEASE_KIND_STATIC,
+                                {h.mac_address: h.lease.ip_address for h in inventory if h.lease is not None})
+        if stats is not None:
+            self.__write_stats(router_id, timestamp, stats)
+
+    def record(self, router: str, inventory: Optional[HostInventory] = None, stats: Optional[dict] = None,
+               timestamp: Optional[int] = None):
+        """Write a snapshot of a router in a single transaction
+
+        Hosts are upserted, lease events are the differences with the leases of the previous snapshot: the first
+        snapshot of a router only records its leases.
+
+        :param router: router name
+        :param inventory: hosts of the router
+        :param stats: result of get_stats()
+        :param timestamp: time of the snapshot, now if None
+        """
+
+        timestamp = current_timestamp() if timestamp is None else int(timestamp)
+        with self.__transaction():
+            self.__write_snapshot(router, timestamp, inventory, stats)
+
+    def record_many(self, snapshots: Iterable[tuple]):
+        """Write many snapshots in a single transaction
+
+        :param snapshots: (router, inventory, stats, timestamp) tuples, the same as the record() arguments
+        """
+
+        with self.__transaction():
+            for router, inventory, stats, timestamp in snapshots:
+                timestamp = current_timestamp() if timestamp is None else int(timestamp)
+                self.__write_snapshot(router, timestamp, inventory, stats)
+
+    def snapshot(self, connection: ArcherConnection, router: Optional[str] = None,
+                 timestamp: Optional[int] = None):
+        """Read the hosts and the statistics of a router and record them
+
+        :param connection: authenticated router connection
+        :param router: router name, defaults to the connection router_url
+        :param timestamp: time of the snapshot, now if None
+        """
+
+        self.record(router or connection.router_url, HostInventory.fetch(connection), connection.get_stats(),
+                    timestamp)
+
+    def snapshot_fleet(self, poller: FleetPoller, timestamp: Optional[int] = None) -> Dict[str, PollResult]:
+        """Read every router of a fleet concurrently and record the successful ones in a single transaction
+
+        :param poller: fleet of routers
+        :param timestamp: time of the snapshots, now if None
+        :return: results by router name, the value of the successful ones is a (HostInventory, stats) tuple
+        :rtype: Dict[str, PollResult]
+        """
+
+        timestamp = current_timestamp() if timestamp is None else timestamp
+        results = poller.poll(lambda connection: (HostInventory.fetch(connection), connection.get_stats()))
+        self.record_many((name, r.value[0], r.value[1], timestamp) for name, r in results.items() if r.ok)
+        return results
+
+    ####################################################################################################################
+    # Retention
+
+    def downsample(self, before: int) -> int:
+        """Merge the raw statistics older than a time into the downsampled buckets
+
+        :param before: raw statistics before this time are downsampled and deleted
+        :return: number of downsampled raw statistics
+        :rtype: int
+        """
+
+        interval = self.downsample_interval
+        aggregates = ', '.join(f'COUNT({f}), SUM({f}), MIN({f}), MAX({f})' for f in STATS_FIELDS)
+        columns = ', '.join(f'{f}_count, {f}_sum, {f}_min, {f}_max' for f in STATS_FIELDS)
+        merges = ', '.join(
+            f'{f}_count = {f}_count + excluded.{f}_count, '
+            f'{f}_sum = COALESCE({f}_sum + excluded.{f}_sum, {f}_sum, excluded.{f}_sum), '
+            f'{f}_min = MIN(COALESCE({f}_min, excluded.{f}_min), COALESCE(excluded.{f}_min, {f}_min)), '
+            f'{f}_max = MAX(COALESCE({f}_max, excluded.{f}_max), COALESCE(excluded.{f}_max, {f}_max))'
+            for f in STATS_FIELDS)
+
+        with self.__transaction():
+            self.db.execute(
+                f'INSERT INTO stats_downsampled (router_id, timestamp, samples, {columns}) '
+                f'SELECT router_id, timestamp - timestamp % {interval}, COUNT(*), {aggregates} '
+                f'FROM stats WHERE timestamp < ? GROUP BY 1, 2 '
+                f'ON CONFLICT (router_id, timestamp) DO UPDATE SET samples = samples + excluded.samples, {merges}',
+                (before,))
+            return self.db.execute('DELETE FROM stats WHERE timestamp < ?', (before,)).rowcount
+
+    def apply_retention(self, now: Optional[int] = None, raw_retention: int = HISTORY_RAW_RETENTION,
+                        retention: int = HISTORY_RETENTION) -> int:
+        """Downsample the old raw statistics and delete the history older than the retention
+
+        :param now: current time, now if None
+        :param raw_retention: seconds raw statistics are kept
+        :param retention: seconds downsampled statistics, lease events and hosts not seen since are kept
+        :return: number of deleted rows, downsampled raw statistics included
+        :rtype: int
+        """
+
+        now = current_timestamp() if now is None else int(now)
+        deleted = self.downsample(now - raw_retention)
+        cutoff = now - retention
+        with self.__transaction():
+            deleted += self.db.execute('DELETE FROM stats_downsampled WHERE timestamp < ?', (cutoff,)).rowcount
+            deleted += self.db.execute('DELETE FROM lease_events WHERE timestamp < ?', (cutoff,)).rowcount
+            deleted += self.db.execute('DELETE FROM hosts WHERE last_seen < ?', (cutoff,)).rowcount
+        return deleted
+
+    ####################################################################################################################
+    # Queries
+
+    def last_seen(self, mac_address: str, router: Optional[str] = None) -> Optional[int]:
+        """Last time a host was seen
+
+        :param mac_address: MAC address, in any case or separator
+        :param router: router name, any router if None
+        :rtype: Optional[int]
+        """
+
+        mac_address = normalize_mac(mac_address)
+        with self.__lock:
+            if router is None:
+                row = self.db.execute('SELECT MAX(last_seen) FROM hosts WHERE mac_address = ?',
+                                      (mac_address,)).fetchone()
+            else:
+                router_id = self.__router_id(router, create=False)
+                row = self.db.execute('SELECT last_seen FROM hosts WHERE router_id = ? AND mac_address = ?',
+                                      (router_id, mac_address)).fetchone()
+        return row[0] if row else None
+
+    def hosts_seen(self, router: str, since: int) -> List[tuple]:
+        """Hosts of a router seen since a time
+
+        :param router: router name
+        :param since: start time
+        :return: (mac_address, ip_address, hostname, band, first_seen, last_seen) tuples, the latest seen first
+        :rtype: List[tuple]
+        """
+
+        with self.__lock:
+            router_id = self.__router_id(router, create=False)
+            return self.db.execute('SELECT mac_address, ip_address, hostname, band, first_seen, last_seen FROM hosts '
+                                   'WHERE router_id = ? AND last_seen >= ? ORDER BY last_seen DESC',
+                                   (router_id, since)).fetchall()
+
+    def lease_churn(self, router: str, since: int, until: Optional[int] = None,
+                    kind: str = LEASE_KIND_DYNAMIC) -> List[Tuple[int, int, int, int]]:
+        """Lease events of a router per UTC day
+
+        :param router: router name
+        :param since: start time
+        :param until: end time, excluded, now if None
+        :param kind: LEASE_KIND_DYNAMIC or LEASE_KIND_STATIC
+        :return: (day start, added, removed, changed) tuples, days without events are omitted
+        :rtype: List[Tuple[int, int, int, int]]
+        """
+
+        until = current_timestamp() + 1 if until is None else until
+        with self.__lock:
+            router_id = self.__router_id(router, create=False)
+            return self.db.execute(
+                'SELECT timestamp - timestamp % 86400 AS day, SUM(event = ?), SUM(event = ?), SUM(event = ?) '
+                'FROM lease_events WHERE router_id = ? AND timestamp >= ? AND timestamp < ? AND kind = ? '
+                'GROUP BY day ORDER BY day',
+                (LEASE_ADDED, LEASE_REMOVED, LEASE_CHANGED, router_id, since, until, kind)).fetchall()
+
+    def line_rates(self, router: str, since: int, until: Optional[int] = None, field: str = 'current_down_rate',
+                   interval: int = HISTORY_DOWNSAMPLE_INTERVAL) -> List[Tuple[int, int, float, int, int]]:
+        """Statistics of a router in buckets, from both raw and downsampled statistics
+
+        Buckets of downsampled statistics are only exact when interval is a multiple of downsample_interval.
+
+        :param router: router name
+        :param since: start time
+        :param until: end time, excluded, now if None
+        :param field: one of STATS_FIELDS
+        :param interval: seconds of each bucket
+        :return: (bucket start, samples, average, minimum, maximum) tuples, samples without the field are not
+            counted, the average of a bucket without any is None
+        :rtype: List[Tuple[int, int, float, int, int]]
+        """
+
+        if field not in STATS_FIELDS:
+            raise ValueError(f'Unknown field {field}, expected one of {", ".join(STATS_FIELDS)}')
+
+        until = current_timestamp() + 1 if until is None else until
+        with self.__lock:
+            router_id = self.__router_id(router, create=False)
+            return self.db.execute(
+                f'SELECT timestamp - timestamp % {int(interval)} AS bucket, SUM(samples), '
+                f'CAST(SUM(total) AS REAL) / SUM(samples), MIN(minimum), MAX(maximum) FROM ('
+                f'SELECT timestamp, {field} IS NOT NULL AS samples, {field} AS total, {field} AS minimum, '
+                f'{field} AS maximum '
+                f'FROM stats WHERE router_id = ? AND timestamp >= ? AND timestamp < ? '
+                f'UNION ALL '
+                f'SELECT timestamp, {field}_count, {field}_sum, {field}_min, {field}_max '
+                f'FROM stats_downsampled WHERE router_id = ? AND timestamp >= ? AND timestamp < ?'
+                f') GROUP BY bucket ORDER BY bucket',
+                (router_id, since, until, router_id, since, until)).fetchall()
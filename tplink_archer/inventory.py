@@ -0,0 +1,190 @@
+import math
+from typing import List, Dict, Optional, Iterator, Iterable, Tuple
+
+from .collectors import WIFI_PACKET_ATTRIBUTES, parse_wifi_packet_counters
+from .connection import ArcherConnection
+from .constants import *
+from .models import DHCPLease, WifiFreq
+from .parsers import normalize_mac
+from .query import QueryBatch, projected_query
+
+
+class Host(object):
+    """A device on the network, joined from the DHCP clients, the static leases and the WiFi stations
+    """
+
+    __slots__ = ('mac_address', 'ip_address', 'hostname', 'is_dhcp_client', 'lease', 'band', 'packets_sent',
+                 'packets_received')
+
+    def __init__(self, mac_address: str):
+        """Init Host object
+
+        :param mac_address: normalized MAC address
+        """
+        self.mac_address = mac_address
+        self.ip_address: Optional[str] = None
+        self.hostname: Optional[str] = None
+        self.is_dhcp_client = False
+        self.lease: Optional[DHCPLease] = None
+        self.band: Optional[WifiFreq] = None            # None if wired or not associated
+        self.packets_sent: Optional[int] = None
+        self.packets_received: Optional[int] = None
+
+    def __repr__(self):
+        return f'<Host(mac_address={self.mac_address},ip_address={self.ip_address},hostname={self.hostname})>'
+
+    @property
+    def has_lease(self) -> bool:
+        return self.lease is not None
+
+    @property
+    def is_lease_enabled(self) -> bool:
+        return self.lease is not None and bool(self.lease.is_enabled)
+
+    def to_dict(self) -> dict:
+        """Returns host fields as dict, the lease as its IP address and enabled flag
+
+        :rtype: dict
+        """
+
+        return {
+            'mac_address': self.mac_address,
+            'ip_address': self.ip_address,
+            'hostname': self.hostname,
+            'is_dhcp_client': self.is_dhcp_client,
+            'lease_ip_address': self.lease.ip_address if self.lease else None,
+            'lease_enabled': self.is_lease_enabled if self.lease else None,
+            'band': self.band.name if self.band else None,
+            'packets_sent': self.packets_sent,
+            'packets_received': self.packets_received,
+        }
+
+########################################################################################################################
+
+
+class HostInventory(object):
+    """Hosts indexed by MAC address, IP address and hostname
+    """
+
+    def __init__(self, hosts: Iterable[Host] = ()):
+        """Init HostInventory object
+
+        :param hosts: hosts, with unique MAC addresses
+        """
+        self.hosts: Dict[str, Host] = {}
+        self.__by_ip: Dict[str, Host] = {}
+        self.__by_hostname: Dict[str, List[Host]] = {}
+        for host in hosts:
+            self.add(host)
+
+    def __repr__(self):
+        return f'<HostInventory(hosts={len(self)})>'
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def __iter__(self) -> Iterator[Host]:
+        return iter(self.hosts.values())
+
+    def __contains__(self, mac_address: str) -> bool:
+        return normalize_mac(mac_address) in self.hosts
+
+    def add(self, host: Host):
+        self.hosts[host.mac_address] = host
+        if host.ip_address:
+            self.__by_ip[host.ip_address] = host
+        if host.hostname:
+            self.__by_hostname.setdefault(host.hostname.lower(), []).append(host)
+
+    @classmethod
+    def join(cls, dhcp_clients: Iterable[dict], dhcp_leases: Iterable[DHCPLease],
+             wifi_stations: Dict[WifiFreq, Iterable[Tuple[str, float, float]]]) -> 'HostInventory':
+        """Join the sources by normalized MAC address
+
+        The IP address of a DHCP client wins over the one of its static lease.
+
+        :param dhcp_clients: results of parse_dhcp_clients()
+        :param dhcp_leases: results of parse_dhcp_leases()
+        :param wifi_stations: results of parse_wifi_packet_counters() by band
+        :rtype: HostInventory
+        """
+
+        hosts: Dict[str, Host] = {}
+
+        def host_for(mac_address: Optional[str]) -> Optional[Host]:
+            mac_address = normalize_mac(mac_address)
+            if not mac_address:
+                return None
+            host = hosts.get(mac_address)
+            if host is None:
+                host = hosts[mac_address] = Host(mac_address)
+            return host
+
+        for client in dhcp_clients:
+            host = host_for(client.get('mac_address'))
+            if host is not None:
+                host.is_dhcp_client = True
+                host.ip_address = client.get('ip_address') or host.ip_address
+                host.hostname = client.get('hostname') or host.hostname
+
+        for lease in dhcp_leases:
+            host = host_for(lease.mac_address)
+            if host is not None:
+                host.lease = lease
+                host.ip_address = host.ip_address or lease.ip_address
+
+        for band, stations in wifi_stations.items():
+            for mac_address, sent, received in stations:
+                host = host_for(mac_address)
+                if host is not None:
+                    host.band = band
+                    host.packets_sent = None if math.isnan(sent) else int(sent)
+                    host.packets_received = None if math.isnan(received) else int(received)
+
+        return cls(hosts.values())
+
+    @classmethod
+    def fetch(cls, connection: ArcherConnection) -> 'HostInventory':
+        """Read DHCP clients, static leases and the stations of both WiFi bands in a single request
+
+        :param connection: authenticated router connection
+        :rtype: HostInventory
+        """
+
+        batch = QueryBatch().add('dhcp_clients').add('dhcp_leases')
+        for name, body in (('wifi_2g', WIFI_2G_CLIENTS_QUERY), ('wifi_5g', WIFI_5G_CLIENTS_QUERY)):
+            batch.add(name, projected_query(WIFI_CLIENTS_URL, body, WIFI_PACKET_ATTRIBUTES),
+                      parse_wifi_packet_counters)
+        results = connection.execute_batch(batch)
+
+        return cls.join(results['dhcp_clients'], results['dhcp_leases'], {
+            WifiFreq.WIFI_2G: results['wifi_2g'],
+            WifiFreq.WIFI_5G: results['wifi_5g'],
+        })
+
+    def get(self, mac_address: str) -> Optional[Host]:
+        """Get a host by MAC address, in any case or separator
+
+        :param mac_address:
+        :rtype: Optional[Host]
+        """
+
+        return self.hosts.get(normalize_mac(mac_address))
+
+    def get_by_ip(self, ip_address: str) -> Optional[Host]:
+        """Get the host with an IP address
+
+        :param ip_address:
+        :rtype: Optional[Host]
+        """
+
+        return self.__by_ip.get(ip_address)
+
+    def get_by_hostname(self, hostname: str) -> List[Host]:
+        """Get the hosts with a hostname, case insensitive, hostnames are not unique
+
+        :param hostname:
+        :rtype: List[Host]
+        """
+
+        return list(self.__by_hostname.get(hostname.lower(), ()))
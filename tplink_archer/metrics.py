@@ -0,0 +1,273 @@
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence, List, Tuple
+
+from .constants import *
+from .query import BATCH_READS
+
+
+BLOCK_PATH_REGEX = re.compile(r'\[(\w+#[\d,]+#[\d,]+)\]')
+
+
+def query_signature(url: str, data: str) -> tuple:
+    """Action, object and stacks of every block of a query, without the attributes it reads
+
+    :param url: request URL
+    :param data: request body
+    :rtype: tuple
+    """
+
+    actions = url.split('?', 1)[1].split('&') if '?' in url else []
+    paths = BLOCK_PATH_REGEX.findall(data)
+    if len(actions) != len(paths):
+        return ()
+    return tuple(zip(actions, paths))
+
+
+def endpoint_signatures() -> Dict[tuple, str]:
+    """Names by query signature: the full queries and the single blocks projected_query() reads from them
+
+    A block read by more than one query is left out, its projections are not named.
+
+    :rtype: Dict[tuple, str]
+    """
+
+    signatures = {}
+    blocks: Dict[tuple, set] = {}
+    for name, (url, query, _) in BATCH_READS.items():
+        signature = query_signature(url, query)
+        signatures[signature] = name
+        for block in signature:
+            blocks.setdefault((block,), set()).add(name)
+    for block, names in blocks.items():
+        if len(names) == 1 and block not in signatures:
+            signatures[block] = names.pop()
+    return signatures
+
+
+ENDPOINT_SIGNATURES = endpoint_signatures()
+
+PHASES = ('connect', 'transfer', 'parse')
+
+
+def endpoint_name(url: str, data: Optional[str]) -> str:
+    """Name of the router query a request is made for, e.g. 'dhcp_clients'
+
+    Queries reading only some attributes are named after the full query with the same blocks, or the only query
+    reading their single block. Other requests reading several blocks, e.g. a QueryBatch, are named 'batch', the
+    remaining ones after their URL.
+
+    :param url: request URL
+    :param data: request body
+    :rtype: str
+    """
+
+    if data:
+        signature = query_signature(url, data)
+        name = ENDPOINT_SIGNATURES.get(signature) if signature else None
+        if name is not None:
+            return name
+        if len(signature) > 1:
+            return 'batch'
+    return url.rstrip('?')
+
+
+class RequestEvent(object):
+    """What happened during a single api_request() call
+
+    Phases are in seconds: connect lasts until the response headers are received, so it includes the time the
+    router takes to answer, transfer is the time spent receiving the body and parse the time spent parsing it.
+    A phase that did not happen, e.g. the transfer of a streamed response or the parse of a raw request, is None.
+    """
+
+    __slots__ = ('endpoint', 'method', 'url', 'status', 'connect_time', 'transfer_time', 'parse_time',
+                 'response_size', 'auth_retries', 'cached', 'error')
+
+    def __init__(self, endpoint: str, method: str, url: str):
+        """Init RequestEvent object
+
+        :param endpoint: name of the query, see endpoint_name()
+        :param method: either 'get' or 'post'
+        :param url: request URL
+        """
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+        self.status: Optional[int] = None
+        self.connect_time: Optional[float] = None
+        self.transfer_time: Optional[float] = None
+        self.parse_time: Optional[float] = None
+        self.response_size: Optional[int] = None
+        self.auth_retries = 0
+        self.cached = False
+        self.error: Optional[str] = None      # exception class name
+
+    def __repr__(self):
+        return f'<RequestEvent(endpoint={self.endpoint},status={self.status},error={self.error})>'
+
+    @property
+    def duration(self) -> float:
+        """Sum of all the phases
+        """
+
+        return sum(t for t in (self.connect_time, self.transfer_time, self.parse_time) if t is not None)
+
+########################################################################################################################
+
+
+class Histogram(object):
+    """Cumulative histogram with fixed upper bounds, like the Prometheus one
+    """
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Sequence[float]):
+        """Init Histogram object
+
+        :param bounds: sorted bucket upper bounds, the +Inf bucket is implicit
+        """
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def buckets(self) -> List[Tuple[str, int]]:
+        """Cumulative count of every bucket, by upper bound
+
+        :rtype: List[Tuple[str, int]]
+        """
+
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets.append(('+Inf' if bound == float('inf') else repr(bound), total))
+        return buckets
+
+########################################################################################################################
+
+
+class MetricsRecorder(object):
+    """Request hook that aggregates RequestEvents by endpoint and exports them in OpenMetrics text format
+
+    Pass it in the hooks of ArcherConnection, the same recorder can be shared by many connections.
+    """
+
+    def __init__(self, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                 size_buckets: Sequence[float] = DEFAULT_SIZE_BUCKETS, prefix: str = 'archer'):
+        """Init MetricsRecorder object
+
+        :param latency_buckets: upper bounds of the phase duration histograms, in seconds
+        :param size_buckets: upper bounds of the response size histograms, in bytes
+        :param prefix: prefix of every metric name
+        """
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self.prefix = prefix
+        self.requests: Dict[str, int] = {}
+        self.cache_hits: Dict[str, int] = {}
+        self.auth_retries: Dict[str, int] = {}
+        self.errors: Dict[Tuple[str, str], int] = {}
+        self.durations: Dict[Tuple[str, str], Histogram] = {}
+        self.sizes: Dict[str, Histogram] = {}
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<MetricsRecorder(endpoints={len(self.requests)},requests={sum(self.requests.values())})>'
+
+    def __call__(self, event: RequestEvent):
+        self.record(event)
+
+    def record(self, event: RequestEvent):
+        """Add a request to the metrics
+
+        :param event: finished request
+        """
+
+        endpoint = event.endpoint
+        with self.__lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if event.cached:
+                self.cache_hits[endpoint] = self.cache_hits.get(endpoint, 0) + 1
+            if event.auth_retries:
+                self.auth_retries[endpoint] = self.auth_retries.get(endpoint, 0) + event.auth_retries
+            if event.error:
+                key = (endpoint, event.error)
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+            for phase in PHASES:
+                value = getattr(event, f'{phase}_time')
+                if value is not None:
+                    histogram = self.durations.get((endpoint, phase))
+                    if histogram is None:
+                        histogram = self.durations[(endpoint, phase)] = Histogram(self.latency_buckets)
+                    histogram.observe(value)
+
+            if event.response_size is not None:
+                histogram = self.sizes.get(endpoint)
+                if histogram is None:
+                    histogram = self.sizes[endpoint] = Histogram(self.size_buckets)
+                histogram.observe(event.response_size)
+
+    def total_time(self) -> Dict[str, float]:
+        """Seconds spent in every endpoint, all phases included, slowest first
+
+        :rtype: Dict[str, float]
+        """
+
+        with self.__lock:
+            totals = {}
+            for (endpoint, _), histogram in self.durations.items():
+                totals[endpoint] = totals.get(endpoint, 0.0) + histogram.sum
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def to_openmetrics(self) -> str:
+        """Export the metrics in OpenMetrics text format, also readable by Prometheus
+
+        :rtype: str
+        """
+
+        p = self.prefix
+        lines = []
+        with self.__lock:
+            lines.append(f'# TYPE {p}_requests counter')
+            lines.append(f'# HELP {p}_requests Requests sent to the router, cache hits included.')
+            lines.extend(f'{p}_requests_total{{endpoint="{e}"}} {n}' for e, n in self.requests.items())
+
+            lines.append(f'# TYPE {p}_cache_hits counter')
+            lines.extend(f'{p}_cache_hits_total{{endpoint="{e}"}} {n}' for e, n in self.cache_hits.items())
+
+            lines.append(f'# TYPE {p}_auth_retries counter')
+            lines.append(f'# HELP {p}_auth_retries Requests sent again after authenticating again.')
+            lines.extend(f'{p}_auth_retries_total{{endpoint="{e}"}} {n}' for e, n in self.auth_retries.items())
+
+            lines.append(f'# TYPE {p}_errors counter')
+            lines.extend(f'{p}_errors_total{{endpoint="{e}",error="{error}"}} {n}'
+                         for (e, error), n in self.errors.items())
+
+            lines.append(f'# TYPE {p}_request_duration_seconds histogram')
+            lines.append(f'# UNIT {p}_request_duration_seconds seconds')
+            for (e, phase), histogram in self.durations.items():
+                lines.extend(self.__histogram_lines(f'{p}_request_duration_seconds',
+                                                    f'endpoint="{e}",phase="{phase}"', histogram))
+
+            lines.append(f'# TYPE {p}_response_size_bytes histogram')
+            lines.append(f'# UNIT {p}_response_size_bytes bytes')
+            for e, histogram in self.sizes.items():
+                lines.extend(self.__histogram_lines(f'{p}_response_size_bytes', f'endpoint="{e}"', histogram))
+
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def __histogram_lines(name: str, labels: str, histogram: Histogram) -> List[str]:
+        lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}' for bound, count in histogram.buckets()]
+        lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return lines
@@ -1,5 +1,7 @@
-from typing import List, Optional
+import sys
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple, Callable, Any
 from enum import Enum, auto
+from collections.abc import MutableMapping
 
 from .exceptions import StackParseError, SectionNotFoundError
 
@@ -11,21 +13,142 @@ class WifiFreq(Enum):
 ########################################################################################################################
 
 
+FieldTypes = Dict[int, Dict[str, Callable[[str], Any]]]
+
+
+def encode_value(value: Any) -> str:
+    """Encode a decoded Section value back to plain text
+
+    :param value:
+    :rtype: str
+    """
+
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value)
+
+
+class SectionSchema(object):
+    """Ordered key names shared by all the Sections of a Stack that have the same keys
+    """
+
+    __slots__ = ('keys', 'positions')
+
+    def __init__(self, keys: Tuple[str, ...]):
+        """Init SectionSchema object
+
+        :param keys: key names, in order
+        """
+        self.keys = tuple(sys.intern(k) for k in keys)
+        self.positions = {k: i for i, k in enumerate(self.keys)}
+
+    def __repr__(self):
+        return f'<SectionSchema(keys={self.keys})>'
+
+
+class SectionValues(MutableMapping):
+    """Dict-like Section values stored positionally against a shared SectionSchema
+    """
+
+    __slots__ = ('schema', 'data')
+
+    def __init__(self, schema: SectionSchema, data: tuple):
+        """Init SectionValues object
+
+        :param schema: schema holding the key names
+        :param data: values, in the same order as the schema keys
+        """
+        self.schema = schema
+        self.data = data
+
+    @classmethod
+    def from_dict(cls, values: dict) -> 'SectionValues':
+        """Build SectionValues with a private schema from a dict
+
+        :param values: values dictionary
+        :rtype: SectionValues
+        """
+
+        return cls(SectionSchema(tuple(values.keys())), tuple(values.values()))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __getitem__(self, key):
+        return self.data[self.schema.positions[key]]
+
+    def get(self, key, default=None):
+        position = self.schema.positions.get(key)
+        if position is None:
+            return default
+        return self.data[position]
+
+    def __contains__(self, key):
+        return key in self.schema.positions
+
+    def __setitem__(self, key, value):
+        position = self.schema.positions.get(key)
+        if position is None:     # never modify a schema, it may be shared
+            self.schema = SectionSchema(self.schema.keys + (key,))
+            self.data = self.data + (value,)
+        else:
+            self.data = self.data[:position] + (value,) + self.data[position + 1:]
+
+    def __delitem__(self, key):
+        position = self.schema.positions[key]
+        self.schema = SectionSchema(self.schema.keys[:position] + self.schema.keys[position + 1:])
+        self.data = self.data[:position] + self.data[position + 1:]
+
+    def __iter__(self):
+        return iter(self.schema.keys)
+
+    def __len__(self):
+        return len(self.data)
+
+
 class Section(object):
+    __slots__ = ('identifier', 'values')
+
     def __init__(self, identifier: str, values: dict):
         """Init Section object
 
         :param identifier: Section identifier
         :type identifier: str
-        :param values: Section values dictionary
+        :param values: Section values dictionary, or SectionValues
         :type values: dict
         """
         self.identifier = identifier
+        if not isinstance(values, SectionValues):
+            values = SectionValues.from_dict(values)
         self.values = values
 
     def __repr__(self):
         return f'<Section(identifier={self.identifier})>'
 
+    @property
+    def raw_identifier(self) -> str:
+        """Identifier without brackets and query index, e.g. '1,1,1,0,0,0' for '[1,1,1,0,0,0]7'
+        """
+
+        return self.identifier[1:].split(']')[0]
+
+    @property
+    def index(self) -> Optional[int]:
+        """Index of the query block this section answers, e.g. 7 for '[1,1,1,0,0,0]7'
+        """
+
+        suffix = self.identifier.rsplit(']', 1)[-1]
+        return int(suffix) if suffix.isdigit() else None
+
+    @property
+    def is_error(self) -> bool:
+        """Whether this is the '[error]N' trailer the router appends to every response
+        """
+
+        return self.raw_identifier == 'error'
+
     def to_text(self) -> str:
         """Get Section in plain text format
 
@@ -34,7 +157,7 @@ class Section(object):
 
         values = ''
         for key in self.values.keys():
-            value = self.values.get(key)
+            value = encode_value(self.values.get(key))
             values = values + f'{key}={value}\n'
 
         return f'{self.identifier}\n' + values
@@ -43,14 +166,42 @@ class Section(object):
 
 
 class Stack(object):
-    def __init__(self, data: str):
+    def __init__(self, data: Optional[str] = None, field_types: Optional[FieldTypes] = None):
         """Init Stack object
 
-        :param data: Stack data in plain text
+        :param data: Stack data in plain text, an empty Stack is created if None
         :type data: str
+        :param field_types: decoders by query index and field name, values without a decoder stay str
+        :type field_types: dict
+        """
+        self.field_types = field_types
+        self.__sections: List[Section] = []
+        self.__by_identifier: Optional[Dict[str, Section]] = None
+        self.__by_path: Optional[Dict[str, List[Section]]] = None
+        self.__by_index: Optional[Dict[int, List[Section]]] = None
+        if data is not None:
+            self.parse(data)
+
+    @property
+    def sections(self) -> List[Section]:
+        return self.__sections
+
+    @sections.setter
+    def sections(self, sections: List[Section]):
+        self.__sections = sections
+        self.__by_identifier = None     # indexes are rebuilt on the next lookup
+
+    @classmethod
+    def from_sections(cls, sections: List[Section]) -> 'Stack':
+        """Build a Stack from already parsed sections
+
+        :param sections: list of Section objects
+        :rtype: Stack
         """
-        self.sections: Optional[List[Section]] = None
-        self.parse(data)
+
+        stack = cls()
+        stack.sections = sections
+        return stack
 
     def parse(self, data: str):
         """Parse plain text into Stack
@@ -59,80 +210,130 @@ class Stack(object):
         """
 
         if data is None:
-            return ValueError
-        sections = self.__get_sections(data)
-        parsed_sections = self.__parse_sections(sections)
-        self.sections = parsed_sections
+            raise ValueError('Stack data is None')
+        self.sections = list(self.iter_sections(data.split('\n'), self.field_types))
+
+    def __build_indexes(self):
+        """Index sections by identifier, by raw identifier and by query index in a single pass
+        """
+
+        by_identifier = {}
+        by_path = {}
+        by_index = {}
+        for s in self.__sections:
+            by_identifier.setdefault(s.identifier, s)
+            if s.is_error:
+                continue
+            by_path.setdefault(s.raw_identifier, []).append(s)
+            index = s.index
+            if index is not None:
+                by_index.setdefault(index, []).append(s)
+
+        self.__by_path = by_path
+        self.__by_index = by_index
+        self.__by_identifier = by_identifier
 
     def get_section(self, identifier: str) -> Optional[Section]:
         """Get Section from identifier or None if not found
 
-        :param identifier:
+        :param identifier: full identifier, e.g. '[1,1,1,0,0,0]7'
         :rtype: Optional[Section]
         """
 
-        if not self.sections:
+        if not self.__sections:
             return None
-        for s in self.sections:
-            if s.identifier == identifier:
-                return s
-        raise SectionNotFoundError
+        if self.__by_identifier is None:
+            self.__build_indexes()
+        section = self.__by_identifier.get(identifier)
+        if section is None:
+            raise SectionNotFoundError
+        return section
 
-    @staticmethod
-    def __get_sections(stack: str) -> List[str]:
-        """Split plain text stack into plain text sections
+    def get_sections(self, index: int) -> List[Section]:
+        """Get all the Sections answering the query block with the given index
 
-        :param stack: plain text stack
-        :rtype: List[str]
+        :param index: query index, e.g. 7 for '[1,1,1,0,0,0]7'
+        :rtype: List[Section]
         """
 
-        sections = []
-
-        open_index = 0
-        while open_index != -1:
-            try:
-                open_index = stack[1:].find('[')  # next section opening index
-                new_stack = stack[open_index + 1:]  # stack without current section
-                if open_index != -1:  # if not last section
-                    s = stack[:open_index]  # isolate section
-                    sections.append(s)
-                    stack = new_stack
-                else:
-                    sections.append(new_stack)  # last section, all text remaining
-            except Exception:
-                raise StackParseError
-
-        return sections
+        if self.__by_identifier is None:
+            self.__build_indexes()
+        return self.__by_index.get(index, [])
 
-    @staticmethod
-    def __parse_lines_to_section(sections: str) -> Section:
-        """Parse plain text section into Section object
+    def get_section_by_path(self, path: str, index: Optional[int] = None) -> Section:
+        """Get Section from its raw identifier, optionally restricted to a query block
 
-        :param sections: plain text section
+        :param path: raw identifier, e.g. '1,1,1,0,0,0'
+        :param index: query index, any block if None
         :rtype: Section
         """
 
-        lines = sections.split('\n')
-
-        identifier = lines[0]
-
-        section_values = {}
-        for pair in lines[1:]:
-            pair_split = pair.split('=')
-            section_values.update({pair_split[0]: pair_split[1]})
+        if self.__by_identifier is None:
+            self.__build_indexes()
+        for s in self.__by_path.get(path, []):
+            if index is None or s.index == index:
+                return s
+        raise SectionNotFoundError
 
-        return Section(identifier, section_values)
+    @staticmethod
+    def iter_sections(lines: Iterable[str], field_types: Optional[FieldTypes] = None) -> Iterator[Section]:
+        """Parse plain text lines into Sections in a single pass, each Section is yielded as soon as it is complete
 
-    def __parse_sections(self, sections) -> List[Section]:
-        """Parse all sections into Sections list
+        A section starts with an identifier line like '[1,0,0,0,0,0]0', every other line is a 'key=value' pair
+        split on the first '=', so values may contain both '=' and '['. Sections with the same keys share one
+        SectionSchema. Values with a decoder in field_types are decoded while they are read.
 
-        :param sections: list of plain text sections
-        :rtype: List[Section]
+        :param lines: plain text lines, e.g. a response body read line by line
+        :param field_types: decoders by query index and field name
+        :rtype: Iterator[Section]
         """
 
-        for i, s in enumerate(sections):
-            sections[i] = self.__parse_lines_to_section(s)
-        return sections
+        schemas: Dict[tuple, Optional[SectionSchema]] = {}
+
+        def build_section(identifier: str, keys: list, values: list) -> Section:
+            keys = tuple(keys)
+            if keys in schemas:
+                schema = schemas[keys]
+            else:
+                schema = SectionSchema(keys)
+                if len(schema.positions) != len(keys):     # duplicated keys, the last value wins like in a dict
+                    schema = None
+                schemas[keys] = schema
+            if schema is None:
+                return Section(identifier, dict(zip(keys, values)))
+            return Section(identifier, SectionValues(schema, tuple(values)))
+
+        identifier = None
+        decoders = None
+        keys = []
+        values = []
+        for line in lines:
+            if line.endswith('\r'):
+                line = line[:-1]
+            if not line:
+                continue
+            if line[0] == '[':
+                if identifier is not None:
+                    yield build_section(identifier, keys, values)
+                identifier = line
+                keys = []
+                values = []
+                if field_types:
+                    index = line[line.rfind(']') + 1:]
+                    decoders = field_types.get(int(index)) if index.isdigit() and not line.startswith('[error]') else None
+            elif identifier is not None:
+                key, _, value = line.partition('=')
+                if decoders:
+                    decoder = decoders.get(key)
+                    if decoder is not None:
+                        value = decoder(value)
+                keys.append(key)
+                values.append(value)
+            else:
+                raise StackParseError('Stack does not start with a section identifier')
+
+        if identifier is not None:
+            yield build_section(identifier, keys, values)
 
     def to_dict(self) -> dict:
         """ returns stack in dict format """
@@ -142,7 +343,7 @@ class Stack(object):
             sections.append(
                 {
                     'identifier': s.identifier,
-                    'values': s.values
+                    'values': dict(s.values)
                 }
             )
         return {
@@ -182,6 +383,8 @@ class BaseSettingsElement(object):
     """Base object for settings elements
     """
 
+    __slots__ = ('identifier',)
+
     def __init__(self, identifier: str):
         """Init BaseSettingsElement
 
@@ -196,6 +399,14 @@ class BaseSettingsElement(object):
     def raw_identifier(self):
         return self.identifier[1:].split(']')[0]
 
+    @property
+    def index(self) -> Optional[int]:
+        """Index of the query block the element was read from, e.g. 1 for '[1,1,1,1,0,0]1'
+        """
+
+        suffix = self.identifier.rsplit(']', 1)[-1] if self.identifier else ''
+        return int(suffix) if suffix.isdigit() else None
+
     def to_section(self) -> Section:
         """Returns element to section format
         """
@@ -212,10 +423,21 @@ class BaseSettingsElement(object):
         section = self.to_section()
         return section.to_text()
 
+    def to_dict(self) -> dict:
+        """Returns element attributes as dict, identifier first
+
+        :rtype: dict
+        """
+
+        return {name: getattr(self, name)
+                for cls in reversed(type(self).__mro__) for name in getattr(cls, '__slots__', ())}
+
 ########################################################################################################################
 
 
 class DHCPLease(BaseSettingsElement):
+    __slots__ = ('ip_address', 'mac_address', 'is_enabled')
+
     def __init__(self, identifier: str, ip_address: str, mac_address: str, is_enabled: bool):
         super().__init__(identifier)
         self.ip_address = ip_address
@@ -248,6 +470,9 @@ class DHCPLease(BaseSettingsElement):
 
 
 class PortForwardingRule(BaseSettingsElement):
+    __slots__ = ('client_ip_address', 'internal_port', 'external_port', 'is_enabled', 'protocol',
+                 'internal_port_end', 'external_port_end')
+
     def __init__(self, identifier: str, client_ip_address: str, internal_port: str, external_port: str,
                  is_enabled: bool, protocol: str, internal_port_end: Optional[str] = None,
                  external_port_end: Optional[str] = None):
@@ -263,7 +488,7 @@ class PortForwardingRule(BaseSettingsElement):
         if not internal_port_end:
             self.internal_port_end = internal_port
         if not external_port_end:
-            self.internal_port_end = external_port
+            self.external_port_end = external_port
 
     def __repr__(self):
         return (f'<PortForwardingRule(identifier={self.identifier},'
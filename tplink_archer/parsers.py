@@ -0,0 +1,194 @@
+from typing import List, Optional, Dict, Sequence, Tuple
+
+from .exceptions import RequestError
+from .models import Stack, Section, DHCPLease, PortForwardingRule
+
+
+ERROR_SECTION_IDENTIFIER = '[error]0'
+
+# Getter output fields and the router attribute each one is read from, see project_fields()
+
+STATS_FIELDS = {
+    'current_up_rate': 'upstreamCurrRate',
+    'current_down_rate': 'downstreamCurrRate',
+    'max_up_rate': 'upstreamMaxRate',
+    'max_down_rate': 'downstreamMaxRate',
+}
+
+DHCP_CLIENT_FIELDS = {
+    'ip_address': 'IPAddress',
+    'mac_address': 'MACAddress',
+    'hostname': 'hostName',
+}
+
+WIFI_CLIENT_FIELDS = {
+    'mac_address': 'associatedDeviceMACAddress',
+}
+
+
+def normalize_mac(mac_address: Optional[str]) -> str:
+    """Normalize a MAC address to upper case, colon separated
+
+    :param mac_address:
+    :rtype: str
+    """
+
+    return (mac_address or '').strip().upper().replace('-', ':')
+
+
+def project_fields(field_map: Dict[str, str], fields: Optional[Sequence[str]] = None) -> Tuple[str, ...]:
+    """Get the router attributes needed by a selection of output fields
+
+    :param field_map: output fields of a getter, e.g. STATS_FIELDS
+    :param fields: selected output fields, all of them if None
+    :return: router attributes, in the same order as fields
+    :rtype: Tuple[str, ...]
+    """
+
+    if fields is None:
+        return tuple(field_map.values())
+    unknown = [f for f in fields if f not in field_map]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}, valid fields are: {", ".join(field_map)}')
+    return tuple(field_map[f] for f in fields)
+
+
+def check_errors(stack: Stack):
+    """Raise RequestError if the router reported an error in the '[error]N' trailer
+
+    :param stack: response stack
+    """
+
+    for section in stack.sections:
+        if section.is_error and section.index:
+            raise RequestError(f'Router returned error code {section.index}')
+
+
+def parse_stats(stack: Stack, fields: Optional[Sequence[str]] = None) -> dict:
+    """Parse the response to STATS_QUERY
+
+    :param stack: response stack
+    :param fields: output fields, all of STATS_FIELDS if None
+    :rtype: dict
+    """
+
+    values = stack.sections[0].values
+    return {f: values.get(STATS_FIELDS[f]) for f in (STATS_FIELDS if fields is None else fields)}
+
+
+def parse_external_ip(stack: Stack) -> str:
+    """Parse the response to EXTERNAL_IP_QUERY
+
+    :param stack: response stack
+    :rtype: str
+    """
+
+    section = stack.get_section_by_path('1,1,1,0,0,0', index=7)
+    return section.values.get('externalIPAddress')
+
+
+def parse_dhcp_client(section: Section, fields: Optional[Sequence[str]] = None) -> dict:
+    """Parse a single section of the response to DHCP_CLIENTS_QUERY
+
+    :param section: LAN_HOST_ENTRY section
+    :param fields: output fields, all of DHCP_CLIENT_FIELDS if None
+    :rtype: dict
+    """
+
+    values = section.values
+    if fields is None:
+        return {
+            'ip_address': values.get('IPAddress'),
+            'mac_address': values.get('MACAddress'),
+            'hostname': values.get('hostName')
+        }
+    return {f: values.get(DHCP_CLIENT_FIELDS[f]) for f in fields}
+
+
+def parse_dhcp_clients(stack: Stack, fields: Optional[Sequence[str]] = None) -> List[dict]:
+    """Parse the response to DHCP_CLIENTS_QUERY
+
+    :param stack: response stack
+    :param fields: output fields, all of DHCP_CLIENT_FIELDS if None
+    :rtype: list
+    """
+
+    clients = []
+    for c in stack.sections:
+        if c.identifier != ERROR_SECTION_IDENTIFIER:
+            clients.append(parse_dhcp_client(c, fields))
+    return clients
+
+
+def parse_wifi_client(section: Section) -> str:
+    """Parse a single section of the response to WIFI_2G_CLIENTS_QUERY or WIFI_5G_CLIENTS_QUERY
+
+    :param section: LAN_WLAN_ASSOC_DEV section
+    :rtype: str
+    """
+
+    return section.values.get('associatedDeviceMACAddress')
+
+
+def parse_wifi_clients(stack: Stack) -> List[str]:
+    """Parse the response to WIFI_2G_CLIENTS_QUERY or WIFI_5G_CLIENTS_QUERY
+
+    :param stack: response stack
+    :rtype: list
+    """
+
+    clients = []
+    for c in stack.sections:
+        if c.identifier != ERROR_SECTION_IDENTIFIER:
+            clients.append(parse_wifi_client(c))
+    return clients
+
+
+def parse_dhcp_leases(stack: Stack) -> List[DHCPLease]:
+    """Parse the response to DHCP_LEASES_QUERY
+
+    :param stack: response stack
+    :rtype: List[DHCPLease]
+    """
+
+    leases = []
+    for section in stack.sections:
+        identifier = section.identifier
+        if identifier != ERROR_SECTION_IDENTIFIER:
+            values = section.values
+            l = DHCPLease(
+                identifier=identifier,
+                ip_address=values.get('yiaddr'),
+                mac_address=values.get('chaddr'),
+                is_enabled=values.get('enable')
+            )
+            leases.append(l)
+
+    return leases
+
+
+def parse_port_forwarding_rules(stack: Stack) -> List[PortForwardingRule]:
+    """Parse the response to PORT_FORWARDING_RULES_QUERY
+
+    :param stack: response stack
+    :rtype: List[PortForwardingRule]
+    """
+
+    rules = []
+    for section in stack.sections:
+        identifier = section.identifier
+        if identifier != ERROR_SECTION_IDENTIFIER:
+            values = section.values
+            r = PortForwardingRule(
+                identifier=identifier,
+                client_ip_address=values.get('internalClient'),
+                internal_port=values.get('internalPort'),
+                external_port=values.get('externalPort'),
+                internal_port_end=values.get('X_TP_InternalPortEnd'),
+                external_port_end=values.get('X_TP_ExternalPortEnd'),
+                is_enabled=values.get('portMappingEnabled'),
+                protocol=values.get('portMappingProtocol')
+            )
+            rules.append(r)
+
+    return rules
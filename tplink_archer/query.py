@@ -0,0 +1,256 @@
+import re
+from urllib.parse import urlsplit
+from functools import lru_cache
+from typing import List, Optional, Callable, Dict, Sequence
+
+from .constants import *
+from .models import Stack, Section
+from . import parsers
+
+
+BLOCK_HEADER_REGEX = re.compile(r'^\[(\w+)#([\d,]+)#([\d,]+)\](\d+),(\d+)$')
+
+
+def is_read_only_request(method: str, url: str) -> bool:
+    """Whether a request only reads, so that it can be sent again when its answer is lost or served from a cache
+
+    :param method: HTTP method
+    :param url: request URL or path, e.g. /cgi?5&5
+    :rtype: bool
+    """
+
+    if method.upper() == 'GET':
+        return True
+    parts = urlsplit(url)
+    if parts.path.strip('/') != CGI_URL or not parts.query:
+        return False
+    return all(a.isdigit() and int(a) in READ_ONLY_ACTIONS for a in parts.query.split('&'))
+
+
+class QueryBlock(object):
+    """A single '[OBJECT#stack#parent_stack]index,count' block of a cgi request
+    """
+
+    def __init__(self, action: int, object_name: str, stack: str = '0,0,0,0,0,0',
+                 parent_stack: str = '0,0,0,0,0,0', lines: Optional[List[str]] = None):
+        """Init QueryBlock object
+
+        :param action: one of the ACT_* constants
+        :param object_name: router object name, e.g. LAN_HOST_ENTRY
+        :param stack: object instance, e.g. 1,1,1,0,0,0
+        :param parent_stack: parent object instance
+        :param lines: attribute names to read, or 'key=value' pairs to write
+        """
+        self.action = action
+        self.object_name = object_name
+        self.stack = stack
+        self.parent_stack = parent_stack
+        self.lines = lines or []
+
+    def __repr__(self):
+        return f'<QueryBlock(action={self.action},object_name={self.object_name},stack={self.stack})>'
+
+    def to_text(self, index: int) -> str:
+        """Get block in plain text format
+
+        :param index: position of the block in the request
+        :rtype: str
+        """
+
+        header = f'[{self.object_name}#{self.stack}#{self.parent_stack}]{index},{len(self.lines)}\r\n'
+        return header + ''.join(f'{line}\r\n' for line in self.lines)
+
+########################################################################################################################
+
+
+class Query(object):
+    """A cgi request made of one or more blocks, each with its own action
+    """
+
+    def __init__(self, blocks: Optional[List[QueryBlock]] = None):
+        """Init Query object
+
+        :param blocks: list of QueryBlock objects
+        """
+        self.blocks = blocks or []
+
+    def __repr__(self):
+        return f'<Query(url={self.url})>'
+
+    @classmethod
+    def from_text(cls, url: str, body: str) -> 'Query':
+        """Build a Query from a request URL and body like the ones in constants.py
+
+        :param url: request URL, e.g. 'cgi?1&5'
+        :param body: request body
+        :rtype: Query
+        """
+
+        actions = [int(a) for a in url.split('?', 1)[1].split('&')]
+
+        blocks = []
+        for line in body.split('\r\n'):
+            line = line.strip()
+            if not line:
+                continue
+            match = BLOCK_HEADER_REGEX.match(line)
+            if match:
+                object_name, stack, parent_stack, index, _ = match.groups()
+                blocks.append(QueryBlock(actions[int(index)], object_name, stack, parent_stack))
+            elif blocks:
+                blocks[-1].lines.append(line)
+            else:
+                raise ValueError('Query body does not start with a block header')
+
+        if len(blocks) != len(actions):
+            raise ValueError('Query body and URL do not have the same number of blocks')
+
+        return cls(blocks)
+
+    def project(self, attributes: Dict[int, Sequence[str]]) -> 'Query':
+        """Get a query that reads only some attributes of some blocks
+
+        Attributes are matched case insensitively with the lines of each block and keep the case of the block, as
+        the router answers with names that do not always have the same case as the query ones, e.g.
+        AssociatedDeviceMACAddress and associatedDeviceMACAddress.
+
+        :param attributes: attributes to read by block index, the blocks that are not in it are dropped and the
+            others are renumbered in order
+        :rtype: Query
+        """
+
+        blocks = []
+        for index, block in enumerate(self.blocks):
+            if index not in attributes:
+                continue
+            lines = {line.lower(): line for line in block.lines}
+            selected = [a.lower() for a in attributes[index]]
+            missing = [a for a in selected if lines and a not in lines]
+            if missing:
+                raise ValueError(f'{block.object_name} does not read {", ".join(missing)}')
+            projected = [lines[a] for a in selected] if lines else list(attributes[index])
+            blocks.append(QueryBlock(block.action, block.object_name, block.stack, block.parent_stack, projected))
+        return Query(blocks)
+
+    @property
+    def url(self) -> str:
+        """Request URL, one action for each block
+        """
+
+        return f'{CGI_URL}?' + '&'.join(str(b.action) for b in self.blocks)
+
+    @property
+    def body(self) -> str:
+        """Request body, blocks are numbered by their position
+        """
+
+        return ''.join(block.to_text(i) for i, block in enumerate(self.blocks))
+
+########################################################################################################################
+
+
+BATCH_READS: Dict[str, tuple] = {
+    'stats': (STATS_URL, STATS_QUERY, parsers.parse_stats),
+    'external_ip': (EXTERNAL_IP_URL, EXTERNAL_IP_QUERY, parsers.parse_external_ip),
+    'dhcp_clients': (DHCP_CLIENTS_URL, DHCP_CLIENTS_QUERY, parsers.parse_dhcp_clients),
+    'wifi_clients_2g': (WIFI_CLIENTS_URL, WIFI_2G_CLIENTS_QUERY, parsers.parse_wifi_clients),
+    'wifi_clients_5g': (WIFI_CLIENTS_URL, WIFI_5G_CLIENTS_QUERY, parsers.parse_wifi_clients),
+    'dhcp_leases': (DHCP_LEASES_URL, DHCP_LEASES_QUERY, parsers.parse_dhcp_leases),
+    'port_forwarding_rules': (PORT_FORWARDING_RULES_URL, PORT_FORWARDING_RULES_QUERY,
+                              parsers.parse_port_forwarding_rules),
+}
+
+
+class QueryBatch(object):
+    """Merges several queries into a single cgi request and splits the response back
+    """
+
+    def __init__(self):
+        """Init QueryBatch object
+        """
+        self.names: List[str] = []
+        self.queries: List[Query] = []
+        self.parsers: List[Optional[Callable]] = []
+
+    def __repr__(self):
+        return f'<QueryBatch(names={self.names})>'
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name: str, query: Optional[Query] = None, parser: Optional[Callable] = None) -> 'QueryBatch':
+        """Register a query, the query and parser of a known read in BATCH_READS are used if not given
+
+        :param name: name of the result
+        :param query: Query to send
+        :param parser: function called with the Stack of this query, the Stack itself is returned if None
+        :return: the batch itself, so that calls can be chained
+        :rtype: QueryBatch
+        """
+
+        if name in self.names:
+            raise ValueError(f'Query {name} already in batch')
+
+        if query is None:
+            if name not in BATCH_READS:
+                raise ValueError(f'Unknown query {name}')
+            url, body, default_parser = BATCH_READS[name]
+            query = Query.from_text(url, body)
+            if parser is None:
+                parser = default_parser
+
+        self.names.append(name)
+        self.queries.append(query)
+        self.parsers.append(parser)
+        return self
+
+    @property
+    def query(self) -> Query:
+        """All registered queries merged into one
+        """
+
+        blocks = []
+        for q in self.queries:
+            blocks.extend(q.blocks)
+        return Query(blocks)
+
+    def parse(self, stack: Stack) -> dict:
+        """Split the response to the merged query and parse each part
+
+        Sections are renumbered to the index they have in their own query, so each parser receives the same
+        Stack it would get if its query was sent alone.
+
+        :param stack: response to the merged query
+        :return: dict of results by query name
+        :rtype: dict
+        """
+
+        sections = []
+        index = 0
+        for q in self.queries:
+            query_sections = []
+            for local_index in range(len(q.blocks)):
+                for section in stack.get_sections(index):
+                    query_sections.append(Section(f'[{section.raw_identifier}]{local_index}', section.values))
+                index += 1
+            sections.append(query_sections)
+
+        results = {}
+        for name, parser, query_sections in zip(self.names, self.parsers, sections):
+            query_stack = Stack.from_sections(query_sections)
+            results[name] = parser(query_stack) if parser else query_stack
+        return results
+
+
+@lru_cache(maxsize=64)
+def projected_query(url: str, body: str, attributes: tuple, index: int = 0) -> Query:
+    """Get the query that reads only some attributes of one block of a query like the ones in constants.py
+
+    :param url: request URL of the full query
+    :param body: body of the full query
+    :param attributes: attributes to read, see Query.project()
+    :param index: index of the block to read, the others are dropped
+    :rtype: Query
+    """
+
+    return Query.from_text(url, body).project({index: attributes})
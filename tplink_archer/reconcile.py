@@ -0,0 +1,218 @@
+from typing import List, Dict, Iterable, Optional
+
+from .constants import *
+from .models import DHCPLease, PortForwardingRule, encode_value
+from .query import Query, QueryBlock
+from .parsers import normalize_mac
+
+
+DHCP_LEASE_OBJECT = 'LAN_DHCP_STATIC_ADDR'
+DHCP_LEASE_PARENT_STACK = '1,0,0,0,0,0'
+EMPTY_STACK = '0,0,0,0,0,0'
+
+
+class LeaseChanges(object):
+    """Differences between the current and the desired static DHCP leases
+    """
+
+    def __init__(self):
+        """Init LeaseChanges object
+        """
+        self.create: List[DHCPLease] = []
+        self.delete: List[DHCPLease] = []
+        self.update: List[tuple] = []       # (current lease, desired lease)
+
+    def __repr__(self):
+        return f'<LeaseChanges(create={len(self.create)},delete={len(self.delete)},update={len(self.update)})>'
+
+    def __len__(self):
+        return len(self.create) + len(self.delete) + len(self.update)
+
+    def to_blocks(self) -> List[QueryBlock]:
+        """Get the commands that apply the changes: deletes first, so that their IP addresses can be reused
+
+        :rtype: List[QueryBlock]
+        """
+
+        blocks = []
+        for lease in self.delete:
+            blocks.append(QueryBlock(ACT_DEL, DHCP_LEASE_OBJECT, lease.raw_identifier, EMPTY_STACK))
+        for current, desired in self.update:
+            lines = []
+            if current.ip_address != desired.ip_address:
+                lines.append(f'yiaddr={desired.ip_address}')
+            if current.is_enabled != desired.is_enabled:
+                lines.append(f'enable={"1" if desired.is_enabled else "0"}')
+            blocks.append(QueryBlock(ACT_SET, DHCP_LEASE_OBJECT, current.raw_identifier, EMPTY_STACK, lines))
+        for lease in self.create:
+            blocks.append(QueryBlock(ACT_ADD, DHCP_LEASE_OBJECT, EMPTY_STACK, DHCP_LEASE_PARENT_STACK, [
+                f'chaddr={lease.mac_address}',
+                f'yiaddr={lease.ip_address}',
+                f'enable={"1" if lease.is_enabled else "0"}',
+            ]))
+        return blocks
+
+
+def diff_dhcp_leases(current: Iterable[DHCPLease], desired: Iterable[DHCPLease],
+                     delete_missing: bool = True) -> LeaseChanges:
+    """Compare leases by MAC address
+
+    :param current: leases on the router
+    :param desired: leases that should be on the router, their identifier is ignored
+    :param delete_missing: delete the current leases whose MAC address is not desired
+    :rtype: LeaseChanges
+    """
+
+    current_by_mac: Dict[str, DHCPLease] = {normalize_mac(l.mac_address): l for l in current}
+    changes = LeaseChanges()
+
+    for lease in desired:
+        existing = current_by_mac.pop(normalize_mac(lease.mac_address), None)
+        if existing is None:
+            changes.create.append(lease)
+        elif existing.ip_address != lease.ip_address or existing.is_enabled != lease.is_enabled:
+            changes.update.append((existing, lease))
+
+    if delete_missing:
+        changes.delete.extend(current_by_mac.values())
+    return changes
+
+
+def split_in_batches(blocks: List[QueryBlock], max_batch_size: int) -> List[Query]:
+    """Group command blocks in queries of at most max_batch_size blocks
+
+    :param blocks: command blocks, in order
+    :param max_batch_size: maximum number of blocks in a single request
+    :rtype: List[Query]
+    """
+
+    if max_batch_size <= 0:
+        raise ValueError('Batch size must be positive')
+    return [Query(blocks[i:i + max_batch_size]) for i in range(0, len(blocks), max_batch_size)]
+
+########################################################################################################################
+
+
+PORT_MAPPING_OBJECTS = (
+    'WAN_IP_CONN_PORTMAPPING',
+    'WAN_PPP_CONN_PORTMAPPING',
+    'WAN_L2TP_CONN_PORTMAPPING',
+    'WAN_PPTP_CONN_PORTMAPPING',
+)   # in the same order as the blocks of PORT_FORWARDING_RULES_QUERY
+
+
+def port_forwarding_key(rule: PortForwardingRule) -> tuple:
+    """Identity of a rule: protocol and external port range
+
+    Ports are compared as encoded text, so that empty or non-numeric values read from the router, see decode_int(),
+    match the same values of a desired rule instead of failing.
+
+    :param rule:
+    :rtype: tuple
+    """
+
+    return rule.protocol, encode_value(rule.external_port), encode_value(rule.external_port_end)
+
+
+def port_forwarding_lines(rule: PortForwardingRule) -> List[str]:
+    """Get the 'key=value' lines that write a rule
+
+    :param rule:
+    :rtype: List[str]
+    """
+
+    return [f'{key}={encode_value(value)}' for key, value in rule.to_section().values.items()]
+
+
+def port_forwarding_target(rule: PortForwardingRule) -> tuple:
+    """Get the object name and the parent WAN connection stack of a rule read from the router
+
+    :param rule:
+    :return: (object name, parent stack)
+    :rtype: tuple
+    """
+
+    path = rule.raw_identifier.split(',')
+    parent_stack = ','.join(path[:3] + ['0'] * (len(path) - 3))
+    return PORT_MAPPING_OBJECTS[rule.index], parent_stack
+
+
+class PortForwardingChanges(object):
+    """Differences between the current and the desired port forwarding rules
+    """
+
+    def __init__(self, object_name: Optional[str] = None, parent_stack: Optional[str] = None):
+        """Init PortForwardingChanges object
+
+        :param object_name: object of the WAN connection new rules are added to
+        :param parent_stack: stack of the WAN connection new rules are added to
+        """
+        self.object_name = object_name
+        self.parent_stack = parent_stack
+        self.create: List[PortForwardingRule] = []
+        self.delete: List[PortForwardingRule] = []
+        self.update: List[tuple] = []       # (current rule, desired rule)
+
+    def __repr__(self):
+        return (f'<PortForwardingChanges(create={len(self.create)},delete={len(self.delete)},'
+                f'update={len(self.update)})>')
+
+    def __len__(self):
+        return len(self.create) + len(self.delete) + len(self.update)
+
+    def to_blocks(self) -> List[QueryBlock]:
+        """Get the commands that apply the changes: deletes first, so that their ports can be reused
+
+        :rtype: List[QueryBlock]
+        """
+
+        blocks = []
+        for rule in self.delete:
+            object_name, _ = port_forwarding_target(rule)
+            blocks.append(QueryBlock(ACT_DEL, object_name, rule.raw_identifier, EMPTY_STACK))
+        for current, desired in self.update:
+            object_name, _ = port_forwarding_target(current)
+            blocks.append(QueryBlock(ACT_SET, object_name, current.raw_identifier, EMPTY_STACK,
+                                     port_forwarding_lines(desired)))
+        if self.create and not (self.object_name and self.parent_stack):
+            raise ValueError('Cannot add rules without a WAN connection to add them to')
+        for rule in self.create:
+            blocks.append(QueryBlock(ACT_ADD, self.object_name, EMPTY_STACK, self.parent_stack,
+                                     port_forwarding_lines(rule)))
+        return blocks
+
+
+def diff_port_forwarding_rules(current: Iterable[PortForwardingRule], desired: Iterable[PortForwardingRule],
+                               delete_missing: bool = True, object_name: Optional[str] = None,
+                               parent_stack: Optional[str] = None) -> PortForwardingChanges:
+    """Compare rules by protocol and external port range
+
+    :param current: rules on the router
+    :param desired: rules that should be on the router, their identifier is ignored
+    :param delete_missing: delete the current rules that are not desired
+    :param object_name: object new rules are added to, e.g. WAN_PPP_CONN_PORTMAPPING, defaults to the one of the
+        first current rule
+    :param parent_stack: WAN connection new rules are added to, e.g. 1,1,1,0,0,0, defaults to the one of the first
+        current rule
+    :rtype: PortForwardingChanges
+    """
+
+    current = list(current)
+    if current and not (object_name and parent_stack):
+        default_object_name, default_parent_stack = port_forwarding_target(current[0])
+        object_name = object_name or default_object_name
+        parent_stack = parent_stack or default_parent_stack
+
+    current_by_key: Dict[tuple, PortForwardingRule] = {port_forwarding_key(r): r for r in current}
+    changes = PortForwardingChanges(object_name, parent_stack)
+
+    for rule in desired:
+        existing = current_by_key.pop(port_forwarding_key(rule), None)
+        if existing is None:
+            changes.create.append(rule)
+        elif port_forwarding_lines(existing) != port_forwarding_lines(rule):
+            changes.update.append((existing, rule))
+
+    if delete_missing:
+        changes.delete.extend(current_by_key.values())
+    return changes
@@ -0,0 +1,127 @@
+from functools import lru_cache
+from typing import Dict, Callable, Any, Union
+
+from .query import Query
+
+
+def decode_int(value: str) -> Union[int, str, None]:
+    """Decode an integer value, None if empty
+
+    A value that is not numeric is kept as the raw string, so that it is written back unchanged by encode_value():
+    callers must not assume an int.
+
+    :param value:
+    :rtype: Union[int, str, None]
+    """
+
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def decode_bool(value: str) -> bool:
+    """Decode a '0'/'1' flag
+
+    :param value:
+    :rtype: bool
+    """
+
+    return value == '1'
+
+
+def decode_mac(value: str) -> str:
+    """Decode a MAC address to upper case
+
+    :param value:
+    :rtype: str
+    """
+
+    return value.upper()
+
+
+PORT_MAPPING_FIELD_TYPES = {
+    'portMappingEnabled': decode_bool,
+    'externalPort': decode_int,
+    'X_TP_ExternalPortEnd': decode_int,
+    'internalPort': decode_int,
+    'X_TP_InternalPortEnd': decode_int,
+}
+
+OBJECT_FIELD_TYPES: Dict[str, Dict[str, Callable[[str], Any]]] = {
+    'WAN_DSL_INTF_CFG': {
+        'upstreamCurrRate': decode_int,
+        'downstreamCurrRate': decode_int,
+        'upstreamMaxRate': decode_int,
+        'downstreamMaxRate': decode_int,
+        'upstreamNoiseMargin': decode_int,
+        'downstreamNoiseMargin': decode_int,
+        'upstreamAttenuation': decode_int,
+        'downstreamAttenuation': decode_int,
+    },
+    'WAN_DSL_INTF_STATS_TOTAL': {
+        'ATUCCRCErrors': decode_int,
+        'CRCErrors': decode_int,
+        'ATUCFECErrors': decode_int,
+        'FECErrors': decode_int,
+        'severelyErroredSecs': decode_int,
+        'X_TP_US_SeverelyErroredSecs': decode_int,
+        'erroredSecs': decode_int,
+        'X_TP_US_ErroredSecs': decode_int,
+    },
+    'IGD': {
+        'LANDeviceNumberOfEntries': decode_int,
+    },
+    'IGD_DEV_INFO': {
+        'upTime': decode_int,
+    },
+    'LAN_HOST_ENTRY': {
+        'leaseTimeRemaining': decode_int,
+        'MACAddress': decode_mac,
+    },
+    'LAN_WLAN_ASSOC_DEV': {
+        'associatedDeviceMACAddress': decode_mac,
+        'X_TP_TotalPacketsSent': decode_int,
+        'X_TP_TotalPacketsReceived': decode_int,
+    },
+    'LAN_DHCP_STATIC_ADDR': {
+        'enable': decode_bool,
+        'chaddr': decode_mac,
+    },
+    'WAN_IP_CONN_PORTMAPPING': PORT_MAPPING_FIELD_TYPES,
+    'WAN_PPP_CONN_PORTMAPPING': PORT_MAPPING_FIELD_TYPES,
+    'WAN_L2TP_CONN_PORTMAPPING': PORT_MAPPING_FIELD_TYPES,
+    'WAN_PPTP_CONN_PORTMAPPING': PORT_MAPPING_FIELD_TYPES,
+}
+
+
+def field_types_for_query(query: Query) -> Dict[int, Dict[str, Callable[[str], Any]]]:
+    """Get the decoders of every block of a query, to be passed to Stack
+
+    IP addresses and other text fields have no decoder and stay str.
+
+    :param query: Query whose response is parsed
+    :return: dict of field decoders by query index
+    :rtype: dict
+    """
+
+    field_types = {}
+    for index, block in enumerate(query.blocks):
+        types = OBJECT_FIELD_TYPES.get(block.object_name)
+        if types:
+            field_types[index] = types
+    return field_types
+
+
+@lru_cache(maxsize=64)
+def field_types_for(url: str, body: str) -> Dict[int, Dict[str, Callable[[str], Any]]]:
+    """Get the decoders of every block of a request, like field_types_for_query()
+
+    :param url: request URL
+    :param body: request body
+    :rtype: dict
+    """
+
+    return field_types_for_query(Query.from_text(url, body))
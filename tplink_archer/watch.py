@@ -0,0 +1,154 @@
+import time
+import threading
+from enum import Enum, auto
+from typing import Callable, Iterable, Iterator, List, Dict, Optional
+
+from .connection import ArcherConnection
+from .models import WifiFreq
+from .parsers import normalize_mac
+
+
+class HostEventType(Enum):
+    JOINED = auto()
+    LEFT = auto()
+    CHANGED = auto()
+
+
+class HostEvent(object):
+    """A host joining, leaving or changing between two snapshots
+    """
+
+    __slots__ = ('type', 'mac_address', 'host', 'previous')
+
+    def __init__(self, event_type: HostEventType, mac_address: str, host: Optional[dict],
+                 previous: Optional[dict] = None):
+        """Init HostEvent object
+
+        :param event_type: what happened
+        :param mac_address: normalized MAC address of the host
+        :param host: current host fields, None if the host left
+        :param previous: host fields in the previous snapshot, None if the host joined
+        """
+        self.type = event_type
+        self.mac_address = mac_address
+        self.host = host
+        self.previous = previous
+
+    def __repr__(self):
+        return f'<HostEvent(type={self.type.name},mac_address={self.mac_address})>'
+
+    @property
+    def changes(self) -> Dict[str, tuple]:
+        """Changed fields as field: (old value, new value)
+        """
+
+        old = self.previous or {}
+        new = self.host or {}
+        return {k: (old.get(k), new.get(k)) for k in old.keys() | new.keys() if old.get(k) != new.get(k)}
+
+########################################################################################################################
+
+
+class HostWatcher(object):
+    """Keeps the last snapshot of a host list indexed by MAC address and reports only what changed
+    """
+
+    def __init__(self, fetch: Callable[[], Iterable[dict]]):
+        """Init HostWatcher object
+
+        :param fetch: function returning the current hosts, each one a dict with at least 'mac_address'
+        """
+        self.fetch = fetch
+        self.hosts: Dict[str, dict] = {}
+
+    def __repr__(self):
+        return f'<HostWatcher(hosts={len(self.hosts)})>'
+
+    @classmethod
+    def dhcp_clients(cls, connection: ArcherConnection) -> 'HostWatcher':
+        """Watch the router DHCP clients, an IP address or hostname change is reported as CHANGED
+
+        :param connection: router connection
+        :rtype: HostWatcher
+        """
+
+        return cls(connection.iter_dhcp_clients)
+
+    @classmethod
+    def wifi_clients(cls, connection: ArcherConnection, wifi_freq: WifiFreq) -> 'HostWatcher':
+        """Watch the stations associated to specified WiFi frequency
+
+        :param connection: router connection
+        :param wifi_freq: WiFi frequency
+        :rtype: HostWatcher
+        """
+
+        return cls(lambda: ({'mac_address': mac} for mac in connection.iter_wifi_clients(wifi_freq)))
+
+    def update(self, hosts: Iterable[dict]) -> List[HostEvent]:
+        """Replace the snapshot and return the differences with the previous one
+
+        The snapshot is replaced only after hosts is fully consumed, if iterating it fails the previous snapshot is
+        kept.
+
+        :param hosts: current hosts
+        :rtype: List[HostEvent]
+        """
+
+        previous_hosts = dict(self.hosts)
+        current_hosts = {}
+        events = []
+        for host in hosts:
+            mac_address = normalize_mac(host.get('mac_address'))
+            if not mac_address:
+                continue
+            host = dict(host, mac_address=mac_address)
+            current_hosts[mac_address] = host
+            previous = previous_hosts.pop(mac_address, None)
+            if previous is None:
+                events.append(HostEvent(HostEventType.JOINED, mac_address, host))
+            elif previous != host:
+                events.append(HostEvent(HostEventType.CHANGED, mac_address, host, previous))
+
+        for mac_address, previous in previous_hosts.items():
+            events.append(HostEvent(HostEventType.LEFT, mac_address, None, previous))
+
+        self.hosts = current_hosts
+        return events
+
+    def poll(self) -> List[HostEvent]:
+        """Fetch the hosts once and return the differences with the previous snapshot
+
+        :rtype: List[HostEvent]
+        """
+
+        return self.update(self.fetch())
+
+    def watch(self, interval: float, stop_event: Optional[threading.Event] = None) -> Iterator[HostEvent]:
+        """Poll every interval seconds and yield the events, until stop_event is set
+
+        The first poll reports every current host as JOINED.
+
+        :param interval: seconds between the start of two polls
+        :param stop_event: event that stops the watch when set
+        :rtype: Iterator[HostEvent]
+        """
+
+        stop_event = stop_event or threading.Event()
+        next_poll = time.monotonic()
+        while not stop_event.is_set():
+            yield from self.poll()
+            next_poll += interval
+            stop_event.wait(max(0.0, next_poll - time.monotonic()))
+
+    def run(self, callback: Callable[[HostEvent], None], interval: float,
+            stop_event: Optional[threading.Event] = None):
+        """Poll every interval seconds and call callback for each event, until stop_event is set
+
+        :param callback: function called with each event
+        :param interval: seconds between the start of two polls
+        :param stop_event: event that stops the watch when set
+        """
+
+        for event in self.watch(interval, stop_event):
+            callback(event)